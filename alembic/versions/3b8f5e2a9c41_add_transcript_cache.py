@@ -0,0 +1,63 @@
+"""add_transcript_cache
+
+Revision ID: 3b8f5e2a9c41
+Revises: 7c1e9a4b2d10
+Create Date: 2025-11-21 14:05:52.731046
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3b8f5e2a9c41'
+down_revision = '7c1e9a4b2d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('audiosource', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(
+        op.f('ix_audiosource_content_hash'),
+        'audiosource',
+        ['content_hash'],
+        unique=False,
+    )
+
+    op.create_table(
+        'transcriptcacheentry',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model_name', sa.String(length=255), nullable=False),
+        sa.Column('prompt_version', sa.String(length=32), nullable=False),
+        sa.Column('transcript', sa.Text(), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column(
+            'created_at',
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text('now()'),
+        ),
+        sa.Column('last_hit_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'content_hash', 'model_name', 'prompt_version', name='uq_transcriptcacheentry_key'
+        ),
+    )
+    op.create_index(
+        op.f('ix_transcriptcacheentry_content_hash'),
+        'transcriptcacheentry',
+        ['content_hash'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transcriptcacheentry_content_hash'), table_name='transcriptcacheentry')
+    op.drop_table('transcriptcacheentry')
+    op.drop_index(op.f('ix_audiosource_content_hash'), table_name='audiosource')
+    op.drop_column('audiosource', 'content_hash')
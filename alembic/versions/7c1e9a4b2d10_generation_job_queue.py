@@ -0,0 +1,32 @@
+"""generation_job_queue
+
+Revision ID: 7c1e9a4b2d10
+Revises: 2d46dfa1e369
+Create Date: 2025-11-20 10:12:31.418202
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '7c1e9a4b2d10'
+down_revision = '2d46dfa1e369'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('generationjob', sa.Column('worker_id', sa.String(length=128), nullable=True))
+    op.create_index(
+        'ix_generationjob_status_created_at',
+        'generationjob',
+        ['status', 'created_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_generationjob_status_created_at', table_name='generationjob')
+    op.drop_column('generationjob', 'worker_id')
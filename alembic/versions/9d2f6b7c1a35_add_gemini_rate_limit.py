@@ -0,0 +1,57 @@
+"""add_gemini_rate_limit
+
+Revision ID: 9d2f6b7c1a35
+Revises: e4a7c3d1f820
+Create Date: 2025-11-23 10:12:44.518203
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9d2f6b7c1a35'
+down_revision = 'e4a7c3d1f820'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'geminiratelimit',
+        sa.Column('key_id', sa.String(length=32), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column(
+            'refilled_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.Column('acquired_total', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('rejected_total', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('wait_ms_total', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('wait_ms_max', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('key_id'),
+    )
+    op.create_table(
+        'geminicalllease',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('key_id', sa.String(length=32), nullable=False),
+        sa.Column('holder', sa.String(length=128), nullable=True),
+        sa.Column(
+            'acquired_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_geminicalllease_key_id'), 'geminicalllease', ['key_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_geminicalllease_key_id'), table_name='geminicalllease')
+    op.drop_table('geminicalllease')
+    op.drop_table('geminiratelimit')
@@ -0,0 +1,53 @@
+"""add_user_job_quota
+
+Revision ID: a5d3e7f9c126
+Revises: f3a8d6c2b914
+Create Date: 2025-11-28 15:22:09.761842
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a5d3e7f9c126'
+down_revision = 'f3a8d6c2b914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'userjobquota',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('active_jobs', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column(
+            'window_started_at',
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.text('now()'),
+        ),
+        sa.Column('window_tokens', sa.BigInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column(
+            'previous_window_tokens',
+            sa.BigInteger(),
+            nullable=False,
+            server_default=sa.text('0'),
+        ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    # Счётчики дальше меняются инкрементально, поэтому уже поставленные задачи учитываем сразу
+    op.execute(
+        """
+        INSERT INTO userjobquota (user_id, active_jobs)
+        SELECT user_id, count(*) FROM generationjob
+        WHERE status IN ('pending', 'running')
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('userjobquota')
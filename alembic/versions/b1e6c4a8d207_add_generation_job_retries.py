@@ -0,0 +1,28 @@
+"""add_generation_job_retries
+
+Revision ID: b1e6c4a8d207
+Revises: 9d2f6b7c1a35
+Create Date: 2025-11-24 09:41:17.230514
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b1e6c4a8d207'
+down_revision = '9d2f6b7c1a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'generationjob',
+        sa.Column('retries', sa.Integer(), nullable=False, server_default=sa.text('0')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('generationjob', 'retries')
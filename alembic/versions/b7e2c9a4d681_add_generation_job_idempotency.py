@@ -0,0 +1,42 @@
+"""add_generation_job_idempotency
+
+Revision ID: b7e2c9a4d681
+Revises: a5d3e7f9c126
+Create Date: 2025-11-29 10:14:45.093217
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c9a4d681'
+down_revision = 'a5d3e7f9c126'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'generationjob',
+        sa.Column('idempotency_key', sa.String(length=128), nullable=True),
+    )
+    op.add_column('generationjob', sa.Column('dedup_key', sa.String(length=64), nullable=True))
+    op.create_unique_constraint(
+        'uq_generationjob_idempotency_key', 'generationjob', ['user_id', 'idempotency_key']
+    )
+    op.create_index(
+        'uq_generationjob_inflight_dedup',
+        'generationjob',
+        ['user_id', 'dedup_key'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_generationjob_inflight_dedup', table_name='generationjob')
+    op.drop_constraint('uq_generationjob_idempotency_key', 'generationjob', type_='unique')
+    op.drop_column('generationjob', 'dedup_key')
+    op.drop_column('generationjob', 'idempotency_key')
@@ -0,0 +1,34 @@
+"""add_generation_job_cancellation
+
+Revision ID: c4f8a1d6e293
+Revises: b7e2c9a4d681
+Create Date: 2025-11-29 17:38:02.615904
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c4f8a1d6e293'
+down_revision = 'b7e2c9a4d681'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE нельзя выполнять внутри транзакции на старых версиях Postgres
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE generationjobstatus ADD VALUE IF NOT EXISTS 'cancelled'")
+    op.add_column(
+        'generationjob',
+        sa.Column('cancel_requested_at', sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('generationjob', 'cancel_requested_at')
+    # Значение enum удалить нельзя: отменённые задачи переводим в failed,
+    # а 'cancelled' остаётся в типе
+    op.execute("UPDATE generationjob SET status = 'failed' WHERE status = 'cancelled'")
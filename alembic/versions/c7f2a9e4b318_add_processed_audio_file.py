@@ -0,0 +1,38 @@
+"""add_processed_audio_file
+
+Revision ID: c7f2a9e4b318
+Revises: b1e6c4a8d207
+Create Date: 2025-11-25 11:03:52.871640
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c7f2a9e4b318'
+down_revision = 'b1e6c4a8d207'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'audiosource',
+        sa.Column('processed_file_path', sa.String(length=1024), nullable=True),
+    )
+    op.add_column(
+        'audiosource',
+        sa.Column('processed_mime_type', sa.String(length=128), nullable=True),
+    )
+    op.add_column(
+        'audiosource',
+        sa.Column('processed_file_size', sa.Numeric(precision=16, scale=2), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('audiosource', 'processed_file_size')
+    op.drop_column('audiosource', 'processed_mime_type')
+    op.drop_column('audiosource', 'processed_file_path')
@@ -0,0 +1,34 @@
+"""add_audio_speech_ratio
+
+Revision ID: d2b8e5f1a963
+Revises: c7f2a9e4b318
+Create Date: 2025-11-26 14:27:05.114392
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd2b8e5f1a963'
+down_revision = 'c7f2a9e4b318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'audiosource',
+        sa.Column('speech_ratio', sa.Numeric(precision=5, scale=4), nullable=True),
+    )
+    op.add_column(
+        'audiosource',
+        sa.Column('speech_time_map', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('audiosource', 'speech_time_map')
+    op.drop_column('audiosource', 'speech_ratio')
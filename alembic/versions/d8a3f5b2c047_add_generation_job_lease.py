@@ -0,0 +1,53 @@
+"""add_generation_job_lease
+
+Revision ID: d8a3f5b2c047
+Revises: c4f8a1d6e293
+Create Date: 2025-11-30 12:51:27.340186
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd8a3f5b2c047'
+down_revision = 'c4f8a1d6e293'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'generationjob',
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')),
+    )
+    op.add_column(
+        'generationjob',
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.add_column(
+        'generationjob',
+        sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index(
+        'ix_generationjob_status_lease_expires_at',
+        'generationjob',
+        ['status', 'lease_expires_at'],
+        unique=False,
+    )
+    # Уже выполняющиеся задачи получают аренду на срок дедлайна: старые воркеры её не продлевают
+    op.execute(
+        """
+        UPDATE generationjob
+        SET attempts = 1, lease_expires_at = now() + interval '40 minutes'
+        WHERE status = 'running'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_generationjob_status_lease_expires_at', table_name='generationjob')
+    op.drop_column('generationjob', 'lease_expires_at')
+    op.drop_column('generationjob', 'heartbeat_at')
+    op.drop_column('generationjob', 'attempts')
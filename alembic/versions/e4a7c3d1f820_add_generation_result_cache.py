@@ -0,0 +1,49 @@
+"""add_generation_result_cache
+
+Revision ID: e4a7c3d1f820
+Revises: 3b8f5e2a9c41
+Create Date: 2025-11-22 11:47:09.204517
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c3d1f820'
+down_revision = '3b8f5e2a9c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'generationcacheentry',
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('model_name', sa.String(length=255), nullable=False),
+        sa.Column('prompt_version', sa.String(length=32), nullable=False),
+        sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column(
+            'created_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('last_hit_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('cache_key'),
+    )
+    op.create_index(
+        op.f('ix_generationcacheentry_expires_at'),
+        'generationcacheentry',
+        ['expires_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_generationcacheentry_expires_at'), table_name='generationcacheentry')
+    op.drop_table('generationcacheentry')
@@ -0,0 +1,29 @@
+"""add_generation_job_checkpoints
+
+Revision ID: e5b9d2f7a184
+Revises: d8a3f5b2c047
+Create Date: 2025-12-01 09:27:44.518630
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e5b9d2f7a184'
+down_revision = 'd8a3f5b2c047'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'generationjob',
+        sa.Column('checkpoints', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('generationjob', 'checkpoints')
@@ -0,0 +1,58 @@
+"""add_question_bank
+
+Revision ID: e9c1f4a7b250
+Revises: d2b8e5f1a963
+Create Date: 2025-11-27 16:48:31.502947
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'e9c1f4a7b250'
+down_revision = 'd2b8e5f1a963'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'bankquestion',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('conspect_id', sa.Integer(), nullable=False),
+        sa.Column('summary_hash', sa.String(length=64), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('question', sa.Text(), nullable=False),
+        sa.Column('answers', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('explanation', sa.Text(), nullable=True),
+        sa.Column('difficulty', sa.String(length=16), nullable=False, server_default='medium'),
+        sa.Column('times_used', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column(
+            'created_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(['conspect_id'], ['conspect.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'conspect_id',
+            'summary_hash',
+            'fingerprint',
+            name='uq_bankquestion_fingerprint',
+        ),
+    )
+    op.create_index(
+        'ix_bankquestion_conspect_summary',
+        'bankquestion',
+        ['conspect_id', 'summary_hash'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bankquestion_conspect_summary', table_name='bankquestion')
+    op.drop_table('bankquestion')
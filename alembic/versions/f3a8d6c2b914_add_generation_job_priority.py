@@ -0,0 +1,33 @@
+"""add_generation_job_priority
+
+Revision ID: f3a8d6c2b914
+Revises: e9c1f4a7b250
+Create Date: 2025-11-28 11:06:52.418337
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d6c2b914'
+down_revision = 'e9c1f4a7b250'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'generationjob',
+        sa.Column('priority', sa.Integer(), nullable=False, server_default=sa.text('0')),
+    )
+    op.add_column(
+        'generationjob',
+        sa.Column('estimated_cost', sa.Float(), nullable=False, server_default=sa.text('0')),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('generationjob', 'estimated_cost')
+    op.drop_column('generationjob', 'priority')
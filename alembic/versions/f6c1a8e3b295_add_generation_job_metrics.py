@@ -0,0 +1,32 @@
+"""add_generation_job_metrics
+
+Revision ID: f6c1a8e3b295
+Revises: e5b9d2f7a184
+Create Date: 2025-12-02 14:08:31.207415
+"""
+from __future__ import annotations
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f6c1a8e3b295'
+down_revision = 'e5b9d2f7a184'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'generationjob',
+        sa.Column('metrics', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    # Для сводки по завершённым задачам за окно времени
+    op.create_index('ix_generationjob_finished_at', 'generationjob', ['finished_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_generationjob_finished_at', table_name='generationjob')
+    op.drop_column('generationjob', 'metrics')
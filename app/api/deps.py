@@ -4,10 +4,11 @@ import secrets
 from datetime import datetime, timedelta
 from typing import Generator
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.db.session import get_db
 from app.models.session import UserSession
 from app.models.user import User
@@ -92,6 +93,15 @@ def get_optional_user(
         return None
 
 
+def require_internal_access(
+    internal_token: str | None = Header(None, alias="X-Internal-Token"),
+) -> None:
+    """Операционная статистика по всем пользователям — только с токеном INTERNAL_API_TOKEN."""
+    expected = settings.internal_api_token
+    if not expected or not internal_token or not secrets.compare_digest(internal_token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Internal access only")
+
+
 def create_session(db: Session, user: User, expire_minutes: int) -> UserSession:
     token_jti = secrets.token_hex(16)
     session = UserSession(
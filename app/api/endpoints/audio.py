@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
@@ -10,6 +11,7 @@ from app.models.audio import AudioSource
 from app.models.enums import AudioProcessingStatus, AudioSourceType
 from app.models.user import User
 from app.schemas.audio import AudioSourceRead
+from app.services.generation import generation_service
 from app.services.storage import audio_storage
 
 router = APIRouter()
@@ -31,7 +33,7 @@ async def upload_audio(
             detail=f"Неподдерживаемый тип файла: {file.content_type}",
         )
 
-    path, size = audio_storage.save_upload(user.id, file)
+    path, size, content_hash = audio_storage.save_upload(user.id, file)
     size_mb = size / (1024 * 1024)
     if size_mb > settings.max_upload_size_mb:
         path.unlink(missing_ok=True)
@@ -48,11 +50,14 @@ async def upload_audio(
         mime_type=file.content_type,
         file_path=str(relative_path),
         file_size=size_mb,
+        content_hash=content_hash,
         status=AudioProcessingStatus.PENDING,
     )
     db.add(audio_source)
     db.commit()
     db.refresh(audio_source)
+    # Длительность и доля речи нужны до постановки задачи: по ним она встанет в очередь
+    await run_in_threadpool(generation_service.measure_audio, db, audio_source, path)
     return AudioSourceRead.model_validate(audio_source)
 
 
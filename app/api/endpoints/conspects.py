@@ -1,4 +1,4 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session, selectinload
 
 from app.api import deps
@@ -13,6 +13,7 @@ from app.schemas.conspect import (
     ConspectVariantCreateRequest,
 )
 from app.schemas.job import JobRead
+from app.services.admission import AdmissionRejected
 from app.services.generation import generation_service
 from app.services.sharing import (
     get_conspect_by_share_token,
@@ -27,6 +28,7 @@ def _serialize_conspect(conspect: Conspect) -> ConspectRead:
     return base.model_copy(
         update={
             "available_variants": conspect.available_variants,
+            "missing_variants": conspect.missing_variants,
         }
     )
 
@@ -34,16 +36,30 @@ def _serialize_conspect(conspect: Conspect) -> ConspectRead:
 @router.post("", response_model=JobRead, status_code=status.HTTP_202_ACCEPTED)
 def create_conspect(
     payload: ConspectCreateRequest,
-    background_tasks: BackgroundTasks,
+    idempotency_key: str | None = Header(
+        None,
+        alias="Idempotency-Key",
+        max_length=128,
+        description="Повтор запроса с тем же ключом вернёт исходную задачу",
+    ),
     db: Session = Depends(deps.get_db_session),
     user: User = Depends(deps.get_current_user),
 ) -> JobRead:
     try:
-        job = generation_service.create_conspect_job(db, user=user, payload=payload)
+        job = generation_service.create_conspect_job(
+            db,
+            user=user,
+            payload=payload,
+            idempotency_key=(idempotency_key or "").strip() or None,
+        )
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=exc.detail,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-
-    background_tasks.add_task(generation_service.process_conspect_job, job.id)
     return JobRead.model_validate(job)
 
 
@@ -124,7 +140,6 @@ def get_conspect(
 def create_conspect_variant(
     conspect_id: int,
     payload: ConspectVariantCreateRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db_session),
     user: User = Depends(deps.get_current_user),
 ) -> JobRead:
@@ -135,10 +150,14 @@ def create_conspect_variant(
             conspect_id=conspect_id,
             variant=payload.variant,
         )
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=exc.detail,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-
-    background_tasks.add_task(generation_service.process_conspect_job, job.id)
     return JobRead.model_validate(job)
 
 
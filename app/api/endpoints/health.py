@@ -1,4 +1,14 @@
-from fastapi import APIRouter
+from typing import Any
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.api import deps
+from app.models.enums import GenerationJobType
+from app.services.ai.gemini import gemini_hedger, gemini_pool, generation_result_cache
+from app.services.ai.governor import rate_limit_stats
+from app.services.job_metrics import job_metrics_summary
+from app.services.transcript_cache import transcript_cache
 
 router = APIRouter()
 
@@ -6,3 +16,41 @@ router = APIRouter()
 @router.get("/health", summary="Health check")
 def healthcheck() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get(
+    "/health/cache",
+    summary="Статистика кэшей генерации",
+    dependencies=[Depends(deps.require_internal_access)],
+)
+def cache_stats(db: Session = Depends(deps.get_db_session)) -> dict[str, dict[str, int]]:
+    stats = {"transcripts": transcript_cache.stats(db)}
+    if generation_result_cache is not None:
+        stats["generation"] = generation_result_cache.stats(db)
+    return stats
+
+
+@router.get(
+    "/health/gemini",
+    summary="Лимиты, ожидание и загрузка ключей Gemini",
+    dependencies=[Depends(deps.require_internal_access)],
+)
+def gemini_stats(db: Session = Depends(deps.get_db_session)) -> dict[str, Any]:
+    # keys — общие для всех процессов счётчики лимитера, pool и hedging — этот процесс
+    stats: dict[str, Any] = {"keys": rate_limit_stats(db), "pool": gemini_pool.stats()}
+    if gemini_hedger is not None:
+        stats["hedging"] = gemini_hedger.stats()
+    return stats
+
+
+@router.get(
+    "/health/jobs",
+    summary="Время стадий, токены и кэш завершённых задач генерации",
+    dependencies=[Depends(deps.require_internal_access)],
+)
+def job_stats(
+    hours: float = Query(24, gt=0, le=24 * 30, description="За сколько последних часов считать"),
+    job_type: GenerationJobType | None = Query(None, description="Только задачи этого типа"),
+    db: Session = Depends(deps.get_db_session),
+) -> dict[str, Any]:
+    return job_metrics_summary(db, hours=hours, job_type=job_type)
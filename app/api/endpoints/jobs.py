@@ -1,13 +1,152 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+from collections.abc import Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.enums import GenerationJobStatus
 from app.models.generation import GenerationJob
 from app.models.user import User
-from app.schemas.job import JobRead
+from app.schemas.job import JobListResponse, JobRead
+from app.services.generation import generation_service
+from app.services.job_events import job_event_hub
+from app.services.job_queue import job_queue
 
 router = APIRouter()
 
+TERMINAL_JOB_STATUSES = {
+    GenerationJobStatus.COMPLETED,
+    GenerationJobStatus.FAILED,
+    GenerationJobStatus.CANCELLED,
+}
+MAX_BATCH_JOB_IDS = 50
+
+
+def _parse_job_ids(raw_ids: str) -> list[int]:
+    try:
+        job_ids = list(dict.fromkeys(int(item) for item in raw_ids.split(",") if item.strip()))
+    except ValueError as exc:
+        raise ValueError(
+            "Параметр ids должен быть списком числовых идентификаторов через запятую"
+        ) from exc
+    if not job_ids:
+        raise ValueError("Не указаны идентификаторы задач")
+    if len(job_ids) > MAX_BATCH_JOB_IDS:
+        raise ValueError(f"За один запрос можно получить не больше {MAX_BATCH_JOB_IDS} задач")
+    return job_ids
+
+
+def _parse_seen(raw_seen: str, job_ids: Sequence[int]) -> dict[int, GenerationJobStatus]:
+    """Разбирает seen вида «12:running,15:pending» — статусы, которые клиент уже видел."""
+    seen: dict[int, GenerationJobStatus] = {}
+    for item in raw_seen.split(","):
+        if not item.strip():
+            continue
+        job_id, _, value = item.partition(":")
+        try:
+            seen[int(job_id)] = GenerationJobStatus(value.strip())
+        except ValueError as exc:
+            raise ValueError(
+                "Параметр seen должен быть списком пар id:статус через запятую"
+            ) from exc
+    unknown = set(seen) - set(job_ids)
+    if unknown:
+        raise ValueError("В seen указаны задачи, которых нет в ids")
+    return seen
+
+
+def _has_news(jobs: Sequence[JobRead], baseline: dict[int, GenerationJobStatus]) -> bool:
+    """Есть что вернуть: статус отличается от известного клиенту или ждать больше нечего."""
+    if not jobs or all(job.status in TERMINAL_JOB_STATUSES for job in jobs):
+        return True
+    return any(job.status != baseline.get(job.id, job.status) for job in jobs)
+
+
+def _to_read(db: Session, jobs: Sequence[GenerationJob]) -> list[JobRead]:
+    pending_ids = [job.id for job in jobs if job.status == GenerationJobStatus.PENDING]
+    positions = job_queue.queue_positions(db, pending_ids)
+    return [
+        JobRead.model_validate(job).model_copy(update={"queue_position": positions.get(job.id)})
+        for job in jobs
+    ]
+
+
+def _load_jobs(job_ids: Sequence[int], user_id: int) -> list[JobRead]:
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(GenerationJob)
+            .filter(GenerationJob.id.in_(job_ids), GenerationJob.user_id == user_id)
+            .all()
+        )
+        by_id = {job.id: job for job in _to_read(db, jobs)}
+        return [by_id[job_id] for job_id in job_ids if job_id in by_id]
+    finally:
+        db.close()
+
+
+def _load_job(job_id: int, user_id: int) -> JobRead | None:
+    jobs = _load_jobs([job_id], user_id)
+    return jobs[0] if jobs else None
+
+
+@router.get("", response_model=JobListResponse)
+async def list_jobs(
+    ids: str = Query(..., description="Идентификаторы задач через запятую"),
+    wait: float = Query(0, ge=0, description="Сколько секунд ждать изменения статуса"),
+    seen: str = Query("", description="Уже известные клиенту статусы: id:статус через запятую"),
+    db: Session = Depends(deps.get_db_session),
+    user: User = Depends(deps.get_current_user),
+) -> JobListResponse:
+    """Статусы нескольких задач одним запросом, с long-poll при wait > 0.
+
+    Запрос возвращается, как только статус какой-либо задачи отличается от
+    переданного в seen (для задач без seen — от статуса на момент запроса),
+    когда все задачи завершены или истёк wait. Завершённые задачи из seen не
+    мешают ждать остальные, а смена статуса между двумя опросами не теряется.
+    """
+    try:
+        job_ids = _parse_job_ids(ids)
+        seen_statuses = _parse_seen(seen, job_ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    user_id = user.id
+    # Соединение сессии авторизации не должно висеть в пуле всё время ожидания
+    db.close()
+    timeout = min(wait, settings.job_long_poll_max_seconds)
+    if timeout <= 0:
+        return JobListResponse(items=await run_in_threadpool(_load_jobs, job_ids, user_id))
+
+    queue = job_event_hub.subscribe(job_ids)
+    try:
+        # Снимок после подписки, чтобы не пропустить переход между ними
+        jobs = await run_in_threadpool(_load_jobs, job_ids, user_id)
+        baseline = {job.id: seen_statuses.get(job.id, job.status) for job in jobs}
+        if _has_news(jobs, baseline):
+            return JobListResponse(items=jobs)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=remaining)
+            except TimeoutError:
+                break
+            if event.get("event") != "status":
+                continue
+            jobs = await run_in_threadpool(_load_jobs, job_ids, user_id)
+            if _has_news(jobs, baseline):
+                return JobListResponse(items=jobs)
+        return JobListResponse(items=await run_in_threadpool(_load_jobs, job_ids, user_id))
+    finally:
+        job_event_hub.unsubscribe(job_ids, queue)
+
 
 @router.get("/{job_id}", response_model=JobRead)
 def get_job(
@@ -22,4 +161,83 @@ def get_job(
     )
     if job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена")
-    return JobRead.model_validate(job)
+    return _to_read(db, [job])[0]
+
+
+@router.post("/{job_id}/cancel", response_model=JobRead, summary="Отменить задачу генерации")
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(deps.get_db_session),
+    user: User = Depends(deps.get_current_user),
+) -> JobRead:
+    """Ожидающая задача отменяется сразу; выполняющаяся — на ближайшей границе стадий."""
+    job = (
+        db.query(GenerationJob)
+        .filter(GenerationJob.id == job_id, GenerationJob.user_id == user.id)
+        .one_or_none()
+    )
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена")
+    try:
+        job = generation_service.cancel_job(db, job)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    return _to_read(db, [job])[0]
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.get("/{job_id}/events", summary="SSE-поток статуса и прогресса задачи")
+async def stream_job_events(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(deps.get_db_session),
+    user: User = Depends(deps.get_current_user),
+) -> StreamingResponse:
+    user_id = user.id
+    # Соединение сессии авторизации не должно висеть в пуле всё время стрима
+    db.close()
+    if await run_in_threadpool(_load_job, job_id, user_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена")
+
+    async def event_stream():
+        queue = job_event_hub.subscribe([job_id])
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.job_events_max_seconds
+        try:
+            # Снимок берём после подписки, чтобы не пропустить переход между ними
+            current = await run_in_threadpool(_load_job, job_id, user_id)
+            if current is None:
+                return
+            yield _sse("status", current.model_dump_json())
+            while current.status not in TERMINAL_JOB_STATUSES and loop.time() < deadline:
+                if await request.is_disconnected():
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=settings.job_events_keepalive_seconds
+                    )
+                except TimeoutError:
+                    event = None
+                if event is not None and event.get("event") == "progress":
+                    yield _sse("progress", json.dumps(event, ensure_ascii=False))
+                    continue
+                # Статус всегда перечитываем из БД; по таймауту тоже — на случай потерянного NOTIFY
+                latest = await run_in_threadpool(_load_job, job_id, user_id)
+                if latest is None:
+                    return
+                if latest.status != current.status:
+                    yield _sse("status", latest.model_dump_json())
+                else:
+                    yield ": keepalive\n\n"
+                current = latest
+        finally:
+            job_event_hub.unsubscribe([job_id], queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,5 +1,5 @@
 from sqlalchemy import and_, func
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, selectinload
 
 from app.api import deps
@@ -17,7 +17,9 @@ from app.schemas.quiz import (
     QuizSummaryRead,
     QuizUpdateRequest,
 )
+from app.services.admission import AdmissionRejected
 from app.services.generation import generation_service
+from app.services.quiz_persistence import AnswerDraft, QuestionDraft, insert_quiz_questions
 from app.services.sharing import (
     get_or_create_share_token_quiz,
     get_quiz_by_share_token,
@@ -29,16 +31,19 @@ router = APIRouter()
 @router.post("/from-conspect", response_model=JobRead, status_code=status.HTTP_202_ACCEPTED)
 def create_quiz_from_conspect(
     payload: QuizCreateFromConspectRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db_session),
     user: User = Depends(deps.get_current_user),
 ) -> JobRead:
     try:
         job = generation_service.create_quiz_job(db, user=user, payload=payload)
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=exc.detail,
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
-
-    background_tasks.add_task(generation_service.process_quiz_job, job.id)
     return JobRead.model_validate(job)
 
 
@@ -624,18 +629,7 @@ def create_quiz_manual(
     if not title:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Название теста не может быть пустым")
 
-    quiz = Quiz(
-        user_id=user.id,
-        title=title,
-        description=payload.description.strip() if payload.description and payload.description.strip() else None,
-        instructions=payload.instructions.strip() if payload.instructions and payload.instructions.strip() else None,
-        status=QuizStatus.READY,
-        model_used="manual",
-        raw_response={"mode": "manual"},
-    )
-    db.add(quiz)
-    db.flush()
-
+    drafts: list[QuestionDraft] = []
     for position, question_payload in enumerate(payload.questions):
         question_title = question_payload.title.strip()
         if not question_title:
@@ -648,16 +642,7 @@ def create_quiz_manual(
             if question_payload.explanation and question_payload.explanation.strip()
             else None
         )
-        question = QuizQuestion(
-            quiz_id=quiz.id,
-            user_id=user.id,
-            title=question_title,
-            explanation=explanation,
-            position=position,
-        )
-        db.add(question)
-        db.flush()
-
+        answers: list[AnswerDraft] = []
         for answer_position, answer_payload in enumerate(question_payload.answers):
             answer_text = answer_payload.text.strip()
             if not answer_text:
@@ -665,14 +650,21 @@ def create_quiz_manual(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Ответ №{answer_position + 1} в вопросе №{position + 1} не может быть пустым",
                 )
-            answer = QuizAnswer(
-                question_id=question.id,
-                user_id=user.id,
-                text=answer_text,
-                is_correct=answer_payload.is_correct,
-                position=answer_position,
-            )
-            db.add(answer)
+            answers.append(AnswerDraft(text=answer_text, is_correct=answer_payload.is_correct))
+        drafts.append(QuestionDraft(title=question_title, explanation=explanation, answers=answers))
+
+    quiz = Quiz(
+        user_id=user.id,
+        title=title,
+        description=payload.description.strip() if payload.description and payload.description.strip() else None,
+        instructions=payload.instructions.strip() if payload.instructions and payload.instructions.strip() else None,
+        status=QuizStatus.READY,
+        model_used="manual",
+        raw_response={"mode": "manual"},
+    )
+    db.add(quiz)
+    db.flush()
+    insert_quiz_questions(db, quiz_id=quiz.id, user_id=user.id, questions=drafts)
 
     db.commit()
 
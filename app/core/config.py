@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import Any, List, Optional
+from typing import Any
 
 from pydantic import Field, PostgresDsn, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -11,6 +11,9 @@ class Settings(BaseSettings):
     secret_key: str
     access_token_expire_minutes: int = 60 * 72  # 3 days
     jwt_algorithm: str = "HS256"
+    # Токен заголовка X-Internal-Token для /health/cache, /health/gemini и /health/jobs;
+    # без него эти эндпоинты закрыты
+    internal_api_token: str | None = None
 
     database_url: PostgresDsn
 
@@ -18,7 +21,8 @@ class Settings(BaseSettings):
 
     google_api_key: str
     google_model: str = "gemini-2.5-flash"
-    google_api_key_text: Optional[str] = None
+    google_api_key_text: str | None = None
+    google_api_keys: str | None = None
 
     audio_storage_dir: str = "var/audio"
     avatar_storage_dir: str = "var/avatars"
@@ -27,7 +31,87 @@ class Settings(BaseSettings):
     max_avatar_size_mb: int = 5
     max_banner_size_mb: int = 10
 
-    backend_cors_origins: List[str] = Field(default_factory=list)
+    worker_concurrency: int = 2
+    worker_poll_interval_seconds: float = 2.0
+    job_monitor_interval_seconds: float = 3.0
+    job_heartbeat_seconds: float = 15.0
+    job_lease_seconds: int = 90
+    job_max_attempts: int = 3
+    job_reaper_interval_seconds: float = 30.0
+    job_reaper_batch_size: int = 50
+
+    job_events_keepalive_seconds: float = 15.0
+    job_events_max_seconds: int = 30 * 60
+    job_long_poll_max_seconds: float = 30.0
+    job_priority_step_seconds: float = 10 * 60
+    job_cost_weight: float = 0.1
+    job_fair_share_seconds: float = 5 * 60
+    job_long_audio_seconds: float = 20 * 60
+    job_scheduler_scan_limit: int = 500
+    job_scheduler_claim_attempts: int = 5
+    admission_max_active_jobs: int = 5
+    admission_token_budget: int = 2_000_000
+    admission_token_window_seconds: int = 24 * 60 * 60
+    admission_output_tokens_per_call: int = 4000
+    admission_job_base_seconds: float = 60.0
+    admission_seconds_per_audio_second: float = 0.2
+    admission_max_retry_after_seconds: int = 60 * 60
+
+    conspect_variant_concurrency: int = 3
+    conspect_combined_generation: bool = True
+    conspect_token_budget: int = 24000
+    conspect_section_tokens: int = 6000
+    conspect_section_concurrency: int = 4
+
+    generation_cache_enabled: bool = True
+    generation_cache_ttl_seconds: int = 7 * 24 * 3600
+    generation_cache_memory_entries: int = 256
+    generation_cache_max_rows: int = 50000
+
+    gemini_rate_limit_enabled: bool = True
+    gemini_requests_per_minute: float = 60.0
+    gemini_rate_limit_burst: int = 10
+    gemini_max_in_flight: int = 8
+    gemini_acquire_timeout_seconds: float = 120.0
+    gemini_call_lease_seconds: int = 900
+    gemini_key_eject_seconds: float = 30.0
+    gemini_key_max_eject_seconds: float = 600.0
+    gemini_request_timeout_seconds: float = 300.0
+    gemini_retry_attempts: int = 4
+    gemini_retry_base_delay_seconds: float = 1.0
+    gemini_retry_max_delay_seconds: float = 20.0
+    gemini_breaker_failure_threshold: int = 5
+    gemini_breaker_reset_seconds: float = 60.0
+    job_deadline_seconds: int = 40 * 60
+    gemini_hedging_enabled: bool = False
+    gemini_hedge_percentile: float = 95.0
+    gemini_hedge_min_samples: int = 20
+    gemini_hedge_window: int = 200
+    gemini_hedge_budget_fraction: float = 0.1
+    gemini_hedge_min_delay_seconds: float = 2.0
+    gemini_hedge_other_key: bool = True
+
+    transcription_chunking_enabled: bool = True
+    transcription_chunk_min_duration_seconds: int = 15 * 60
+    transcription_segment_seconds: int = 5 * 60
+    transcription_segment_overlap_seconds: float = 3.0
+    transcription_silence_search_seconds: float = 30.0
+    transcription_segment_concurrency: int = 4
+    audio_preprocessing_enabled: bool = True
+    audio_preprocess_sample_rate: int = 16000
+    audio_preprocess_bitrate: str = "32k"
+    audio_preprocess_workers: int = 2
+    vad_enabled: bool = True
+    vad_min_silence_seconds: float = 2.0
+    vad_padding_seconds: float = 0.3
+    vad_margin_db: float = 10.0
+    vad_min_speech_ratio: float = 0.05
+    vad_min_trimmed_seconds: float = 5.0
+
+    quiz_bank_enabled: bool = True
+    quiz_bank_batch_size: int = 30
+
+    backend_cors_origins: list[str] = Field(default_factory=list)
 
     environment: str = "development"
 
@@ -35,7 +119,7 @@ class Settings(BaseSettings):
 
     @field_validator("backend_cors_origins", mode="before")
     @classmethod
-    def assemble_cors_origins(cls, value: Any) -> List[str]:
+    def assemble_cors_origins(cls, value: Any) -> list[str]:
         if isinstance(value, str):
             value = value.strip()
             if not value:
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+
+def as_naive_utc(value: datetime) -> datetime:
+    """Приводит время к naive UTC.
+
+    Колонки timestamptz после commit перечитываются aware-значениями, а в
+    коде время ставится naive datetime.utcnow(); сравнивать и вычитать их
+    можно только после приведения к одному виду.
+    """
+    if value.tzinfo is not None:
+        return value.astimezone(UTC).replace(tzinfo=None)
+    return value
@@ -1,13 +1,28 @@
-from app.models import audio, conspect, generation, quiz, session, tournament, user, user_follow  # noqa: F401
+from app.models import (  # noqa: F401
+    audio,
+    cache,
+    conspect,
+    generation,
+    question_bank,
+    quiz,
+    rate_limit,
+    session,
+    tournament,
+    user,
+    user_follow,
+)
 from app.models.base import Base
 
 __all__ = [
     "Base",
     "user",
     "audio",
+    "cache",
     "conspect",
     "quiz",
+    "question_bank",
     "generation",
+    "rate_limit",
     "session",
     "tournament",
     "user_follow",
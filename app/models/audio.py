@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
 
-from sqlalchemy import Column, DateTime, Enum as SqlEnum, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import Enum as SqlEnum
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
@@ -24,7 +24,14 @@ class AudioSource(Base):
     mime_type = Column(String(128), nullable=True)
     file_path = Column(String(1024), nullable=True)
     file_size = Column(Numeric(precision=16, scale=2), nullable=True)
+    # Моно-копия с низким битрейтом, которая уходит в Gemini; оригинал остаётся для скачивания
+    processed_file_path = Column(String(1024), nullable=True)
+    processed_mime_type = Column(String(128), nullable=True)
+    processed_file_size = Column(Numeric(precision=16, scale=2), nullable=True)
     duration_seconds = Column(Numeric(precision=8, scale=2), nullable=True)
+    speech_ratio = Column(Numeric(precision=5, scale=4), nullable=True)
+    # Сохранённые участки оригинала [[start, end], ...], если из processed-копии вырезаны паузы
+    speech_time_map = Column(JSONB, nullable=True)
     status = Column(
         SqlEnum(
             AudioProcessingStatus,
@@ -34,6 +41,7 @@ class AudioSource(Base):
         default=AudioProcessingStatus.PENDING,
         nullable=False,
     )
+    content_hash = Column(String(64), nullable=True, index=True)
     transcription = Column(Text, nullable=True)
     extra_metadata = Column(JSONB, nullable=True)
 
@@ -48,3 +56,11 @@ class AudioSource(Base):
     @property
     def is_ready(self) -> bool:
         return self.status == AudioProcessingStatus.READY
+
+    @property
+    def speech_seconds(self) -> float | None:
+        """Сколько секунд речи уйдёт в распознавание — основа оценки стоимости задачи."""
+        if self.duration_seconds is None:
+            return None
+        ratio = float(self.speech_ratio) if self.speech_ratio is not None else 1.0
+        return float(self.duration_seconds) * ratio
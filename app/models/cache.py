@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import Base
+
+
+class TranscriptCacheEntry(Base):
+    """Общий кэш транскрипций: один и тот же файл распознаётся один раз."""
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_hash = Column(String(64), nullable=False, index=True)
+    model_name = Column(String(255), nullable=False)
+    prompt_version = Column(String(32), nullable=False)
+    transcript = Column(Text, nullable=False)
+    payload = Column(JSONB, nullable=True)
+    hits = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    last_hit_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "content_hash",
+            "model_name",
+            "prompt_version",
+            name="uq_transcriptcacheentry_key",
+        ),
+    )
+
+
+class GenerationCacheEntry(Base):
+    """Общий (между процессами) уровень кэша ответов Gemini для текстовых запросов."""
+
+    cache_key = Column(String(64), primary_key=True)
+    model_name = Column(String(255), nullable=False)
+    prompt_version = Column(String(32), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_hit_at = Column(DateTime(timezone=True), nullable=True)
@@ -55,3 +55,14 @@ class Conspect(Base):
         if self.compressed_markdown:
             variants.append(ConspectVariantType.COMPRESSED)
         return variants
+
+    @property
+    def missing_variants(self) -> list[ConspectVariantType]:
+        """Запрошенные варианты, которые не удалось сгенерировать и которых в конспекте нет."""
+        errors = (self.raw_response or {}).get("variant_errors") or {}
+        available = self.available_variants
+        return [
+            variant
+            for variant in ConspectVariantType
+            if variant.value in errors and variant not in available
+        ]
@@ -1,6 +1,18 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Enum as SqlEnum, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Enum as SqlEnum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    text,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
@@ -35,13 +47,46 @@ class GenerationJob(Base):
     )
     prompt = Column(Text, nullable=True)
     response_payload = Column(JSONB, nullable=True)
+    # Сжатый транскрипт и готовые варианты конспекта: повтор задачи не генерирует их заново
+    checkpoints = Column(JSONB, nullable=True)
     error = Column(Text, nullable=True)
+    worker_id = Column(String(128), nullable=True)
+    retries = Column(Integer, nullable=False, default=0)
+    # Время стадий, токены Gemini, ретраи и попадания в кэш последней попытки
+    metrics = Column(JSONB, nullable=True)
+    # Класс приоритета и оценка в секундах речи — по ним планировщик выбирает следующую задачу
+    priority = Column(Integer, nullable=False, default=0)
+    estimated_cost = Column(Float, nullable=False, default=0.0)
+    # Ключ из заголовка Idempotency-Key и отпечаток запроса для склейки одинаковых задач
+    idempotency_key = Column(String(128), nullable=True)
+    dedup_key = Column(String(64), nullable=True)
 
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
     started_at = Column(DateTime(timezone=True), nullable=True)
     finished_at = Column(DateTime(timezone=True), nullable=True)
+    cancel_requested_at = Column(DateTime(timezone=True), nullable=True)
+    # Аренда воркера: монитор продлевает её, reaper возвращает в очередь задачи с истёкшей арендой
+    attempts = Column(Integer, nullable=False, default=0)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User")
     conspect = relationship("Conspect")
     quiz = relationship("Quiz")
     audio_source = relationship("AudioSource")
+
+    __table_args__ = (
+        Index("ix_generationjob_status_created_at", "status", "created_at"),
+        Index("ix_generationjob_status_lease_expires_at", "status", "lease_expires_at"),
+        Index("ix_generationjob_finished_at", "finished_at"),
+        UniqueConstraint("user_id", "idempotency_key", name="uq_generationjob_idempotency_key"),
+        # Одинаковые задачи пользователя не могут одновременно стоять в очереди или выполняться
+        Index(
+            "uq_generationjob_inflight_dedup",
+            "user_id",
+            "dedup_key",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'running')"),
+            sqlite_where=text("status IN ('pending', 'running')"),
+        ),
+    )
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import Base
+
+
+class BankQuestion(Base):
+    """Вопрос из банка конспекта: тесты собираются выборкой отсюда без вызова Gemini."""
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conspect_id = Column(Integer, ForeignKey("conspect.id", ondelete="CASCADE"), nullable=False)
+    # Хэш текста, по которому сгенерирован вопрос:
+    # после перегенерации конспекта старые вопросы не берутся
+    summary_hash = Column(String(64), nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    question = Column(Text, nullable=False)
+    answers = Column(JSONB, nullable=False)
+    explanation = Column(Text, nullable=True)
+    difficulty = Column(String(16), nullable=False, default="medium")
+    times_used = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "conspect_id",
+            "summary_hash",
+            "fingerprint",
+            name="uq_bankquestion_fingerprint",
+        ),
+        Index("ix_bankquestion_conspect_summary", "conspect_id", "summary_hash"),
+    )
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Integer, String
+
+from app.models.base import Base
+
+
+class GeminiRateLimit(Base):
+    """Token bucket и счётчики ожидания для одного API-ключа Gemini, общие для всех процессов."""
+
+    key_id = Column(String(32), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    refilled_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    acquired_total = Column(BigInteger, nullable=False, default=0)
+    rejected_total = Column(BigInteger, nullable=False, default=0)
+    wait_ms_total = Column(BigInteger, nullable=False, default=0)
+    wait_ms_max = Column(Integer, nullable=False, default=0)
+
+
+class GeminiCallLease(Base):
+    """Слот одного выполняющегося запроса; протухшие слоты упавших процессов не учитываются."""
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    key_id = Column(String(32), nullable=False, index=True)
+    holder = Column(String(128), nullable=True)
+    acquired_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class UserJobQuota(Base):
+    """Счётчики допуска задач пользователя.
+
+    Меняются инкрементально при постановке и завершении задач.
+    """
+
+    user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    active_jobs = Column(Integer, nullable=False, default=0)
+    # Скользящее окно токенов приближается двумя соседними фиксированными окнами
+    window_started_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    window_tokens = Column(BigInteger, nullable=False, default=0)
+    previous_window_tokens = Column(BigInteger, nullable=False, default=0)
@@ -1,5 +1,4 @@
 from datetime import datetime
-from typing import Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -8,13 +7,15 @@ from app.models.enums import AudioProcessingStatus, AudioSourceType
 
 class AudioSourceRead(BaseModel):
     id: int
-    user_id: Optional[int] = None
+    user_id: int | None = None
     source_type: AudioSourceType
-    original_filename: Optional[str] = None
-    mime_type: Optional[str] = None
-    file_path: Optional[str] = None
-    file_size: Optional[float] = None
-    duration_seconds: Optional[float] = None
+    original_filename: str | None = None
+    mime_type: str | None = None
+    file_path: str | None = None
+    file_size: float | None = None
+    processed_file_size: float | None = None
+    duration_seconds: float | None = None
+    speech_ratio: float | None = None
     status: AudioProcessingStatus
     created_at: datetime
     updated_at: datetime
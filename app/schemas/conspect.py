@@ -29,6 +29,7 @@ class ConspectRead(ConspectBase):
     audio_source_id: Optional[int] = None
     audio_source: Optional[AudioSourceRead] = None
     available_variants: List[ConspectVariantType] = Field(default_factory=list)
+    missing_variants: list[ConspectVariantType] = Field(default_factory=list)
 
 
 class ConspectCreateRequest(BaseModel):
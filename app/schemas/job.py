@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any
 
 from pydantic import BaseModel, ConfigDict
 
@@ -11,12 +11,22 @@ class JobRead(BaseModel):
     user_id: int
     job_type: GenerationJobType
     status: GenerationJobStatus
-    conspect_id: Optional[int] = None
-    quiz_id: Optional[int] = None
-    audio_source_id: Optional[int] = None
-    error: Optional[str] = None
+    conspect_id: int | None = None
+    quiz_id: int | None = None
+    audio_source_id: int | None = None
+    error: str | None = None
+    retries: int = 0
+    attempts: int = 0
+    priority: int = 0
+    queue_position: int | None = None
     created_at: datetime
-    started_at: Optional[datetime] = None
-    finished_at: Optional[datetime] = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    cancel_requested_at: datetime | None = None
+    metrics: dict[str, Any] | None = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class JobListResponse(BaseModel):
+    items: list[JobRead]
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.timeutils import as_naive_utc
+from app.models.enums import GenerationJobStatus
+from app.models.generation import GenerationJob
+from app.models.rate_limit import UserJobQuota
+from app.services.ai.chunking import estimate_tokens
+
+# Gemini считает аудио по 32 токена в секунду
+AUDIO_TOKENS_PER_SECOND = 32
+# ~150 слов в минуту речи — размер транскрипта, который уйдёт в генерацию вариантов
+TRANSCRIPT_TOKENS_PER_SECOND = 4
+
+ACTIVE_JOB_STATUSES = (GenerationJobStatus.PENDING, GenerationJobStatus.RUNNING)
+
+
+class AdmissionRejected(Exception):  # noqa: N818
+    """Пользователь упёрся в лимит задач или токенов; повторить можно через retry_after секунд."""
+
+    def __init__(self, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def estimate_conspect_tokens(
+    *, variants_count: int, audio_seconds: float = 0.0, text: str | None = None
+) -> int:
+    """Оценка токенов задачи конспекта: распознавание аудио плюс генерация каждого варианта."""
+    if text:
+        source_tokens = estimate_tokens(text)
+    else:
+        source_tokens = int(audio_seconds * TRANSCRIPT_TOKENS_PER_SECOND)
+    per_variant = source_tokens + settings.admission_output_tokens_per_call
+    return int(audio_seconds * AUDIO_TOKENS_PER_SECOND) + max(variants_count, 1) * per_variant
+
+
+def estimate_quiz_tokens(source_text: str | None) -> int:
+    return estimate_tokens(source_text or "") + settings.admission_output_tokens_per_call
+
+
+class AdmissionController:
+    """Допуск новых задач генерации: лимит активных задач
+    и скользящий бюджет токенов на пользователя.
+
+    Счётчики лежат в строке userjobquota и меняются инкрементально: admit
+    увеличивает их в транзакции создания задачи (строка блокируется, поэтому
+    параллельные запросы одного пользователя не проскочат лимит), release
+    уменьшает число активных задач при завершении. Запросов COUNT на пути
+    допуска нет — очередь пользователя читается, только чтобы посчитать
+    Retry-After для отказа.
+    """
+
+    def admit(self, session: Session, user_id: int, *, tokens: int) -> None:
+        now = datetime.utcnow()
+        quota = self._locked_quota(session, user_id)
+        self._roll_window(quota, now)
+
+        max_active = settings.admission_max_active_jobs
+        if max_active > 0 and quota.active_jobs >= max_active:
+            retry_after = self._jobs_retry_after(session, user_id, now)
+            logging.info(
+                "User %s rejected: %s active jobs, retry in %ss",
+                user_id,
+                quota.active_jobs,
+                retry_after,
+            )
+            raise AdmissionRejected(
+                f"Одновременно можно запустить не больше {max_active} задач. "
+                "Дождись завершения текущих.",
+                retry_after,
+            )
+
+        budget = settings.admission_token_budget
+        # Задача больше всего бюджета допускается, когда окно пустое —
+        # иначе она не прошла бы никогда
+        needed = min(tokens, budget)
+        if budget > 0 and self._window_usage(quota, now) + needed > budget:
+            retry_after = self._tokens_retry_after(quota, now, needed)
+            logging.info(
+                "User %s rejected: token budget exhausted, retry in %ss",
+                user_id,
+                retry_after,
+            )
+            raise AdmissionRejected("Исчерпан лимит генераций. Попробуй позже.", retry_after)
+
+        quota.active_jobs += 1
+        quota.window_tokens += tokens
+
+    def release(self, session: Session, user_id: int) -> None:
+        """Освобождает слот завершённой задачи.
+
+        Вызывается в той же транзакции, что и смена статуса.
+        """
+        session.query(UserJobQuota).filter(UserJobQuota.user_id == user_id).update(
+            {
+                UserJobQuota.active_jobs: case(
+                    (UserJobQuota.active_jobs > 0, UserJobQuota.active_jobs - 1),
+                    else_=0,
+                )
+            },
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def _locked_quota(session: Session, user_id: int) -> UserJobQuota:
+        query = (
+            session.query(UserJobQuota)
+            .filter(UserJobQuota.user_id == user_id)
+            .with_for_update()
+        )
+        quota = query.one_or_none()
+        if quota is not None:
+            return quota
+        try:
+            with session.begin_nested():
+                session.add(
+                    UserJobQuota(
+                        user_id=user_id,
+                        active_jobs=0,
+                        window_started_at=datetime.utcnow(),
+                        window_tokens=0,
+                        previous_window_tokens=0,
+                    )
+                )
+        except IntegrityError:
+            # Строку параллельно создал другой запрос того же пользователя
+            pass
+        return query.populate_existing().one()
+
+    @staticmethod
+    def _roll_window(quota: UserJobQuota, now: datetime) -> None:
+        window = timedelta(seconds=settings.admission_token_window_seconds)
+        elapsed = now - as_naive_utc(quota.window_started_at)
+        if elapsed < window:
+            return
+        if elapsed < 2 * window:
+            quota.previous_window_tokens = quota.window_tokens
+            quota.window_started_at = as_naive_utc(quota.window_started_at) + window
+        else:
+            quota.previous_window_tokens = 0
+            quota.window_started_at = now
+        quota.window_tokens = 0
+
+    @staticmethod
+    def _window_usage(quota: UserJobQuota, now: datetime) -> float:
+        window = settings.admission_token_window_seconds
+        elapsed = (now - as_naive_utc(quota.window_started_at)).total_seconds()
+        return quota.previous_window_tokens * max(1.0 - elapsed / window, 0.0) + quota.window_tokens
+
+    @staticmethod
+    def _tokens_retry_after(quota: UserJobQuota, now: datetime, needed: int) -> int:
+        window = settings.admission_token_window_seconds
+        elapsed = (now - as_naive_utc(quota.window_started_at)).total_seconds()
+        room = settings.admission_token_budget - needed
+        current = quota.window_tokens
+        previous = quota.previous_window_tokens
+        if current <= room and previous > 0:
+            # Хватит того, что вес прошлого окна догорит до нужного уровня
+            wait = window * (1.0 - (room - current) / previous) - elapsed
+        else:
+            # Ждём смены окна, а затем пока догорит вес нынешнего
+            wait = (window - elapsed) + (window * (1.0 - room / current) if current > 0 else 0.0)
+        return _clamp_retry_after(wait)
+
+    @staticmethod
+    def _jobs_retry_after(session: Session, user_id: int, now: datetime) -> int:
+        jobs = (
+            session.query(
+                GenerationJob.status,
+                GenerationJob.estimated_cost,
+                GenerationJob.started_at,
+            )
+            .filter(GenerationJob.user_id == user_id, GenerationJob.status.in_(ACTIVE_JOB_STATUSES))
+            .all()
+        )
+        estimates: list[float] = []
+        for status, estimated_cost, started_at in jobs:
+            expected = (
+                settings.admission_job_base_seconds
+                + (estimated_cost or 0.0) * settings.admission_seconds_per_audio_second
+            )
+            if status == GenerationJobStatus.RUNNING and started_at is not None:
+                expected -= (now - as_naive_utc(started_at)).total_seconds()
+            estimates.append(expected)
+        # Слот освободится, когда закончится ближайшая задача; просроченные оценки — «вот-вот»
+        wait = min(estimates) if estimates else 0.0
+        return _clamp_retry_after(max(wait, settings.worker_poll_interval_seconds))
+
+
+def _clamp_retry_after(seconds: float) -> int:
+    return int(min(max(math.ceil(seconds), 1), settings.admission_max_retry_after_seconds))
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.cache import GenerationCacheEntry
+
+
+class GenerationResultCache:
+    """Двухуровневый кэш JSON-ответов Gemini.
+
+    Первый уровень — LRU в памяти процесса с ограничением по размеру и TTL,
+    второй — таблица generationcacheentry, общая для всех gunicorn-воркеров и
+    узлов с воркерами очереди. Ключ — sha256 от модели, версии промптов,
+    текста промпта и текстовых частей запроса.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] | None,
+        *,
+        ttl_seconds: int,
+        memory_entries: int,
+        max_rows: int,
+        purge_interval_seconds: int = 600,
+    ) -> None:
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self.purge_interval_seconds = purge_interval_seconds
+        self._memory: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+    def make_key(
+        self,
+        *,
+        model_name: str,
+        prompt_version: str,
+        prompt: str,
+        contents: list[Any] | None,
+    ) -> str | None:
+        texts: list[str] = []
+        for part in contents or []:
+            # Файлы (аудио) не кэшируем здесь: для них есть кэш транскрипций
+            if not isinstance(part, dict) or set(part) != {"text"}:
+                return None
+            texts.append(str(part["text"]))
+        raw = json.dumps([model_name, prompt_version, prompt, texts], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expires_at, payload = item
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    return copy.deepcopy(payload)
+                del self._memory[key]
+
+        payload = self._get_shared(key)
+        if payload is not None:
+            self._remember(key, payload, now + self.ttl_seconds)
+            return copy.deepcopy(payload)
+        return None
+
+    def set(
+        self, key: str, payload: dict[str, Any], *, model_name: str, prompt_version: str
+    ) -> None:
+        self._remember(key, copy.deepcopy(payload), time.time() + self.ttl_seconds)
+        self._set_shared(key, payload, model_name=model_name, prompt_version=prompt_version)
+        self._maybe_purge()
+
+    def delete(self, key: str) -> None:
+        """Убирает запись из обоих уровней, например ответ, не прошедший проверку."""
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.session_factory is None:
+            return
+        session = self.session_factory()
+        try:
+            session.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.cache_key == key
+            ).delete(synchronize_session=False)
+            session.commit()
+        except Exception as exc:  # noqa: BLE001
+            session.rollback()
+            logging.warning("Generation cache delete failed: %s", exc)
+        finally:
+            session.close()
+
+    def stats(self, session: Session) -> dict[str, int]:
+        entries, hits = session.query(
+            func.count(GenerationCacheEntry.cache_key),
+            func.coalesce(func.sum(GenerationCacheEntry.hits), 0),
+        ).one()
+        return {"entries": int(entries), "hits": int(hits), "memory_entries": len(self._memory)}
+
+    def purge_expired(self) -> None:
+        if self.session_factory is None:
+            return
+        session = self.session_factory()
+        try:
+            session.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.expires_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+            overflow = (
+                session.query(GenerationCacheEntry.cache_key)
+                .order_by(
+                    func.coalesce(
+                        GenerationCacheEntry.last_hit_at, GenerationCacheEntry.created_at
+                    ).desc()
+                )
+                .offset(self.max_rows)
+                .subquery()
+            )
+            session.query(GenerationCacheEntry).filter(
+                GenerationCacheEntry.cache_key.in_(overflow.select())
+            ).delete(synchronize_session=False)
+            session.commit()
+        except Exception as exc:  # noqa: BLE001
+            session.rollback()
+            logging.warning("Generation cache purge failed: %s", exc)
+        finally:
+            session.close()
+
+    def _remember(self, key: str, payload: dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _get_shared(self, key: str) -> dict[str, Any] | None:
+        if self.session_factory is None:
+            return None
+        session = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            entry = (
+                session.query(GenerationCacheEntry)
+                .filter(
+                    GenerationCacheEntry.cache_key == key,
+                    GenerationCacheEntry.expires_at > now,
+                )
+                .one_or_none()
+            )
+            if entry is None:
+                return None
+            payload = entry.payload
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_hit_at = now
+            session.commit()
+            return payload
+        except Exception as exc:  # noqa: BLE001
+            session.rollback()
+            logging.warning("Generation cache lookup failed: %s", exc)
+            return None
+        finally:
+            session.close()
+
+    def _set_shared(
+        self,
+        key: str,
+        payload: dict[str, Any],
+        *,
+        model_name: str,
+        prompt_version: str,
+    ) -> None:
+        if self.session_factory is None:
+            return
+        session = self.session_factory()
+        try:
+            session.add(
+                GenerationCacheEntry(
+                    cache_key=key,
+                    model_name=model_name,
+                    prompt_version=prompt_version,
+                    payload=payload,
+                    hits=0,
+                    expires_at=datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+                )
+            )
+            session.commit()
+        except IntegrityError:
+            # Ответ на тот же запрос уже сохранил другой процесс
+            session.rollback()
+        except Exception as exc:  # noqa: BLE001
+            session.rollback()
+            logging.warning("Generation cache store failed: %s", exc)
+        finally:
+            session.close()
+
+    def _maybe_purge(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval_seconds:
+                return
+            self._last_purge = now
+        self.purge_expired()
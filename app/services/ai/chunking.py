@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import re
+
+# Грубая оценка для русского текста: токенизатор Gemini в среднем режет кириллицу мельче латиницы
+CHARS_PER_TOKEN = 3
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_into_sections(text: str, max_tokens: int) -> list[str]:
+    """Режет текст на разделы не длиннее max_tokens по границам абзацев и предложений.
+
+    Абзацы упаковываются в раздел целиком, пока он влезает в бюджет; слишком
+    длинный абзац делится по предложениям, а предложение-монстр (транскрипт без
+    пунктуации) — по словам.
+    """
+    max_chars = max(max_tokens, 1) * CHARS_PER_TOKEN
+    units: list[tuple[str, str]] = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            units.append((paragraph, "\n\n"))
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if len(sentence) <= max_chars:
+                units.append((sentence, " "))
+                continue
+            units.extend((piece, " ") for piece in _split_words(sentence, max_chars))
+        # После последнего предложения абзаца снова нужен разрыв абзаца
+        if units:
+            units[-1] = (units[-1][0], "\n\n")
+
+    sections: list[str] = []
+    current = ""
+    separator = ""
+    for unit, unit_separator in units:
+        candidate = f"{current}{separator}{unit}" if current else unit
+        if current and len(candidate) > max_chars:
+            sections.append(current)
+            candidate = unit
+        current = candidate
+        separator = unit_separator
+    if current:
+        sections.append(current)
+    return sections
+
+
+def _split_words(text: str, max_chars: int) -> list[str]:
+    pieces: list[str] = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and len(candidate) > max_chars:
+            pieces.append(current)
+            candidate = word
+        current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+# Файл, который истечёт во время распознавания, бесполезен — такой handle не переиспользуем
+EXPIRY_MARGIN = timedelta(minutes=10)
+
+
+def _parse_time(value: Any) -> datetime | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=UTC)
+
+
+class UploadedFiles:
+    """Handles файлов, уже загруженных в Gemini, для одной аудиозаписи.
+
+    Ключ — отпечаток API-ключа и хэш содержимого: загруженный файл виден только
+    ключу, который его загрузил. Сериализуется в AudioSource.extra_metadata["gemini_files"],
+    так что ретраи и повторные распознавания не грузят ту же запись заново.
+    """
+
+    def __init__(self, entries: dict[str, Any] | None = None) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict[str, Any]] = {
+            key: dict(value) for key, value in (entries or {}).items() if isinstance(value, dict)
+        }
+
+    @staticmethod
+    def _key(key_id: str, content_key: str) -> str:
+        return f"{key_id[:16]}:{content_key}"
+
+    def get(self, key_id: str, content_key: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(self._key(key_id, content_key))
+        if entry is None:
+            return None
+        expires_at = _parse_time(entry.get("expires_at"))
+        if expires_at is None or expires_at - EXPIRY_MARGIN <= datetime.now(UTC):
+            self.discard(key_id, content_key)
+            return None
+        return dict(entry)
+
+    def put(
+        self,
+        key_id: str,
+        content_key: str,
+        *,
+        name: str,
+        uri: str,
+        expires_at: datetime | None,
+    ) -> None:
+        if expires_at is None:
+            return
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=UTC)
+        with self._lock:
+            self._entries[self._key(key_id, content_key)] = {
+                "name": name,
+                "uri": uri,
+                "expires_at": expires_at.isoformat(),
+            }
+
+    def discard(self, key_id: str, content_key: str) -> None:
+        with self._lock:
+            self._entries.pop(self._key(key_id, content_key), None)
+
+    def to_metadata(self) -> dict[str, dict[str, Any]]:
+        """Живые handles для записи в JSONB; истёкшие отбрасываются."""
+        now = datetime.now(UTC)
+        with self._lock:
+            return {
+                key: dict(entry)
+                for key, entry in self._entries.items()
+                if (expires_at := _parse_time(entry.get("expires_at"))) is not None
+                and expires_at > now
+            }
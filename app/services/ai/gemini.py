@@ -1,34 +1,182 @@
 from __future__ import annotations
 
 import json
+import logging
+from collections.abc import Callable, Sequence
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any
 
 import google.generativeai as genai
 from fastapi import HTTPException, status
+from google.generativeai.client import _ClientManager
 
 from app.core.config import settings
+from app.db.session import SessionLocal
 from app.models.enums import ConspectVariantType
+from app.services.ai.cache import GenerationResultCache
+from app.services.ai.files import UploadedFiles
+from app.services.ai.governor import GeminiGovernor, key_fingerprint
+from app.services.ai.hedging import Hedger, raise_if_cancelled
+from app.services.ai.pool import GeminiClientPool
+from app.services.ai.resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    call_with_retry,
+    raise_if_job_cancelled,
+    remaining_time,
+)
+from app.services.ai.telemetry import current_stats, timed_stage
+
+# Меняется вместе с текстом промпта в transcribe_audio,
+# чтобы не отдавать из кэша старые транскрипции
+TRANSCRIPTION_PROMPT_VERSION = "1"
+# То же для промптов конспектов и тестов: смена версии инвалидирует кэш ответов
+GENERATION_PROMPT_VERSION = "1"
 
 
 class GeminiClient:
-    def __init__(self, api_key: str, model_name: str) -> None:
-        genai.configure(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model_name: str,
+        result_cache: GenerationResultCache | None = None,
+        governor: GeminiGovernor | None = None,
+        retry_policy: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        hedger: Hedger | None = None,
+    ) -> None:
+        # genai.configure глобален: с ним все клиенты ходили бы с последним ключом,
+        # поэтому у каждого клиента свой менеджер с собственными gRPC-клиентами.
+        # _ClientManager и GenerativeModel._client — приватный API google-generativeai,
+        # поэтому пакет закреплён на проверенной минорной версии 0.5 (pyproject.toml)
+        self._clients = _ClientManager()
+        self._clients.configure(api_key=api_key)
+        self.key_id = key_fingerprint(api_key)
         self.model_name = model_name
         self._model = genai.GenerativeModel(model_name)
+        self._model._client = self._clients.get_default_client("generative")
+        self.result_cache = result_cache
+        self.governor = governor
+        self.retry_policy = retry_policy or RetryPolicy(
+            attempts=1, base_delay_seconds=0, max_delay_seconds=0
+        )
+        self.breaker = breaker
+        self.hedger = hedger
+        # Пул подставляет сюда запуск запроса на другом ключе для hedge-запросов
+        self.hedge_router: Callable[[Callable[[GeminiClient], Any]], Any] | None = None
+
+    def _resilient(self, operation: Callable[[], Any], description: str) -> Any:
+        return call_with_retry(
+            operation,
+            policy=self.retry_policy,
+            breaker=self.breaker,
+            description=f"{description} (key {self.key_id[:8]})",
+        )
+
+    def _request_options(self) -> dict[str, float]:
+        timeout = settings.gemini_request_timeout_seconds
+        remaining = remaining_time()
+        if remaining is not None:
+            timeout = max(min(timeout, remaining), 1.0)
+        return {"timeout": timeout}
+
+    def _generate_json(
+        self,
+        prompt: str,
+        contents: list[Any] | None = None,
+        *,
+        cache_label: str | None = None,
+        validate: Callable[[Any], bool] | None = None,
+    ) -> dict[str, Any]:
+        """JSON-ответ Gemini через кэш результатов.
+
+        В кэш попадает только ответ, прошедший validate: иначе битый ответ
+        отдавался бы из кэша каждому повтору до истечения TTL.
+        """
+        cache_key = None
+        if self.result_cache is not None and cache_label:
+            cache_key = self.result_cache.make_key(
+                model_name=self.model_name,
+                prompt_version=GENERATION_PROMPT_VERSION,
+                prompt=prompt,
+                contents=contents,
+            )
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None and validate is not None and not validate(cached):
+                self.result_cache.delete(cache_key)
+                cached = None
+            stats = current_stats()
+            if stats is not None:
+                stats.record_cache(cache_label, "hit" if cached is not None else "miss")
+            if cached is not None:
+                return cached
+
+        data = self._send(prompt, contents, label=cache_label)
+        valid = isinstance(data, dict) and (validate is None or validate(data))
+        if cache_key is not None and valid:
+            self.result_cache.set(
+                cache_key,
+                data,
+                model_name=self.model_name,
+                prompt_version=GENERATION_PROMPT_VERSION,
+            )
+        return data
+
+    def _send(
+        self,
+        prompt: str,
+        contents: list[Any] | None = None,
+        *,
+        label: str | None = None,
+    ) -> dict[str, Any]:
+        def request(client: GeminiClient) -> dict[str, Any]:
+            return client._resilient(
+                lambda: client._request_json(prompt, contents), "Gemini generate_content"
+            )
+
+        # Хеджируются только текстовые запросы:
+        # загруженный файл виден лишь ключу, который его загрузил
+        if self.hedger is None or label is None:
+            return request(self)
+
+        def backup() -> dict[str, Any]:
+            if self.hedge_router is not None:
+                return self.hedge_router(request)
+            return request(self)
 
-    def _generate_json(self, prompt: str, contents: Optional[List[Any]] = None) -> Dict[str, Any]:
+        return self.hedger.run(label, lambda: request(self), backup)
+
+    def _request_json(self, prompt: str, contents: list[Any] | None = None) -> dict[str, Any]:
         generation_config = {
             "temperature": 0.3,
             "top_p": 0.9,
             "top_k": 32,
             "response_mime_type": "application/json",
         }
-        parts: List[Any] = [{"text": prompt}]
+        parts: list[Any] = [{"text": prompt}]
         if contents:
             parts = contents + parts
 
-        response = self._model.generate_content(parts, generation_config=generation_config)
+        slot = nullcontext()
+        if self.governor is not None:
+            remaining = remaining_time()
+            slot_timeout = None
+            if remaining is not None:
+                slot_timeout = max(min(remaining, self.governor.acquire_timeout_seconds), 0.0)
+            slot = self.governor.slot(slot_timeout)
+        with slot:
+            raise_if_job_cancelled()
+            raise_if_cancelled()
+            response = self._model.generate_content(
+                parts,
+                generation_config=generation_config,
+                request_options=self._request_options(),
+            )
+        stats = current_stats()
+        if stats is not None:
+            stats.record_usage(getattr(response, "usage_metadata", None))
         try:
             text = response.text if hasattr(response, "text") else response.candidates[0].content.parts[0].text
         except (AttributeError, IndexError) as exc:
@@ -45,10 +193,65 @@ class GeminiClient:
                 detail="Failed to decode Gemini JSON response",
             ) from exc
 
-    def transcribe_audio(self, file_path: Path, mime_type: str | None = None) -> Dict[str, Any]:
-        uploaded_file = genai.upload_file(
-            path=str(file_path),
-            mime_type=mime_type or "audio/mpeg",
+    def _upload_file(
+        self,
+        file_path: Path,
+        mime_type: str | None,
+        *,
+        content_key: str | None = None,
+        uploaded_files: UploadedFiles | None = None,
+    ) -> genai.types.File:
+        file_client = self._clients.get_default_client("file")
+        reuse = uploaded_files is not None and content_key is not None
+        if reuse:
+            handle = uploaded_files.get(self.key_id, content_key)
+            if handle is not None:
+                try:
+                    existing = genai.types.File(file_client.get_file(name=handle["name"]))
+                    if existing.state.name == "ACTIVE":
+                        logging.info(
+                            "Reusing uploaded Gemini file %s for %s", existing.name, file_path.name
+                        )
+                        return existing
+                except Exception as exc:  # noqa: BLE001
+                    logging.info("Uploaded Gemini file %s is gone: %s", handle["name"], exc)
+                uploaded_files.discard(self.key_id, content_key)
+
+        with timed_stage("upload"):
+            uploaded_file = genai.types.File(
+                self._resilient(
+                    lambda: file_client.create_file(
+                        path=file_path,
+                        mime_type=mime_type or "audio/mpeg",
+                        display_name=file_path.name,
+                    ),
+                    "Gemini file upload",
+                )
+            )
+        if reuse:
+            uploaded_files.put(
+                self.key_id,
+                content_key,
+                name=uploaded_file.name,
+                uri=uploaded_file.uri,
+                expires_at=uploaded_file.expiration_time,
+            )
+        return uploaded_file
+
+    def transcribe_audio(
+        self,
+        file_path: Path,
+        mime_type: str | None = None,
+        *,
+        content_key: str | None = None,
+        uploaded_files: UploadedFiles | None = None,
+    ) -> dict[str, Any]:
+        """Распознаёт запись; с content_key и uploaded_files переиспользует уже загруженный файл."""
+        uploaded_file = self._upload_file(
+            file_path,
+            mime_type,
+            content_key=content_key,
+            uploaded_files=uploaded_files,
         )
         prompt = (
             "Ты — внимательный транскрибер. Переведи аудиофайл в полный текст. "
@@ -56,9 +259,16 @@ class GeminiClient:
         )
         return self._generate_json(prompt, contents=[uploaded_file])
 
-    def _conspect_prompt(self, variant: ConspectVariantType) -> str:
-        base_prompt = (
-            "You will receive a text in Russian that was transcribed from audio.\n\n"
+    def _conspect_base_prompt(self, from_sections: bool = False) -> str:
+        source = (
+            "You will receive notes on consecutive sections of a long Russian text "
+            "that was transcribed from audio. "
+            "The notes are in order and together cover the whole text.\n\n"
+            if from_sections
+            else "You will receive a text in Russian that was transcribed from audio.\n\n"
+        )
+        return (
+            f"{source}"
             "Your task: create a structured summary (конспект) of this text in Russian.\n\n"
             "Use Markdown formatting:\n"
             "- Include clear headings, subheadings, and bullet points\n"
@@ -66,25 +276,28 @@ class GeminiClient:
             "- Add a final summary or conclusion\n\n"
             "Keep the tone clear, logical, and easy to read. The output should be ready for display in a chat interface."
         )
+
+    def _variant_prompt(self, variant: ConspectVariantType) -> str:
         if variant == ConspectVariantType.FULL:
-            variant_prompt = (
+            return (
                 "Variant type: ФАКТИЧЕСКИЙ (full).\n"
                 "Сохрани максимум деталей и всю фактическую канву выступления. Передавай аргументы, цифры, имена, "
                 "хронологию и причинно-следственные связи. Каждый раздел должен включать вводный абзац и короткое "
                 "подытоживание того, почему блок важен."
             )
-        elif variant == ConspectVariantType.BRIEF:
-            variant_prompt = (
+        if variant == ConspectVariantType.BRIEF:
+            return (
                 "Variant type: КРАТКИЙ (brief).\n"
                 "Нужен баланс между деталями и ёмкостью. Собери основные тезисы и опиши ключевые выводы, разделяя текст "
                 "на короткие абзацы и маркированные списки. Убирай второстепенные примеры, но оставляй связи между идеями."
             )
-        else:
-            variant_prompt = (
-                "Variant type: СЖАТЫЙ (compressed).\n"
-                "Сделай ультракороткую выжимку: 5–7 пунктов, каждый — одно предложение о факте/выводе. "
-                "Не используй воду, не повторяйся, избегай длинных абзацев. Это шпаргалка для быстрого повтора."
-            )
+        return (
+            "Variant type: СЖАТЫЙ (compressed).\n"
+            "Сделай ультракороткую выжимку: 5–7 пунктов, каждый — одно предложение о факте/выводе. "
+            "Не используй воду, не повторяйся, избегай длинных абзацев. Это шпаргалка для быстрого повтора."
+        )
+
+    def _conspect_prompt(self, variant: ConspectVariantType, from_sections: bool = False) -> str:
         format_prompt = (
             "Return a JSON object with the following structure:\n"
             '{\n'
@@ -94,17 +307,157 @@ class GeminiClient:
             '}\n'
             "Ensure the JSON is valid and do not include any extra text outside of the JSON object."
         )
-        return f"{base_prompt}\n\nVariant: {variant.value}.\n{variant_prompt}\n\n{format_prompt}"
+        return (
+            f"{self._conspect_base_prompt(from_sections)}\n\n"
+            f"Variant: {variant.value}.\n{self._variant_prompt(variant)}"
+            f"\n\n{format_prompt}"
+        )
+
+    def _combined_conspect_prompt(
+        self,
+        variants: Sequence[ConspectVariantType],
+        from_sections: bool = False,
+    ) -> str:
+        variant_sections = "\n\n".join(
+            f"Variant: {variant.value}.\n{self._variant_prompt(variant)}" for variant in variants
+        )
+        keys = ", ".join(f'"{variant.value}"' for variant in variants)
+        format_prompt = (
+            "Create every variant listed above from the same text. "
+            "Each variant is an independent summary and must follow its own instructions.\n"
+            "Return a JSON object with the following structure:\n"
+            '{\n'
+            '  "variants": {\n'
+            '    "<variant>": {\n'
+            '      "title": "short descriptive title in Russian",\n'
+            '      "markdown": "the full Markdown summary",\n'
+            '      "key_points": ["list of 3-6 key bullet points in Russian"]\n'
+            '    }\n'
+            '  }\n'
+            '}\n'
+            f"The \"variants\" object must contain exactly these keys: {keys}.\n"
+            "Ensure the JSON is valid and do not include any extra text outside of the JSON object."
+        )
+        base_prompt = self._conspect_base_prompt(from_sections)
+        return f"{base_prompt}\n\n{variant_sections}\n\n{format_prompt}"
+
+    def _section_prompt(self, index: int, total: int) -> str:
+        return (
+            f"You will receive part {index + 1} of {total} of a long Russian text "
+            "that was transcribed from audio.\n\n"
+            "Your task: write detailed notes on this part in Russian. "
+            "They will later be merged with the notes on the other parts into a single summary, "
+            "so do not add an introduction or a conclusion.\n"
+            "Keep every argument, number, name, date and definition; "
+            "drop filler words and repetitions.\n\n"
+            "Return a JSON object with the following structure:\n"
+            '{\n'
+            '  "markdown": "notes on this part in Markdown",\n'
+            '  "key_points": ["list of 2-5 key bullet points in Russian"]\n'
+            '}\n'
+            "Ensure the JSON is valid and do not include any extra text outside of the JSON object."
+        )
+
+    def _validate_variant_payload(self, payload: Any) -> dict[str, Any] | None:
+        if not isinstance(payload, dict):
+            return None
+        markdown = payload.get("markdown")
+        if not isinstance(markdown, str) or not markdown.strip():
+            return None
+        title = payload.get("title")
+        key_points = payload.get("key_points")
+        return {
+            "title": title if isinstance(title, str) else "",
+            "markdown": markdown,
+            "key_points": (
+                [str(point) for point in key_points] if isinstance(key_points, list) else []
+            ),
+        }
+
+    @staticmethod
+    def _has_markdown(payload: Any) -> bool:
+        markdown = payload.get("markdown") if isinstance(payload, dict) else None
+        return isinstance(markdown, str) and bool(markdown.strip())
+
+    @staticmethod
+    def _has_questions(payload: Any) -> bool:
+        questions = payload.get("questions") if isinstance(payload, dict) else None
+        return isinstance(questions, list) and bool(questions)
+
+    def summarize_section(self, section: str, index: int, total: int) -> dict[str, Any]:
+        """Map-шаг для длинных транскриптов: конспект одного раздела."""
+        data = self._generate_json(
+            self._section_prompt(index, total),
+            contents=[{"text": section}],
+            cache_label=f"section:{index}",
+            validate=self._has_markdown,
+        )
+        if not self._has_markdown(data):
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="Gemini returned empty section notes",
+            )
+        key_points = data.get("key_points")
+        return {
+            "markdown": data["markdown"],
+            "key_points": (
+                [str(point) for point in key_points] if isinstance(key_points, list) else []
+            ),
+        }
 
     def generate_conspect_variant(
         self,
         transcript: str,
         variant: ConspectVariantType,
-    ) -> Dict[str, Any]:
-        prompt = self._conspect_prompt(variant)
-        return self._generate_json(prompt, contents=[{"text": transcript}])
+        from_sections: bool = False,
+    ) -> dict[str, Any]:
+        prompt = self._conspect_prompt(variant, from_sections)
+        return self._generate_json(
+            prompt,
+            contents=[{"text": transcript}],
+            cache_label=f"variant:{variant.value}",
+            validate=self._has_markdown,
+        )
+
+    def generate_conspect_variants(
+        self,
+        transcript: str,
+        variants: Sequence[ConspectVariantType],
+        from_sections: bool = False,
+    ) -> dict[str, dict[str, Any]]:
+        """Генерирует несколько вариантов одним запросом, отправляя транскрипт один раз.
 
-    def generate_conspect(self, transcript: str) -> Dict[str, Dict[str, Any]]:
+        Возвращает только варианты, прошедшие проверку; недостающие вызывающий код
+        догенерирует по одному через ``generate_conspect_variant``.
+        """
+        prompt = self._combined_conspect_prompt(variants, from_sections)
+
+        def complete(payload: Any) -> bool:
+            # Неполный ответ не кэшируем, иначе каждый повтор уходил бы в догенерацию по одному
+            raw = payload.get("variants") if isinstance(payload, dict) else None
+            return isinstance(raw, dict) and all(
+                self._validate_variant_payload(raw.get(variant.value)) is not None
+                for variant in variants
+            )
+
+        data = self._generate_json(
+            prompt,
+            contents=[{"text": transcript}],
+            cache_label="variants:" + "+".join(variant.value for variant in variants),
+            validate=complete,
+        )
+        raw_variants = data.get("variants") if isinstance(data, dict) else None
+        if not isinstance(raw_variants, dict):
+            return {}
+
+        result: dict[str, dict[str, Any]] = {}
+        for variant in variants:
+            payload = self._validate_variant_payload(raw_variants.get(variant.value))
+            if payload is not None:
+                result[variant.value] = payload
+        return result
+
+    def generate_conspect(self, transcript: str) -> dict[str, dict[str, Any]]:
         return {
             ConspectVariantType.FULL.value: self.generate_conspect_variant(transcript, ConspectVariantType.FULL),
             ConspectVariantType.COMPRESSED.value: self.generate_conspect_variant(
@@ -112,7 +465,7 @@ class GeminiClient:
             ),
         }
 
-    def generate_quiz(self, conspect_summary: str, questions_count: int = 5) -> Dict[str, Any]:
+    def generate_quiz(self, conspect_summary: str, questions_count: int = 5) -> dict[str, Any]:
         prompt = (
             f"Сформируй тест из {questions_count} вопросов по следующему конспекту. "
             "Каждый вопрос должен иметь 4 варианта ответа, один из которых верный. "
@@ -130,12 +483,144 @@ class GeminiClient:
             "}"
             "]}"
         )
-        return self._generate_json(prompt, contents=[{"text": conspect_summary}])
+        return self._generate_json(
+            prompt,
+            contents=[{"text": conspect_summary}],
+            cache_label="quiz",
+            validate=self._has_questions,
+        )
+
+    def generate_question_bank(
+        self,
+        conspect_summary: str,
+        questions_count: int,
+        exclude: Sequence[str] = (),
+    ) -> dict[str, Any]:
+        """Партия вопросов для банка конспекта: разной сложности и не повторяющих exclude."""
+        prompt = (
+            f"Составь банк из {questions_count} разных вопросов по следующему конспекту. "
+            "Вопросы должны покрывать весь конспект и не повторять друг друга по смыслу. "
+            "Примерно поровну лёгких (easy), средних (medium) и сложных (hard) вопросов. "
+            "Каждый вопрос должен иметь 4 варианта ответа, один из которых верный, "
+            "и краткое объяснение верного ответа. "
+            "Верни JSON: {"
+            '"title": "строка", '
+            '"description": "строка", '
+            '"questions": ['
+            '{'
+            '"question": "строка", '
+            '"difficulty": "easy|medium|hard", '
+            '"answers": ['
+            '{"text": "строка", "is_correct": bool}'
+            "], "
+            '"explanation": "строка"'
+            "}"
+            "]}"
+        )
+        if exclude:
+            listed = "\n".join(f"- {question}" for question in list(exclude)[:50])
+            prompt += f"\n\nЭти вопросы уже есть в банке, не повторяй их:\n{listed}"
+        return self._generate_json(
+            prompt,
+            contents=[{"text": conspect_summary}],
+            cache_label="question_bank",
+            validate=self._has_questions,
+        )
+
+
+generation_result_cache = (
+    GenerationResultCache(
+        SessionLocal,
+        ttl_seconds=settings.generation_cache_ttl_seconds,
+        memory_entries=settings.generation_cache_memory_entries,
+        max_rows=settings.generation_cache_max_rows,
+    )
+    if settings.generation_cache_enabled
+    else None
+)
+
+
+
+def _build_governor(api_key: str) -> GeminiGovernor | None:
+    if not settings.gemini_rate_limit_enabled:
+        return None
+    return GeminiGovernor(
+        SessionLocal,
+        api_key,
+        requests_per_minute=settings.gemini_requests_per_minute,
+        burst=settings.gemini_rate_limit_burst,
+        max_in_flight=settings.gemini_max_in_flight,
+        acquire_timeout_seconds=settings.gemini_acquire_timeout_seconds,
+        lease_seconds=settings.gemini_call_lease_seconds,
+    )
+
+
+def _pool_entries() -> list[tuple[str, str]]:
+    """Ключи пула: GOOGLE_API_KEY, GOOGLE_API_KEY_TEXT и GOOGLE_API_KEYS через запятую.
+
+    Модель у всех GOOGLE_MODEL.
+    """
+    entries = [(settings.google_api_key, settings.google_model)]
+    if settings.google_api_key_text:
+        entries.append((settings.google_api_key_text, settings.google_model))
+    for item in (settings.google_api_keys or "").split(","):
+        key, _, model = item.strip().partition(":")
+        if model.strip() and model.strip() != settings.google_model:
+            raise RuntimeError(
+                f"GOOGLE_API_KEYS entry for model {model.strip()!r} differs from GOOGLE_MODEL; "
+                "all pool keys must use one model"
+            )
+        if key:
+            entries.append((key, settings.google_model))
+    return list(dict.fromkeys(entries))
+
+
+# Один на процесс: перцентили латентности и бюджет дублей общие для всех ключей
+gemini_hedger = (
+    Hedger(
+        percentile=settings.gemini_hedge_percentile,
+        min_samples=settings.gemini_hedge_min_samples,
+        window=settings.gemini_hedge_window,
+        budget_fraction=settings.gemini_hedge_budget_fraction,
+        min_delay_seconds=settings.gemini_hedge_min_delay_seconds,
+    )
+    if settings.gemini_hedging_enabled
+    else None
+)
+
+
+def _build_client(api_key: str, model_name: str, *, single_key: bool) -> GeminiClient:
+    return GeminiClient(
+        api_key,
+        model_name,
+        generation_result_cache,
+        _build_governor(api_key),
+        retry_policy=RetryPolicy(
+            attempts=settings.gemini_retry_attempts,
+            base_delay_seconds=settings.gemini_retry_base_delay_seconds,
+            max_delay_seconds=settings.gemini_retry_max_delay_seconds,
+            # С несколькими ключами на 429 выгоднее сразу уйти на другой ключ пула
+            retry_quota_errors=single_key,
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=settings.gemini_breaker_failure_threshold,
+            reset_seconds=settings.gemini_breaker_reset_seconds,
+        ),
+        hedger=gemini_hedger,
+    )
 
 
-gemini_client = GeminiClient(settings.google_api_key, settings.google_model)
+_entries = _pool_entries()
+gemini_pool = GeminiClientPool(
+    [
+        _build_client(api_key, model_name, single_key=len(_entries) == 1)
+        for api_key, model_name in _entries
+    ],
+    eject_seconds=settings.gemini_key_eject_seconds,
+    max_eject_seconds=settings.gemini_key_max_eject_seconds,
+    hedge_on_other_key=settings.gemini_hedge_other_key,
+)
 
-if settings.google_api_key_text and settings.google_api_key_text != settings.google_api_key:
-    gemini_text_client = GeminiClient(settings.google_api_key_text, settings.google_model)
-else:
-    gemini_text_client = gemini_client
+# Аудио и текстовые задачи делят общий пул, а не закреплены за отдельными ключами
+gemini_client = gemini_pool
+gemini_text_client = gemini_pool
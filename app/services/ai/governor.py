@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import random
+import socket
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.timeutils import as_naive_utc
+from app.models.rate_limit import GeminiCallLease, GeminiRateLimit
+
+
+class RateLimitTimeout(RuntimeError):  # noqa: N818
+    """Слот для запроса к Gemini не освободился до дедлайна."""
+
+
+def key_fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:32]
+
+
+class GeminiGovernor:
+    """Общий для всех процессов лимитер запросов к одному API-ключу Gemini.
+
+    Token bucket (requests_per_minute, burst) и ограничение одновременных
+    запросов (max_in_flight) хранятся в Postgres: строка geminiratelimit на ключ
+    и по строке geminicalllease на выполняющийся запрос. Вызывающий ждёт слот
+    до дедлайна и только потом получает RateLimitTimeout.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        api_key: str,
+        *,
+        requests_per_minute: float,
+        burst: int,
+        max_in_flight: int,
+        acquire_timeout_seconds: float,
+        lease_seconds: int,
+        poll_interval_seconds: float = 0.5,
+    ) -> None:
+        self.session_factory = session_factory
+        # В БД попадает только отпечаток ключа
+        self.key_id = key_fingerprint(api_key)
+        self.rate = requests_per_minute / 60.0
+        self.burst = max(burst, 1)
+        self.max_in_flight = max(max_in_flight, 1)
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}"
+        self._bucket_ready = False
+
+    @contextmanager
+    def slot(self, timeout: float | None = None) -> Iterator[None]:
+        lease_id = self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release(lease_id)
+
+    def acquire(self, timeout: float | None = None) -> int | None:
+        started = time.monotonic()
+        deadline = started + (self.acquire_timeout_seconds if timeout is None else timeout)
+        while True:
+            try:
+                lease_id, retry_after = self._try_acquire(time.monotonic() - started)
+            except Exception as exc:  # noqa: BLE001
+                # Лимитер не должен останавливать генерацию, если недоступна сама БД
+                logging.warning("Gemini governor unavailable, calling without limits: %s", exc)
+                return None
+            if lease_id is not None:
+                return lease_id
+
+            now = time.monotonic()
+            if now >= deadline:
+                self._record_rejection()
+                raise RateLimitTimeout(
+                    f"Gemini rate limit slot was not available within {deadline - started:.0f}s"
+                )
+            # Джиттер, чтобы ожидающие процессы не ломились в БД одновременно
+            delay = retry_after + random.uniform(0, self.poll_interval_seconds)  # noqa: S311
+            time.sleep(min(delay, deadline - now))
+
+    def release(self, lease_id: int | None) -> None:
+        if lease_id is None:
+            return
+        session = self.session_factory()
+        try:
+            session.query(GeminiCallLease).filter(GeminiCallLease.id == lease_id).delete(
+                synchronize_session=False
+            )
+            session.commit()
+        except Exception as exc:  # noqa: BLE001
+            session.rollback()
+            # Слот всё равно освободится по expires_at
+            logging.warning("Failed to release Gemini lease %s: %s", lease_id, exc)
+        finally:
+            session.close()
+
+    def _ensure_bucket(self, session: Session) -> None:
+        if self._bucket_ready:
+            return
+        try:
+            with session.begin_nested():
+                session.add(
+                    GeminiRateLimit(
+                        key_id=self.key_id,
+                        tokens=float(self.burst),
+                        refilled_at=datetime.utcnow(),
+                        acquired_total=0,
+                        rejected_total=0,
+                        wait_ms_total=0,
+                        wait_ms_max=0,
+                    )
+                )
+        except IntegrityError:
+            pass
+        session.commit()
+        self._bucket_ready = True
+
+    def _try_acquire(self, waited_seconds: float) -> tuple[int | None, float]:
+        session = self.session_factory()
+        try:
+            self._ensure_bucket(session)
+            bucket = (
+                session.query(GeminiRateLimit)
+                .filter(GeminiRateLimit.key_id == self.key_id)
+                .with_for_update()
+                .one()
+            )
+            now = datetime.utcnow()
+            elapsed = max((now - as_naive_utc(bucket.refilled_at)).total_seconds(), 0.0)
+            tokens = min(float(self.burst), bucket.tokens + elapsed * self.rate)
+
+            session.query(GeminiCallLease).filter(
+                GeminiCallLease.key_id == self.key_id,
+                GeminiCallLease.expires_at <= now,
+            ).delete(synchronize_session=False)
+            in_flight = (
+                session.query(func.count(GeminiCallLease.id))
+                .filter(GeminiCallLease.key_id == self.key_id)
+                .scalar()
+            )
+
+            if tokens < 1.0 or in_flight >= self.max_in_flight:
+                session.commit()
+                if tokens < 1.0 and self.rate > 0:
+                    return None, (1.0 - tokens) / self.rate
+                return None, self.poll_interval_seconds
+
+            waited_ms = int(waited_seconds * 1000)
+            bucket.tokens = tokens - 1.0
+            bucket.refilled_at = now
+            bucket.acquired_total = (bucket.acquired_total or 0) + 1
+            bucket.wait_ms_total = (bucket.wait_ms_total or 0) + waited_ms
+            bucket.wait_ms_max = max(bucket.wait_ms_max or 0, waited_ms)
+            lease = GeminiCallLease(
+                key_id=self.key_id,
+                holder=self.holder,
+                acquired_at=now,
+                expires_at=now + timedelta(seconds=self.lease_seconds),
+            )
+            session.add(lease)
+            session.commit()
+            if waited_seconds >= 1.0:
+                logging.info(
+                    "Waited %.1fs for a Gemini slot (key %s)",
+                    waited_seconds,
+                    self.key_id[:8],
+                )
+            return lease.id, 0.0
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _record_rejection(self) -> None:
+        session = self.session_factory()
+        try:
+            session.query(GeminiRateLimit).filter(GeminiRateLimit.key_id == self.key_id).update(
+                {GeminiRateLimit.rejected_total: GeminiRateLimit.rejected_total + 1},
+                synchronize_session=False,
+            )
+            session.commit()
+        except Exception as exc:  # noqa: BLE001
+            session.rollback()
+            logging.warning("Failed to record Gemini rate limit rejection: %s", exc)
+        finally:
+            session.close()
+
+
+def rate_limit_stats(session: Session) -> list[dict[str, float | int | str]]:
+    now = datetime.utcnow()
+    in_flight = dict(
+        session.query(GeminiCallLease.key_id, func.count(GeminiCallLease.id))
+        .filter(GeminiCallLease.expires_at > now)
+        .group_by(GeminiCallLease.key_id)
+        .all()
+    )
+    stats: list[dict[str, float | int | str]] = []
+    for bucket in session.query(GeminiRateLimit).order_by(GeminiRateLimit.key_id).all():
+        acquired = bucket.acquired_total or 0
+        stats.append(
+            {
+                "key": bucket.key_id[:8],
+                "tokens": round(bucket.tokens, 2),
+                "in_flight": int(in_flight.get(bucket.key_id, 0)),
+                "acquired": int(acquired),
+                "rejected": int(bucket.rejected_total or 0),
+                "avg_wait_ms": int((bucket.wait_ms_total or 0) / acquired) if acquired else 0,
+                "max_wait_ms": int(bucket.wait_ms_max or 0),
+            }
+        )
+    return stats
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+_cancel_event: ContextVar[threading.Event | None] = ContextVar("gemini_hedge_cancel", default=None)
+
+
+class HedgeCancelled(RuntimeError):  # noqa: N818
+    """Запрос проиграл гонку hedge-запросу и больше не нужен."""
+
+
+def raise_if_cancelled() -> None:
+    """Точка отмены для проигравшего запроса.
+
+    Вызывается перед ретраем и перед отправкой в Gemini.
+    """
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise HedgeCancelled("Gemini request was superseded by a hedged request")
+
+
+class LatencyTracker:
+    """Скользящее окно длительностей успешных вызовов, отдельно на каждый тип запроса."""
+
+    def __init__(self, *, window: int, percentile: float, min_samples: int) -> None:
+        self.window = max(window, 1)
+        self.percentile = min(max(percentile, 0.0), 100.0)
+        self.min_samples = max(min_samples, 1)
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque[float]] = {}
+
+    def observe(self, label: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(label, deque(maxlen=self.window)).append(seconds)
+
+    def threshold(self, label: str) -> float | None:
+        """Перцентиль окна или None, пока замеров слишком мало для оценки хвоста."""
+        with self._lock:
+            samples = sorted(self._samples.get(label, ()))
+        if len(samples) < self.min_samples:
+            return None
+        rank = max(math.ceil(self.percentile / 100.0 * len(samples)) - 1, 0)
+        return samples[rank]
+
+
+class HedgeBudget:
+    """Доля hedge-запросов среди последних window отправленных запросов не превышает fraction."""
+
+    def __init__(self, *, fraction: float, window: int = 1000) -> None:
+        self.fraction = max(fraction, 0.0)
+        self._lock = threading.Lock()
+        self._recent: deque[bool] = deque(maxlen=max(window, 1))
+        self._hedges = 0
+
+    def _append(self, hedged: bool) -> None:
+        if len(self._recent) == self._recent.maxlen and self._recent[0]:
+            self._hedges -= 1
+        self._recent.append(hedged)
+        if hedged:
+            self._hedges += 1
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._append(False)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self.fraction * (len(self._recent) + 1):
+                return False
+            self._append(True)
+            return True
+
+
+class Hedger:
+    """Hedged requests: если ответ не пришёл за перцентиль латентности, уходит дубль.
+
+    Побеждает первый успешный ответ, проигравшему выставляется флаг отмены.
+    Синхронный вызов Gemini нельзя прервать посреди запроса, поэтому проигравший
+    останавливается в ближайшей точке отмены (ожидание ретрая, отправка запроса),
+    а его результат отбрасывается.
+    """
+
+    def __init__(
+        self,
+        *,
+        percentile: float,
+        min_samples: int,
+        window: int,
+        budget_fraction: float,
+        min_delay_seconds: float,
+    ) -> None:
+        self.latency = LatencyTracker(window=window, percentile=percentile, min_samples=min_samples)
+        self.budget = HedgeBudget(fraction=budget_fraction)
+        self.min_delay_seconds = min_delay_seconds
+        self._lock = threading.Lock()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped_by_budget = 0
+
+    def run(self, label: str, primary: Callable[[], T], backup: Callable[[], T]) -> T:
+        self.budget.record_request()
+        threshold = self.latency.threshold(label)
+        if threshold is None:
+            return self._timed(label, primary)
+
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="gemini-hedge")
+        events = {"primary": threading.Event(), "backup": threading.Event()}
+        futures: dict[Future, str] = {}
+        try:
+            primary_future = self._submit(executor, events["primary"], self._timed, label, primary)
+            futures[primary_future] = "primary"
+            done, _ = wait([primary_future], timeout=max(threshold, self.min_delay_seconds))
+            if done:
+                return primary_future.result()
+
+            if not self.budget.try_spend():
+                with self._lock:
+                    self.skipped_by_budget += 1
+                return primary_future.result()
+
+            with self._lock:
+                self.hedged += 1
+            logging.info("Gemini %s exceeded %.1fs, sending a hedged request", label, threshold)
+            futures[self._submit(executor, events["backup"], backup)] = "backup"
+            return self._first_success(futures, events)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "skipped_by_budget": self.skipped_by_budget,
+            }
+
+    def _first_success(self, futures: dict[Future, str], events: dict[str, threading.Event]) -> Any:
+        pending = set(futures)
+        errors: dict[str, BaseException] = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                error = future.exception()
+                if error is not None:
+                    errors[name] = error
+                    continue
+                for loser in pending:
+                    events[futures[loser]].set()
+                    loser.cancel()
+                if name == "backup":
+                    with self._lock:
+                        self.hedge_wins += 1
+                return future.result()
+        # Оба запроса упали: наружу уходит ошибка основного, она информативнее
+        raise errors.get("primary") or errors["backup"]
+
+    def _timed(self, label: str, operation: Callable[[], T]) -> T:
+        started = time.monotonic()
+        result = operation()
+        self.latency.observe(label, time.monotonic() - started)
+        return result
+
+    @staticmethod
+    def _submit(
+        executor: ThreadPoolExecutor,
+        event: threading.Event,
+        operation: Callable[..., T],
+        *args: Any,
+    ) -> Future:
+        # Каждому потоку своя копия контекста: дедлайн задачи, сводка вызовов и флаг отмены
+        context = contextvars.copy_context()
+        return executor.submit(context.run, _run_cancellable, event, operation, *args)
+
+
+def _run_cancellable(event: threading.Event, operation: Callable[..., T], *args: Any) -> T:
+    _cancel_event.set(event)
+    return operation(*args)
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from app.models.enums import ConspectVariantType
+from app.services.ai.governor import RateLimitTimeout
+from app.services.ai.hedging import HedgeCancelled
+from app.services.ai.resilience import CircuitOpenError, JobCancelled, is_quota_error
+
+if TYPE_CHECKING:
+    from app.services.ai.files import UploadedFiles
+    from app.services.ai.gemini import GeminiClient
+
+
+def is_throttled(exc: BaseException) -> bool:
+    """Ключ упёрся в квоту — сам Gemini ответил 429 или не дождались слота лимитера."""
+    for error in (exc, exc.__cause__):
+        if isinstance(error, RateLimitTimeout) or (error is not None and is_quota_error(error)):
+            return True
+    return False
+
+
+def _should_reroute(exc: BaseException) -> bool:
+    return is_throttled(exc) or isinstance(exc, CircuitOpenError)
+
+
+@dataclass
+class _PoolMember:
+    client: GeminiClient
+    key_id: str
+    in_flight: int = 0
+    calls: int = 0
+    errors: int = 0
+    quota_errors: int = 0
+    busy_seconds: float = 0.0
+    last_used: float = 0.0
+    ejected_until: float = 0.0
+    eject_streak: int = 0
+
+
+class GeminiClientPool:
+    """Пул клиентов Gemini с разными ключами одной модели.
+
+    Модель у всех ключей одна: её имя — ключ кэша транскрипций и model_used
+    конспектов и тестов, а пул не сообщает, какой ключ обслужил вызов.
+
+    Каждый вызов уходит наименее загруженному здоровому клиенту; ключ, упёршийся
+    в квоту, временно исключается, а вызов повторяется на другом ключе (так же,
+    как при открытом circuit breaker клиента).
+    Статистика — по процессу; общие для процессов лимиты держит GeminiGovernor.
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[GeminiClient],
+        *,
+        eject_seconds: float,
+        max_eject_seconds: float,
+        hedge_on_other_key: bool = False,
+    ) -> None:
+        if not clients:
+            raise ValueError("Gemini client pool needs at least one client")
+        models = {client.model_name for client in clients}
+        if len(models) > 1:
+            raise ValueError(
+                f"Gemini client pool members must share one model, got {sorted(models)}",
+            )
+        self._members = [_PoolMember(client=client, key_id=client.key_id[:8]) for client in clients]
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.model_name = clients[0].model_name
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        if hedge_on_other_key and len(self._members) > 1:
+            for member in self._members:
+                member.client.hedge_router = partial(self._run_hedge, member)
+
+    # Routing ----------------------------------------------------------
+    def _acquire(self, exclude: set[int]) -> _PoolMember:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [member for member in self._members if id(member) not in exclude]
+            healthy = [member for member in candidates if member.ejected_until <= now]
+            if healthy:
+                member = min(healthy, key=lambda item: (item.in_flight, item.last_used))
+            else:
+                # Все ключи в карантине — пробуем тот, что освободится раньше, а не падаем сразу
+                member = min(candidates, key=lambda item: item.ejected_until)
+            self._take(member, now)
+        return member
+
+    def _acquire_peer(self, origin: _PoolMember) -> _PoolMember:
+        now = time.monotonic()
+        with self._lock:
+            peers = [
+                member
+                for member in self._members
+                if member is not origin and member.ejected_until <= now
+            ]
+            member = origin
+            if peers:
+                member = min(peers, key=lambda item: (item.in_flight, item.last_used))
+            self._take(member, now)
+        return member
+
+    @staticmethod
+    def _take(member: _PoolMember, now: float) -> None:
+        member.in_flight += 1
+        member.calls += 1
+        member.last_used = now
+
+    def _release(self, member: _PoolMember, started: float, exc: BaseException | None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            member.in_flight -= 1
+            member.busy_seconds += now - started
+            if exc is None:
+                member.eject_streak = 0
+                return
+            if isinstance(exc, HedgeCancelled | JobCancelled):
+                # Отменённый дубль или отменённая задача — не ошибка ключа
+                return
+            member.errors += 1
+            if is_throttled(exc):
+                member.quota_errors += 1
+                member.eject_streak += 1
+                duration = min(
+                    self.eject_seconds * 2 ** (member.eject_streak - 1),
+                    self.max_eject_seconds,
+                )
+                member.ejected_until = now + duration
+                logging.warning(
+                    "Gemini key %s hit its quota, ejected for %.0fs", member.key_id, duration
+                )
+
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        tried: set[int] = set()
+        while True:
+            member = self._acquire(tried)
+            started = time.monotonic()
+            try:
+                result = getattr(member.client, method)(*args, **kwargs)
+            except Exception as exc:  # noqa: BLE001
+                self._release(member, started, exc)
+                tried.add(id(member))
+                if _should_reroute(exc) and len(tried) < len(self._members):
+                    continue
+                raise
+            self._release(member, started, None)
+            return result
+
+    def _run_hedge(self, origin: _PoolMember, operation: Callable[[GeminiClient], Any]) -> Any:
+        """Hedge-запрос уходит на другой здоровый ключ.
+
+        Медленный хвост часто связан с конкретным ключом.
+        """
+        member = self._acquire_peer(origin)
+        started = time.monotonic()
+        try:
+            result = operation(member.client)
+        except Exception as exc:  # noqa: BLE001
+            self._release(member, started, exc)
+            raise
+        self._release(member, started, None)
+        return result
+
+    def stats(self) -> list[dict[str, Any]]:
+        now = time.monotonic()
+        uptime = max(now - self._started, 1e-9)
+        with self._lock:
+            return [
+                {
+                    "key": member.key_id,
+                    "model": member.client.model_name,
+                    "in_flight": member.in_flight,
+                    "calls": member.calls,
+                    "errors": member.errors,
+                    "quota_errors": member.quota_errors,
+                    "ejected_for_seconds": round(max(member.ejected_until - now, 0.0), 1),
+                    "utilisation": round(member.busy_seconds / uptime, 4),
+                }
+                for member in self._members
+            ]
+
+    # GeminiClient API -------------------------------------------------
+    def transcribe_audio(
+        self,
+        file_path: Path,
+        mime_type: str | None = None,
+        *,
+        content_key: str | None = None,
+        uploaded_files: UploadedFiles | None = None,
+    ) -> dict[str, Any]:
+        return self._call(
+            "transcribe_audio",
+            file_path,
+            mime_type=mime_type,
+            content_key=content_key,
+            uploaded_files=uploaded_files,
+        )
+
+    def summarize_section(self, section: str, index: int, total: int) -> dict[str, Any]:
+        return self._call("summarize_section", section, index, total)
+
+    def generate_conspect_variant(
+        self,
+        transcript: str,
+        variant: ConspectVariantType,
+        from_sections: bool = False,
+    ) -> dict[str, Any]:
+        return self._call(
+            "generate_conspect_variant",
+            transcript,
+            variant,
+            from_sections=from_sections,
+        )
+
+    def generate_conspect_variants(
+        self,
+        transcript: str,
+        variants: Sequence[ConspectVariantType],
+        from_sections: bool = False,
+    ) -> dict[str, dict[str, Any]]:
+        return self._call(
+            "generate_conspect_variants",
+            transcript,
+            variants,
+            from_sections=from_sections,
+        )
+
+    def generate_conspect(self, transcript: str) -> dict[str, dict[str, Any]]:
+        return self._call("generate_conspect", transcript)
+
+    def generate_quiz(self, conspect_summary: str, questions_count: int = 5) -> dict[str, Any]:
+        return self._call("generate_quiz", conspect_summary, questions_count=questions_count)
+
+    def generate_question_bank(
+        self,
+        conspect_summary: str,
+        questions_count: int,
+        exclude: Sequence[str] = (),
+    ) -> dict[str, Any]:
+        return self._call(
+            "generate_question_bank",
+            conspect_summary,
+            questions_count,
+            exclude=exclude,
+        )
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TypeVar
+
+from fastapi import HTTPException
+
+from app.services.ai.hedging import raise_if_cancelled
+from app.services.ai.telemetry import current_stats
+
+try:  # pragma: no cover - optional dependency
+    from google.api_core import exceptions as google_exceptions
+except Exception:  # pragma: no cover
+    google_exceptions = None
+
+T = TypeVar("T")
+
+_deadline: ContextVar[float | None] = ContextVar("gemini_deadline", default=None)
+_job_cancel: ContextVar[threading.Event | None] = ContextVar("generation_job_cancel", default=None)
+
+
+class CircuitOpenError(RuntimeError):
+    """Клиент Gemini временно не принимает запросы после серии сбоев."""
+
+
+class JobDeadlineExceeded(RuntimeError):  # noqa: N818
+    """Дедлайн задачи истёк до очередного запроса к Gemini."""
+
+
+class JobCancelled(RuntimeError):  # noqa: N818
+    """Пользователь отменил задачу; её оставшиеся запросы к Gemini не нужны."""
+
+
+@contextmanager
+def job_deadline(seconds: float | None) -> Iterator[None]:
+    """Общий дедлайн задачи: ретраи, ожидание лимитера и таймауты запросов не выходят за него."""
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(min(deadline, current) if current is not None else deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def job_cancellation(event: threading.Event | None) -> Iterator[None]:
+    """Флаг отмены задачи: проверяется между стадиями и перед каждым запросом к Gemini."""
+    token = _job_cancel.set(event)
+    try:
+        yield
+    finally:
+        _job_cancel.reset(token)
+
+
+def raise_if_job_cancelled() -> None:
+    event = _job_cancel.get()
+    if event is not None and event.is_set():
+        raise JobCancelled("Generation job was cancelled")
+
+
+def remaining_time() -> float | None:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_outage_error(exc: BaseException) -> bool:
+    """Сбой на стороне сервиса: такие ошибки считает circuit breaker."""
+    if google_exceptions is None:
+        return isinstance(exc, ConnectionError | TimeoutError)
+    return isinstance(
+        exc,
+        google_exceptions.ServiceUnavailable
+        | google_exceptions.DeadlineExceeded
+        | google_exceptions.InternalServerError
+        | google_exceptions.RetryError
+        | ConnectionError
+        | TimeoutError,
+    )
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    if google_exceptions is None:
+        return False
+    return isinstance(exc, google_exceptions.ResourceExhausted | google_exceptions.TooManyRequests)
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    if is_outage_error(exc) or is_quota_error(exc):
+        return True
+    # Битый JSON или пустой ответ модели обычно лечится повтором
+    return isinstance(exc, HTTPException) and exc.status_code == 502
+
+
+class CircuitBreaker:
+    """closed → open после failure_threshold сбоев подряд → half-open через reset_seconds.
+
+    В half-open пропускается один пробный запрос: успех закрывает цепь, сбой
+    снова открывает её.
+    """
+
+    def __init__(self, *, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._probe_in_flight:
+                raise CircuitOpenError("Gemini circuit breaker is open")
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, exc: BaseException) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            if not is_outage_error(exc):
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning(
+                        "Gemini circuit breaker opened after %s failures",
+                        self._failures,
+                    )
+                self._opened_at = time.monotonic()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int
+    base_delay_seconds: float
+    max_delay_seconds: float
+    retry_quota_errors: bool = True
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter: равномерно от 0 до экспоненциального потолка
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)  # noqa: S311
+
+
+def call_with_retry(
+    operation: Callable[[], T],
+    *,
+    policy: RetryPolicy,
+    breaker: CircuitBreaker | None = None,
+    description: str = "Gemini call",
+) -> T:
+    attempt = 0
+    while True:
+        attempt += 1
+        raise_if_job_cancelled()
+        raise_if_cancelled()
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise JobDeadlineExceeded(f"{description} skipped: job deadline exceeded")
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = operation()
+        except Exception as exc:  # noqa: BLE001
+            if breaker is not None:
+                breaker.record_failure(exc)
+            retryable = is_retryable_error(exc) and (
+                policy.retry_quota_errors or not is_quota_error(exc)
+            )
+            if not retryable or attempt >= policy.attempts:
+                raise
+            delay = policy.delay(attempt)
+            remaining = remaining_time()
+            if remaining is not None and remaining <= delay:
+                raise
+            logging.warning(
+                "%s failed (attempt %s/%s), retrying in %.1fs: %s",
+                description,
+                attempt,
+                policy.attempts,
+                delay,
+                exc,
+            )
+            stats = current_stats()
+            if stats is not None:
+                stats.record_retry()
+            time.sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+
+class CallStats:
+    """Сводка по вызовам Gemini в рамках одной задачи генерации.
+
+    Клиент пишет сюда из любых потоков, поэтому все изменения — под замком.
+    Кроме кэша и ретраев копит токены запросов и время стадий задачи.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.cache: dict[str, str] = {}
+        # Попадания и промахи по видам кэша: transcript, section, variant, quiz...
+        self.cache_counts: dict[str, dict[str, int]] = {}
+        self.retries = 0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.stages: dict[str, dict[str, float]] = {}
+
+    def record_cache(self, label: str, status: str) -> None:
+        with self._lock:
+            self.cache[label] = status
+            # Номер раздела и набор вариантов в метке не нужны — иначе видов было бы без счёта
+            kind = label.split(":", 1)[0]
+            counts = self.cache_counts.setdefault(kind, {"hits": 0, "misses": 0})
+            counts["hits" if status == "hit" else "misses"] += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def record_usage(self, usage: Any) -> None:
+        """Учитывает один ответ Gemini; usage — его usage_metadata (может отсутствовать)."""
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += int(getattr(usage, "prompt_token_count", 0) or 0)
+            self.response_tokens += int(getattr(usage, "candidates_token_count", 0) or 0)
+
+    def record_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def cache_summary(self) -> dict[str, Any]:
+        with self._lock:
+            return dict(self.cache)
+
+    def as_metrics(self) -> dict[str, Any]:
+        """Снимок для GenerationJob.metrics."""
+        with self._lock:
+            return {
+                "stages": {
+                    stage: {"seconds": round(entry["seconds"], 3), "count": int(entry["count"])}
+                    for stage, entry in self.stages.items()
+                },
+                "gemini": {
+                    "calls": self.calls,
+                    "prompt_tokens": self.prompt_tokens,
+                    "response_tokens": self.response_tokens,
+                    "retries": self.retries,
+                },
+                "cache": {
+                    "hits": sum(counts["hits"] for counts in self.cache_counts.values()),
+                    "misses": sum(counts["misses"] for counts in self.cache_counts.values()),
+                    "by_label": {kind: dict(counts) for kind, counts in self.cache_counts.items()},
+                },
+            }
+
+
+_current_stats: ContextVar[CallStats | None] = ContextVar("gemini_call_stats", default=None)
+
+
+def current_stats() -> CallStats | None:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_calls() -> Iterator[CallStats]:
+    """Открывает сводку вызовов; вложенный вызов продолжает уже открытую сводку."""
+    existing = _current_stats.get()
+    if existing is not None:
+        yield existing
+        return
+    stats = CallStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Засекает стадию задачи; повторы одной стадии (сегменты, варианты) суммируются.
+
+    Время пишется и при исключении: упавшая стадия тоже может быть узким местом.
+    """
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record_stage(stage, time.monotonic() - started)
@@ -0,0 +1,548 @@
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TypeVar
+
+try:  # pragma: no cover - optional dependency
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+T = TypeVar("T")
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+_WORD_RE = re.compile(r"\S+")
+_NORMALIZE_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# Распознаванию речи хватает моно 16 кГц; MP3 принимают и Gemini, и любой плеер
+SPEECH_SAMPLE_RATE = 16000
+SPEECH_BITRATE = "32k"
+SPEECH_MIME_TYPE = "audio/mpeg"
+
+# VAD считает энергию по кадрам 30 мс на 8 кГц: для поиска пауз точнее не нужно
+VAD_SAMPLE_RATE = 8000
+VAD_FRAME_SECONDS = 0.03
+
+_preprocess_pool: ProcessPoolExecutor | None = None
+_preprocess_pool_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class AudioSegment:
+    index: int
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass(frozen=True)
+class SpeechAnalysis:
+    duration: float
+    intervals: list[tuple[float, float]]
+
+    @property
+    def speech_seconds(self) -> float:
+        return sum(end - start for start, end in self.intervals)
+
+    @property
+    def speech_ratio(self) -> float:
+        return min(self.speech_seconds / self.duration, 1.0) if self.duration > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class TimeMap:
+    """Связь времени в записи с вырезанными паузами со временем в оригинале.
+
+    intervals — сохранённые участки оригинала по порядку; в обрезанной записи
+    они идут встык.
+    """
+
+    intervals: tuple[tuple[float, float], ...]
+
+    @classmethod
+    def from_metadata(cls, value: Any) -> TimeMap | None:
+        if not isinstance(value, list) or not value:
+            return None
+        return cls(tuple((float(start), float(end)) for start, end in value))
+
+    def to_metadata(self) -> list[list[float]]:
+        return [[start, end] for start, end in self.intervals]
+
+    def to_original(self, seconds: float) -> float:
+        offset = 0.0
+        for start, end in self.intervals:
+            length = end - start
+            if seconds <= offset + length:
+                return round(start + max(seconds - offset, 0.0), 3)
+            offset += length
+        return self.intervals[-1][1] if self.intervals else seconds
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def vad_available() -> bool:
+    return np is not None and ffmpeg_available()
+
+
+def probe_duration(path: Path) -> float | None:
+    try:
+        result = subprocess.run(
+            [  # noqa: S603, S607
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "json",
+                str(path),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=60,
+        )
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except (OSError, subprocess.SubprocessError, KeyError, ValueError) as exc:
+        logging.warning("ffprobe failed for %s: %s", path, exc)
+        return None
+
+
+def detect_silences(
+    path: Path,
+    *,
+    noise_db: float = -35.0,
+    min_silence_seconds: float = 0.5,
+) -> list[tuple[float, float]]:
+    """Возвращает интервалы тишины (start, end) по фильтру silencedetect."""
+    try:
+        result = subprocess.run(
+            [  # noqa: S603, S607
+                "ffmpeg",
+                "-hide_banner",
+                "-nostats",
+                "-i",
+                str(path),
+                "-af",
+                f"silencedetect=noise={noise_db}dB:d={min_silence_seconds}",
+                "-f",
+                "null",
+                "-",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=600,
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        logging.warning("Silence detection failed for %s: %s", path, exc)
+        return []
+
+    silences: list[tuple[float, float]] = []
+    start: float | None = None
+    for line in result.stderr.splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(float(match.group(1)), 0.0)
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def plan_segments(
+    duration: float,
+    silences: Sequence[tuple[float, float]],
+    *,
+    target_seconds: float,
+    overlap_seconds: float,
+    search_window_seconds: float,
+) -> list[AudioSegment]:
+    """Делит запись на сегменты около target_seconds, по возможности режа в паузах.
+
+    Соседние сегменты перекрываются на overlap_seconds, чтобы слово на стыке
+    попало целиком хотя бы в один из них; дубли убирает merge_transcripts.
+    """
+    if duration <= target_seconds:
+        return [AudioSegment(index=0, start=0.0, end=duration)]
+
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+    cuts: list[float] = []
+    position = 0.0
+    while duration - position > target_seconds:
+        target = position + target_seconds
+        candidates = [
+            point
+            for point in midpoints
+            if abs(point - target) <= search_window_seconds and point > position + overlap_seconds
+        ]
+        cut = min(candidates, key=lambda point: abs(point - target)) if candidates else target
+        cuts.append(cut)
+        position = cut
+
+    boundaries = [0.0, *cuts, duration]
+    segments: list[AudioSegment] = []
+    for index in range(len(boundaries) - 1):
+        start = max(boundaries[index] - overlap_seconds, 0.0) if index else 0.0
+        end = min(boundaries[index + 1] + overlap_seconds, duration)
+        segments.append(AudioSegment(index=index, start=round(start, 3), end=round(end, 3)))
+    return segments
+
+
+def frame_energies_db(samples: np.ndarray, frame_length: int) -> np.ndarray:
+    """Громкость каждого полного кадра в dBFS; хвост короче кадра отбрасывается."""
+    usable = len(samples) // frame_length * frame_length
+    frames = samples[:usable].astype(np.float32).reshape(-1, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+
+def read_frame_energies(
+    path: Path,
+    *,
+    sample_rate: int = VAD_SAMPLE_RATE,
+    frame_seconds: float = VAD_FRAME_SECONDS,
+) -> np.ndarray:
+    """Декодирует запись в PCM потоком и считает энергию кадров, не держа весь звук в памяти."""
+    frame_bytes = int(sample_rate * frame_seconds) * 2
+    chunk_bytes = frame_bytes * 2000
+    process = subprocess.Popen(
+        [  # noqa: S603, S607
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel",
+            "error",
+            "-i",
+            str(path),
+            "-vn",
+            "-ac",
+            "1",
+            "-ar",
+            str(sample_rate),
+            "-f",
+            "s16le",
+            "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    energies: list[np.ndarray] = []
+    remainder = b""
+    try:
+        while data := process.stdout.read(chunk_bytes):
+            buffer = remainder + data
+            usable = len(buffer) // frame_bytes * frame_bytes
+            if usable:
+                samples = np.frombuffer(buffer[:usable], dtype="<i2")
+                energies.append(frame_energies_db(samples, frame_bytes // 2))
+            remainder = buffer[usable:]
+    finally:
+        process.stdout.close()
+        try:
+            returncode = process.wait(timeout=600)
+        except subprocess.TimeoutExpired:
+            # Зависший ffmpeg не должен пережить воркер
+            process.kill()
+            process.wait()
+            raise
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, "ffmpeg")
+    return np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+
+
+def detect_speech(
+    energies_db: np.ndarray,
+    *,
+    frame_seconds: float = VAD_FRAME_SECONDS,
+    min_silence_seconds: float = 2.0,
+    padding_seconds: float = 0.3,
+    margin_db: float = 10.0,
+    floor_db: float = -50.0,
+) -> list[tuple[float, float]]:
+    """Интервалы речи (start, end) в секундах по энергии кадров.
+
+    Порог адаптивный: шумовой пол записи (10-й перцентиль) плюс margin_db, но не
+    ниже floor_db. Каждый участок речи расширяется на padding_seconds, а паузы
+    короче min_silence_seconds не режутся вовсе.
+    """
+    if energies_db.size == 0:
+        return []
+    noise_floor = float(np.percentile(energies_db, 10))
+    voiced = energies_db > max(noise_floor + margin_db, floor_db)
+    padding = int(round(padding_seconds / frame_seconds))
+    if padding:
+        kernel = np.ones(2 * padding + 1, dtype=np.int32)
+        voiced = np.convolve(voiced.astype(np.int32), kernel, mode="same") > 0
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    if starts.size == 0:
+        return []
+    # Склеиваем участки, пауза между которыми короче min_silence_seconds
+    keep_gap = (starts[1:] - ends[:-1]) >= int(round(min_silence_seconds / frame_seconds))
+    starts = np.concatenate((starts[:1], starts[1:][keep_gap]))
+    ends = np.concatenate((ends[:-1][keep_gap], ends[-1:]))
+    return [
+        (round(float(start) * frame_seconds, 3), round(float(end) * frame_seconds, 3))
+        for start, end in zip(starts, ends, strict=True)
+    ]
+
+
+def analyze_speech(
+    path: Path,
+    *,
+    min_silence_seconds: float = 2.0,
+    padding_seconds: float = 0.3,
+    margin_db: float = 10.0,
+) -> SpeechAnalysis:
+    energies = read_frame_energies(path)
+    return SpeechAnalysis(
+        duration=round(energies.size * VAD_FRAME_SECONDS, 3),
+        intervals=detect_speech(
+            energies,
+            min_silence_seconds=min_silence_seconds,
+            padding_seconds=padding_seconds,
+            margin_db=margin_db,
+        ),
+    )
+
+
+def _speech_encoding_args(sample_rate: int, bitrate: str) -> list[str]:
+    return ["-vn", "-ac", "1", "-ar", str(sample_rate), "-c:a", "libmp3lame", "-b:a", bitrate]
+
+
+def extract_segment(
+    source: Path,
+    segment: AudioSegment,
+    destination: Path,
+    *,
+    sample_rate: int = SPEECH_SAMPLE_RATE,
+    bitrate: str = SPEECH_BITRATE,
+) -> Path:
+    subprocess.run(
+        [  # noqa: S603, S607
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel",
+            "error",
+            "-y",
+            "-ss",
+            f"{segment.start:.3f}",
+            "-t",
+            f"{segment.duration:.3f}",
+            "-i",
+            str(source),
+            *_speech_encoding_args(sample_rate, bitrate),
+            str(destination),
+        ],
+        capture_output=True,
+        check=True,
+        timeout=600,
+    )
+    return destination
+
+
+def encode_for_speech(
+    source: Path,
+    destination: Path,
+    *,
+    sample_rate: int = SPEECH_SAMPLE_RATE,
+    bitrate: str = SPEECH_BITRATE,
+    keep_intervals: Sequence[tuple[float, float]] | None = None,
+) -> int:
+    """Перекодирует запись в моно с низкой частотой и битрейтом; возвращает размер результата.
+
+    С keep_intervals в результат попадают только эти участки, склеенные встык.
+    """
+    with tempfile.TemporaryDirectory(prefix="conspectium-encode-") as tmp_dir:
+        filter_args: list[str] = []
+        if keep_intervals:
+            # Сотни интервалов не влезают в командную строку, поэтому фильтр — из файла
+            selection = "+".join(
+                f"between(t,{start:.3f},{end:.3f})" for start, end in keep_intervals
+            )
+            script = Path(tmp_dir) / "filter.txt"
+            script.write_text(f"aselect='{selection}',asetpts=N/SR/TB")
+            filter_args = ["-filter_script:a", str(script)]
+        subprocess.run(
+            [  # noqa: S603, S607
+                "ffmpeg",
+                "-hide_banner",
+                "-nostats",
+                "-loglevel",
+                "error",
+                "-y",
+                "-i",
+                str(source),
+                *filter_args,
+                *_speech_encoding_args(sample_rate, bitrate),
+                str(destination),
+            ],
+            capture_output=True,
+            check=True,
+            timeout=1800,
+        )
+    return destination.stat().st_size
+
+
+def _get_preprocess_pool(max_workers: int) -> ProcessPoolExecutor:
+    global _preprocess_pool
+    with _preprocess_pool_lock:
+        if _preprocess_pool is None:
+            # spawn: воркер генерации многопоточный, fork из него небезопасен
+            _preprocess_pool = ProcessPoolExecutor(
+                max_workers=max(max_workers, 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _preprocess_pool
+
+
+def run_in_process_pool(
+    function: Callable[..., T], *args: Any, max_workers: int, **kwargs: Any
+) -> T:
+    """Обработка звука в общем пуле процессов: декодирование и NumPy не занимают потоки
+    воркера, а одновременно работает не больше max_workers ffmpeg."""
+    return _get_preprocess_pool(max_workers).submit(function, *args, **kwargs).result()
+
+
+def preprocess_in_pool(
+    source: Path,
+    destination: Path,
+    *,
+    max_workers: int,
+    sample_rate: int = SPEECH_SAMPLE_RATE,
+    bitrate: str = SPEECH_BITRATE,
+    keep_intervals: Sequence[tuple[float, float]] | None = None,
+) -> int:
+    return run_in_process_pool(
+        encode_for_speech,
+        source,
+        destination,
+        max_workers=max_workers,
+        sample_rate=sample_rate,
+        bitrate=bitrate,
+        keep_intervals=keep_intervals,
+    )
+
+
+def _normalize_word(word: str) -> str:
+    return _NORMALIZE_RE.sub("", word).lower()
+
+
+def _same_word(left: str, right: str) -> bool:
+    # Повторно распознанный кусок часто расходится в окончаниях: «станция» и «станции»;
+    # числа сравниваются строго
+    if left == right:
+        return True
+    if not (left.isalpha() and right.isalpha()):
+        return False
+    shared = len(os.path.commonprefix([left, right]))
+    return shared >= 4 and shared >= max(len(left), len(right)) - 2
+
+
+def _seam_overlap(
+    tail: Sequence[str],
+    head: Sequence[str],
+    *,
+    min_match_words: int,
+    max_edit_ratio: float,
+) -> tuple[int, int]:
+    """Приблизительное перекрытие конца tail с началом head.
+
+    Пословное редакционное расстояние между суффиксом tail (начало свободное)
+    и префиксом head. Возвращает начало суффикса в tail и длину префикса head;
+    длина 0 — перекрытия нет.
+    """
+    # cost[b] и start[b] — лучшее выравнивание tail[start:a] с head[:b] для текущего a
+    cost = list(range(len(head) + 1))
+    start = [0] * (len(head) + 1)
+    for a in range(1, len(tail) + 1):
+        row_cost = [0] * (len(head) + 1)
+        row_start = [a] * (len(head) + 1)
+        for b in range(1, len(head) + 1):
+            # При равной цене берём позднее начало: меньше текста tail уйдёт под замену
+            row_cost[b], row_start[b] = min(
+                (cost[b - 1] + (0 if _same_word(tail[a - 1], head[b - 1]) else 1), start[b - 1]),
+                (cost[b] + 1, start[b]),
+                (row_cost[b - 1] + 1, row_start[b - 1]),
+                key=lambda option: (option[0], -option[1]),
+            )
+        cost, start = row_cost, row_start
+
+    best_score, best_start, best_size = 0, len(tail), 0
+    for size in range(min_match_words, len(head) + 1):
+        if cost[size] > max_edit_ratio * size:
+            continue
+        # Каждая правка штрафуется вдвое: длинное перекрытие не должно набираться за счёт ошибок
+        score = size - 2 * cost[size]
+        if score > best_score:
+            best_score, best_start, best_size = score, start[size], size
+    return best_start, best_size
+
+
+def merge_transcripts(
+    parts: Sequence[str],
+    *,
+    max_overlap_words: int = 80,
+    min_match_words: int = 3,
+    max_edit_ratio: float = 0.3,
+) -> str:
+    """Склеивает транскрипты соседних сегментов, убирая повтор в зоне перекрытия.
+
+    Перекрытие — конец предыдущего текста (не длиннее max_overlap_words),
+    приблизительно совпадающий с началом следующего: слова сравниваются без
+    регистра и пунктуации, допускается до max_edit_ratio правок — Gemini
+    распознаёт один и тот же кусок по-разному. Совпадения в глубине текстов не
+    учитываются: общая фраза вдали от стыка не должна съедать текст между ними.
+    Повтор берётся из следующего текста; без перекрытия тексты склеиваются через пробел.
+    """
+    merged = ""
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        if not merged:
+            merged = part
+            continue
+
+        tail = [
+            (match, word)
+            for match in _WORD_RE.finditer(merged)
+            if (word := _normalize_word(match.group()))
+        ][-max_overlap_words:]
+        head = [
+            word for match in _WORD_RE.finditer(part) if (word := _normalize_word(match.group()))
+        ][:max_overlap_words]
+        start, size = _seam_overlap(
+            [word for _, word in tail],
+            head,
+            min_match_words=min_match_words,
+            max_edit_ratio=max_edit_ratio,
+        )
+        if size:
+            merged = merged[: tail[start][0].start()] + part
+        else:
+            merged = f"{merged} {part}"
+    return merged
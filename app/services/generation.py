@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import contextvars
+import hashlib
 import json
 import logging
 import re
+import tempfile
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Iterable, Sequence
+from pathlib import Path
+from typing import Any
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.core.timeutils import as_naive_utc
 from app.db.session import SessionLocal
 from app.models.audio import AudioSource
 from app.models.conspect import Conspect
@@ -21,12 +30,55 @@ from app.models.enums import (
     QuizStatus,
 )
 from app.models.generation import GenerationJob
-from app.models.quiz import Quiz, QuizAnswer, QuizQuestion
+from app.models.quiz import Quiz
 from app.models.user import User
 from app.schemas.conspect import ConspectCreateRequest
 from app.schemas.quiz import QuizCreateFromConspectRequest
-from app.services.ai.gemini import GeminiClient, gemini_client, gemini_text_client
+from app.services.admission import (
+    ACTIVE_JOB_STATUSES,
+    admission_controller,
+    estimate_conspect_tokens,
+    estimate_quiz_tokens,
+)
+from app.services.ai.chunking import estimate_tokens, split_into_sections
+from app.services.ai.files import UploadedFiles
+from app.services.ai.gemini import (
+    TRANSCRIPTION_PROMPT_VERSION,
+    gemini_client,
+    gemini_text_client,
+)
+from app.services.ai.governor import RateLimitTimeout
+from app.services.ai.pool import GeminiClientPool
+from app.services.ai.resilience import (
+    CircuitOpenError,
+    JobCancelled,
+    job_cancellation,
+    job_deadline,
+    raise_if_job_cancelled,
+)
+from app.services.ai.telemetry import current_stats, timed_stage, track_calls
+from app.services.audio_processing import (
+    SPEECH_MIME_TYPE,
+    AudioSegment,
+    SpeechAnalysis,
+    TimeMap,
+    analyze_speech,
+    detect_silences,
+    extract_segment,
+    ffmpeg_available,
+    merge_transcripts,
+    plan_segments,
+    preprocess_in_pool,
+    probe_duration,
+    run_in_process_pool,
+    vad_available,
+)
+from app.services.job_events import emit_progress, job_event_scope, notify_job_event
+from app.services.job_queue import estimate_job_cost
+from app.services.question_bank import question_bank, summary_hash
+from app.services.quiz_persistence import QuestionDraft, replace_quiz_questions
 from app.services.storage import audio_storage
+from app.services.transcript_cache import transcript_cache
 
 try:  # pragma: no cover - optional dependency guard for better resilience
     from google.api_core import exceptions as google_exceptions
@@ -38,13 +90,38 @@ class GenerationService:
     def __init__(
         self,
         session_factory: sessionmaker[Session],
-        ai_client: GeminiClient,
-        text_ai_client: GeminiClient | None = None,
+        ai_client: GeminiClientPool,
+        text_ai_client: GeminiClientPool | None = None,
     ) -> None:
         self.session_factory = session_factory
         self.ai_client = ai_client
         self.text_ai_client = text_ai_client or ai_client
 
+    def process_job(
+        self,
+        job_id: int,
+        job_type: GenerationJobType,
+        cancel_event: threading.Event | None = None,
+        worker_id: str | None = None,
+    ) -> None:
+        """Выполняет задачу.
+
+        С worker_id финальный переход делается, только пока задача за этим воркером.
+        """
+        # Дедлайн, флаг отмены и сводка вызовов общие для всех стадий задачи, включая потоки пулов
+        with (
+            job_event_scope(job_id),
+            job_deadline(settings.job_deadline_seconds),
+            job_cancellation(cancel_event),
+            track_calls(),
+        ):
+            if job_type == GenerationJobType.QUIZ:
+                self.process_quiz_job(job_id, worker_id)
+            elif job_type == GenerationJobType.CONSPECT:
+                self.process_conspect_job(job_id, worker_id)
+            else:
+                raise RuntimeError(f"Unsupported job type: {job_type}")
+
     # Conspect pipeline -------------------------------------------------
     def create_conspect_job(
         self,
@@ -52,15 +129,37 @@ class GenerationService:
         *,
         user: User,
         payload: ConspectCreateRequest,
+        idempotency_key: str | None = None,
     ) -> GenerationJob:
+        """Ставит задачу создания конспекта.
+
+        Повтор запроса с тем же Idempotency-Key возвращает исходную задачу, а
+        одинаковый запрос (та же запись или тот же текст с теми же вариантами),
+        пока предыдущий ещё в очереди или выполняется, присоединяется к нему.
+        """
         if not payload.audio_source_id and not (payload.initial_summary and payload.initial_summary.strip()):
             raise ValueError('Укажи аудио-файл или текст для создания конспекта')
 
         variants = self._normalize_variants(payload.variants)
-        audio_source_id: int | None = None
+        audio_source: AudioSource | None = None
         if payload.audio_source_id is not None:
             audio_source = self._get_user_audio_source(db, user.id, payload.audio_source_id)
-            audio_source_id = audio_source.id
+        audio_source_id = audio_source.id if audio_source else None
+        dedup_key = self._conspect_dedup_key(audio_source_id, payload.initial_summary, variants)
+        existing = self._find_duplicate_job(db, user.id, idempotency_key, dedup_key)
+        if existing is not None:
+            return existing
+
+        priority, estimated_cost = estimate_job_cost(audio_source)
+        admission_controller.admit(
+            db,
+            user.id,
+            tokens=estimate_conspect_tokens(
+                variants_count=len(variants),
+                audio_seconds=estimated_cost,
+                text=audio_source.transcription if audio_source else payload.initial_summary,
+            ),
+        )
 
         conspect = Conspect(
             user_id=user.id,
@@ -78,6 +177,10 @@ class GenerationService:
             status=GenerationJobStatus.PENDING,
             conspect_id=conspect.id,
             audio_source_id=audio_source_id,
+            priority=priority,
+            estimated_cost=estimated_cost,
+            idempotency_key=idempotency_key,
+            dedup_key=dedup_key,
             prompt=json.dumps(
                 {
                     "variants": [variant.value for variant in variants],
@@ -86,10 +189,66 @@ class GenerationService:
             ),
         )
         db.add(job)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Такой же запрос успел создать задачу параллельно — отдаём её
+            db.rollback()
+            existing = self._find_duplicate_job(db, user.id, idempotency_key, dedup_key)
+            if existing is None:
+                raise
+            return existing
         db.refresh(job)
         return job
 
+    @staticmethod
+    def _conspect_dedup_key(
+        audio_source_id: int | None,
+        text: str | None,
+        variants: Sequence[ConspectVariantType],
+    ) -> str:
+        signature = {
+            "audio_source_id": audio_source_id,
+            "text": (
+                hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+                if text and text.strip()
+                else None
+            ),
+            "variants": sorted(variant.value for variant in variants),
+        }
+        return hashlib.sha256(json.dumps(signature, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _find_duplicate_job(
+        db: Session,
+        user_id: int,
+        idempotency_key: str | None,
+        dedup_key: str,
+    ) -> GenerationJob | None:
+        if idempotency_key:
+            job = (
+                db.query(GenerationJob)
+                .filter(
+                    GenerationJob.user_id == user_id,
+                    GenerationJob.idempotency_key == idempotency_key,
+                )
+                .one_or_none()
+            )
+            if job is not None:
+                if job.dedup_key != dedup_key:
+                    raise ValueError("Этот Idempotency-Key уже использован для другого запроса")
+                return job
+        return (
+            db.query(GenerationJob)
+            .filter(
+                GenerationJob.user_id == user_id,
+                GenerationJob.dedup_key == dedup_key,
+                GenerationJob.status.in_(ACTIVE_JOB_STATUSES),
+            )
+            .order_by(GenerationJob.id)
+            .first()
+        )
+
     def create_conspect_variant_job(
         self,
         db: Session,
@@ -104,12 +263,25 @@ class GenerationService:
         if self._variant_exists(conspect, variant):
             raise ValueError("Этот вариант уже создан")
 
+        priority, estimated_cost = estimate_job_cost(conspect.audio_source)
+        source_text = conspect.audio_source.transcription if conspect.audio_source else None
+        admission_controller.admit(
+            db,
+            user.id,
+            tokens=estimate_conspect_tokens(
+                variants_count=1,
+                audio_seconds=estimated_cost,
+                text=source_text or conspect.input_prompt,
+            ),
+        )
         job = GenerationJob(
             user_id=user.id,
             job_type=GenerationJobType.CONSPECT,
             status=GenerationJobStatus.PENDING,
             conspect_id=conspect.id,
             audio_source_id=conspect.audio_source_id,
+            priority=priority,
+            estimated_cost=estimated_cost,
             prompt=json.dumps(
                 {
                     "variants": [variant.value],
@@ -122,16 +294,13 @@ class GenerationService:
         db.refresh(job)
         return job
 
-    def process_conspect_job(self, job_id: int) -> None:
+    def process_conspect_job(self, job_id: int, worker_id: str | None = None) -> None:
         session = self.session_factory()
         try:
             job = session.get(GenerationJob, job_id)
             if not job:
                 return
-
-            job.status = GenerationJobStatus.RUNNING
-            job.started_at = datetime.utcnow()
-            session.commit()
+            # RUNNING и started_at выставил JobQueue.claim_next вместе с захватом задачи
 
             conspect = session.get(Conspect, job.conspect_id)
             if not conspect:
@@ -140,12 +309,57 @@ class GenerationService:
             transcript_text = self._obtain_transcript(session, job)
             audio_source = session.get(AudioSource, job.audio_source_id) if job.audio_source_id else None
             variants, job_mode = self._job_execution_options(job)
+            # Повтор или возврат в очередь продолжает с первой незавершённой стадии. Транскрипт
+            # здесь не сохраняется: он уже лежит в AudioSource (вместе с готовыми сегментами)
+            checkpoints = dict(job.checkpoints or {})
+            raise_if_job_cancelled()
             try:
                 ai_client = self.ai_client if job.audio_source_id else self.text_ai_client
-                variant_payloads: dict[str, dict] = {}
-                for variant in variants:
-                    variant_payloads[variant.value] = ai_client.generate_conspect_variant(transcript_text, variant)
+                with track_calls() as call_stats:
+                    condensed = checkpoints.get("condensed")
+                    if condensed:
+                        source_text, sections_count = condensed["text"], int(condensed["sections"])
+                    else:
+                        with timed_stage("condense"):
+                            source_text, sections_count = self._condense_transcript(
+                                ai_client, transcript_text
+                            )
+                        if sections_count:
+                            self._save_checkpoint(
+                                job_id,
+                                "condensed",
+                                {"text": source_text, "sections": sections_count},
+                            )
+                    emit_progress("generating", variants=[variant.value for variant in variants])
+                    done_variants = checkpoints.get("variants") or {}
+                    generated, variant_errors = self._generate_variant_payloads(
+                        ai_client,
+                        source_text,
+                        [variant for variant in variants if variant.value not in done_variants],
+                        from_sections=sections_count > 0,
+                        on_variant=lambda variant_value, payload: self._save_checkpoint(
+                            job_id, "variants", payload, key=variant_value
+                        ),
+                    )
+                    variant_payloads = {
+                        variant.value: done_variants.get(variant.value) or generated[variant.value]
+                        for variant in variants
+                        if variant.value in done_variants or variant.value in generated
+                    }
+                if not variant_payloads:
+                    raise next(iter(variant_errors.values()))
                 response = {"variants": variant_payloads, "mode": "online"}
+                if sections_count:
+                    response["map_reduce"] = {"sections": sections_count}
+                if variant_errors:
+                    response["variant_errors"] = {
+                        key: str(error) for key, error in variant_errors.items()
+                    }
+                cache_summary = call_stats.cache_summary()
+                if cache_summary:
+                    response["cache"] = cache_summary
+            except JobCancelled:
+                raise
             except Exception as exc:  # noqa: BLE001
                 logging.exception("Conspect generation via AI failed: %s", exc)
                 if settings.environment != "production":
@@ -154,43 +368,208 @@ class GenerationService:
                 else:
                     raise
 
-            self._apply_variants_to_conspect(
-                conspect,
-                variant_payloads,
-                allow_title_update=job_mode == "create",
-            )
-            self._refresh_conspect_summary(conspect, transcript_text)
+            raise_if_job_cancelled()
+            # Сохранение и COMPLETED — одна транзакция под блокировкой строки задачи
+            if not self._owns_job(session, job_id, worker_id):
+                session.rollback()
+                return
+            emit_progress("saving")
+            with timed_stage("saving"):
+                self._apply_variants_to_conspect(
+                    conspect,
+                    variant_payloads,
+                    allow_title_update=job_mode == "create",
+                )
+                self._refresh_conspect_summary(conspect, transcript_text)
 
-            generation_mode = response.get("mode", "online")
-            conspect.model_used = (
-                (self.ai_client.model_name if job.audio_source_id else self.text_ai_client.model_name)
-                if generation_mode != "offline"
-                else "offline-fallback"
-            )
-            response_variants = variant_payloads
-            existing_response = conspect.raw_response or {}
-            combined_variants = dict(existing_response.get("variants") or {})
-            combined_variants.update(response_variants)
-            updated_response = {**existing_response, **response}
-            updated_response["variants"] = combined_variants
-            conspect.raw_response = updated_response
-            if job_mode == "create":
-                conspect.status = ConspectStatus.READY
-                conspect.generated_at = datetime.utcnow()
-            conspect.updated_at = datetime.utcnow()
+                generation_mode = response.get("mode", "online")
+                conspect.model_used = (
+                    (self.ai_client.model_name if job.audio_source_id else self.text_ai_client.model_name)
+                    if generation_mode != "offline"
+                    else "offline-fallback"
+                )
+                response_variants = variant_payloads
+                existing_response = conspect.raw_response or {}
+                combined_variants = dict(existing_response.get("variants") or {})
+                combined_variants.update(response_variants)
+                updated_response = {**existing_response, **response}
+                updated_response["variants"] = combined_variants
+                conspect.raw_response = updated_response
+                if job_mode == "create":
+                    conspect.status = ConspectStatus.READY
+                    conspect.generated_at = datetime.utcnow()
+                conspect.updated_at = datetime.utcnow()
 
             job.status = GenerationJobStatus.COMPLETED
             job.finished_at = datetime.utcnow()
+            self._record_job_metrics(job)
+            admission_controller.release(session, job.user_id)
+            notify_job_event(session, job.id, "status", status=job.status.value)
             job.response_payload = updated_response
 
             session.commit()
+        except JobCancelled:
+            session.rollback()
+            self._mark_job_cancelled(session, job_id, worker_id)
+            raise
         except Exception as exc:  # noqa: BLE001
             session.rollback()
-            self._mark_job_failed(session, job_id, str(exc))
+            self._mark_job_failed(session, job_id, str(exc), worker_id)
             raise
         finally:
             session.close()
 
+    def _generate_variant_payloads(
+        self,
+        ai_client: GeminiClientPool,
+        transcript_text: str,
+        variants: Sequence[ConspectVariantType],
+        from_sections: bool = False,
+        on_variant: Callable[[str, dict], None] | None = None,
+    ) -> tuple[dict[str, dict], dict[str, Exception]]:
+        """Генерирует варианты.
+
+        on_variant вызывается сразу по готовности каждого, в том числе из потоков.
+        """
+
+        def finished(variant_value: str, payload: dict) -> None:
+            payloads[variant_value] = payload
+            emit_progress("variant_done", variant=variant_value)
+            if on_variant is not None:
+                on_variant(variant_value, payload)
+
+        payloads: dict[str, dict] = {}
+        errors: dict[str, Exception] = {}
+        pending = list(variants)
+        if len(pending) > 1 and settings.conspect_combined_generation:
+            try:
+                with timed_stage("variants_combined"):
+                    combined = ai_client.generate_conspect_variants(
+                        transcript_text, pending, from_sections=from_sections
+                    )
+                for variant_value, payload in combined.items():
+                    finished(variant_value, payload)
+            except JobCancelled:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logging.warning(
+                    "Combined variant generation failed, falling back to per-variant calls: %s", exc
+                )
+            pending = [variant for variant in pending if variant.value not in payloads]
+
+        if len(pending) == 1:
+            variant = pending[0]
+            try:
+                finished(
+                    variant.value,
+                    self._generate_variant(
+                        ai_client, transcript_text, variant, from_sections=from_sections
+                    ),
+                )
+            except Exception as exc:  # noqa: BLE001
+                errors[variant.value] = exc
+        elif pending:
+            max_workers = max(1, min(len(pending), settings.conspect_variant_concurrency))
+            with ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="conspect-variant"
+            ) as executor:
+                futures = {
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self._generate_variant,
+                        ai_client,
+                        transcript_text,
+                        variant,
+                        from_sections=from_sections,
+                    ): variant
+                    for variant in pending
+                }
+                for future in as_completed(futures):
+                    variant = futures[future]
+                    try:
+                        finished(variant.value, future.result())
+                    except Exception as exc:  # noqa: BLE001
+                        logging.warning("Variant %s generation failed: %s", variant.value, exc)
+                        errors[variant.value] = exc
+        # Порядок как в запросе: от него зависит, чей title/key_points применится последним
+        ordered = {
+            variant.value: payloads[variant.value]
+            for variant in variants
+            if variant.value in payloads
+        }
+        return ordered, errors
+
+    def _generate_variant(
+        self,
+        ai_client: GeminiClientPool,
+        transcript_text: str,
+        variant: ConspectVariantType,
+        from_sections: bool = False,
+    ) -> dict:
+        with timed_stage(f"variant_{variant.value}"):
+            return ai_client.generate_conspect_variant(
+                transcript_text, variant, from_sections=from_sections
+            )
+
+    def _condense_transcript(
+        self, ai_client: GeminiClientPool, transcript_text: str
+    ) -> tuple[str, int]:
+        """Map-шаг map-reduce: сжимает транскрипт, не влезающий в бюджет токенов.
+
+        Разделы конспектируются параллельно, а варианты потом строятся по
+        склеенным заметкам. Возвращает текст для генерации и число разделов
+        (0 — транскрипт отправляется целиком).
+        """
+        text = transcript_text
+        sections_count = 0
+        # Заметки по очень длинной записи сами могут не влезть в бюджет — тогда ещё один проход
+        for _ in range(3):
+            if estimate_tokens(text) <= settings.conspect_token_budget:
+                break
+            sections = split_into_sections(text, settings.conspect_section_tokens)
+            if len(sections) < 2:
+                break
+            emit_progress("summarizing_sections", sections_total=len(sections))
+            notes = self._summarize_sections(ai_client, sections)
+            text = "\n\n".join(
+                f"## Часть {index + 1} из {len(sections)}\n\n{note['markdown']}"
+                for index, note in enumerate(notes)
+            )
+            sections_count = sections_count or len(sections)
+        return text, sections_count
+
+    def _summarize_sections(
+        self, ai_client: GeminiClientPool, sections: Sequence[str]
+    ) -> list[dict]:
+        notes: list[dict | None] = [None] * len(sections)
+        max_workers = max(1, min(len(sections), settings.conspect_section_concurrency))
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="conspect-section"
+        ) as executor:
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run,
+                    ai_client.summarize_section,
+                    section,
+                    index,
+                    len(sections),
+                ): index
+                for index, section in enumerate(sections)
+            }
+            # Без любого из разделов итоговый конспект потеряет часть лекции,
+            # поэтому ошибка фатальна
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    notes[futures[future]] = future.result()
+                    emit_progress(
+                        "summarizing_sections", sections_done=done, sections_total=len(sections)
+                    )
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+        return notes
+
     def _obtain_transcript(self, session: Session, job: GenerationJob) -> str:
         if job.audio_source_id is None:
             conspect = session.get(Conspect, job.conspect_id)
@@ -216,11 +595,53 @@ class GenerationService:
         except ValueError as exc:
             raise RuntimeError("Audio source path is invalid") from exc
 
-        try:
-            transcription_payload = self.ai_client.transcribe_audio(
-                file_path,
-                mime_type=audio_source.mime_type,
+        if not audio_source.content_hash and file_path.exists():
+            audio_source.content_hash = audio_storage.hash_file(file_path)
+            session.commit()
+
+        if audio_source.content_hash:
+            cached = transcript_cache.lookup(
+                session,
+                content_hash=audio_source.content_hash,
+                model_name=self.ai_client.model_name,
+                prompt_version=TRANSCRIPTION_PROMPT_VERSION,
             )
+            stats = current_stats()
+            if stats is not None:
+                stats.record_cache("transcript", "hit" if cached is not None else "miss")
+            if cached is not None:
+                audio_source.transcription = cached.transcript
+                audio_source.status = AudioProcessingStatus.READY
+                audio_source.extra_metadata = {
+                    **(cached.payload or {}),
+                    "transcript_cache": "hit",
+                }
+                session.commit()
+                return cached.transcript
+
+        with timed_stage("preprocessing"):
+            source_path, mime_type, content_key = self._prepare_audio(
+                session, audio_source, file_path
+            )
+        emit_progress("transcribing")
+        uploaded_files = UploadedFiles((audio_source.extra_metadata or {}).get("gemini_files"))
+        try:
+            # Загрузка файла в Gemini входит в эту стадию и отдельно видна как upload
+            with timed_stage("transcription"):
+                transcription_payload = self._transcribe_file(
+                    session,
+                    audio_source,
+                    source_path,
+                    uploaded_files,
+                    mime_type=mime_type,
+                    content_key=content_key,
+                )
+        except JobCancelled:
+            # Загруженный файл и готовые сегменты пригодятся, если запись отправят снова
+            audio_source.status = AudioProcessingStatus.PENDING
+            self._remember_uploaded_files(audio_source, uploaded_files)
+            session.commit()
+            raise
         except Exception as exc:  # noqa: BLE001
             logging.exception("Audio transcription failed: %s", exc)
             if settings.environment != "production":
@@ -237,7 +658,7 @@ class GenerationService:
                 return fallback_transcript
             if self._is_transient_ai_failure(exc):
                 audio_source.status = AudioProcessingStatus.PENDING
-                metadata = audio_source.extra_metadata or {}
+                metadata = dict(audio_source.extra_metadata or {})
                 metadata.update(
                     {
                         "transient_error": str(exc),
@@ -245,11 +666,14 @@ class GenerationService:
                     }
                 )
                 audio_source.extra_metadata = metadata
+                # Следующая попытка возьмёт уже загруженный в Gemini файл
+                self._remember_uploaded_files(audio_source, uploaded_files)
                 session.commit()
                 raise RuntimeError(
                     "Сервис распознавания перегружен. Повтори попытку через пару минут."
                 ) from exc
             audio_source.status = AudioProcessingStatus.FAILED
+            self._remember_uploaded_files(audio_source, uploaded_files)
             session.commit()
             raise RuntimeError(f"Ошибка распознавания аудио: {exc}") from exc
         transcript = transcription_payload.get("transcript")
@@ -259,10 +683,352 @@ class GenerationService:
         audio_source.transcription = transcript
         audio_source.status = AudioProcessingStatus.READY
         audio_source.extra_metadata = transcription_payload
+        self._remember_uploaded_files(audio_source, uploaded_files)
+        if audio_source.content_hash:
+            transcript_cache.store(
+                session,
+                content_hash=audio_source.content_hash,
+                model_name=self.ai_client.model_name,
+                prompt_version=TRANSCRIPTION_PROMPT_VERSION,
+                transcript=transcript,
+                payload=transcription_payload,
+            )
         session.commit()
 
         return transcript
 
+    def _prepare_audio(
+        self,
+        session: Session,
+        audio_source: AudioSource,
+        file_path: Path,
+    ) -> tuple[Path, str | None, str | None]:
+        """Файл для Gemini: моно-копия с низким битрейтом, если её удалось сделать, иначе оригинал.
+
+        Возвращает путь, MIME-тип и ключ содержимого для кэша загруженных файлов.
+        Копия создаётся один раз и переиспользуется следующими попытками; длинные
+        паузы из неё вырезаются, а связь с оригиналом хранится в speech_time_map.
+        """
+        if audio_source.processed_file_path:
+            try:
+                processed_path = audio_storage.resolve_path(audio_source.processed_file_path)
+            except ValueError:
+                processed_path = None
+            if processed_path is not None and processed_path.exists():
+                return (
+                    processed_path,
+                    audio_source.processed_mime_type,
+                    self._processed_content_key(audio_source),
+                )
+
+        original = (file_path, audio_source.mime_type, audio_source.content_hash)
+        if not settings.audio_preprocessing_enabled or not ffmpeg_available():
+            return original
+
+        emit_progress("preprocessing")
+        keep_intervals = None
+        analysis = None
+        # Замер при загрузке уже показал, что вырезать нечего, — второй проход VAD не нужен
+        duration, ratio = audio_source.duration_seconds, audio_source.speech_ratio
+        if duration is None or ratio is None or self._should_trim(float(duration), float(ratio)):
+            analysis = self._analyze_speech(session, audio_source, file_path)
+        if analysis is not None and self._should_trim(analysis.duration, analysis.speech_ratio):
+            keep_intervals = analysis.intervals
+        destination = file_path.with_name(f"{file_path.stem}_speech.mp3")
+        try:
+            processed_size = preprocess_in_pool(
+                file_path,
+                destination,
+                max_workers=settings.audio_preprocess_workers,
+                sample_rate=settings.audio_preprocess_sample_rate,
+                bitrate=settings.audio_preprocess_bitrate,
+                keep_intervals=keep_intervals,
+            )
+        except Exception as exc:  # noqa: BLE001
+            logging.warning(
+                "Audio preprocessing failed for %s, using original: %s", file_path.name, exc
+            )
+            destination.unlink(missing_ok=True)
+            return original
+
+        original_size = file_path.stat().st_size
+        if processed_size >= original_size:
+            # Исходник и так сжат сильнее (например, голосовое сообщение) — отправляем его
+            destination.unlink(missing_ok=True)
+            return original
+
+        audio_source.processed_file_path = str(
+            destination.relative_to(audio_storage.base_dir.resolve())
+        )
+        audio_source.processed_mime_type = SPEECH_MIME_TYPE
+        audio_source.processed_file_size = processed_size / (1024 * 1024)
+        audio_source.speech_time_map = (
+            TimeMap(tuple(keep_intervals)).to_metadata() if keep_intervals else None
+        )
+        session.commit()
+        logging.info(
+            "Preprocessed audio %s: %.1f MB -> %.1f MB%s",
+            audio_source.id,
+            original_size / (1024 * 1024),
+            processed_size / (1024 * 1024),
+            f", speech {analysis.speech_ratio:.0%}" if keep_intervals else "",
+        )
+        return destination, SPEECH_MIME_TYPE, self._processed_content_key(audio_source)
+
+    def _processed_content_key(self, audio_source: AudioSource) -> str | None:
+        if not audio_source.content_hash:
+            return None
+        key = (
+            f"{audio_source.content_hash}:speech-{settings.audio_preprocess_sample_rate}-"
+            f"{settings.audio_preprocess_bitrate}"
+        )
+        return f"{key}-vad" if audio_source.speech_time_map else key
+
+    def measure_audio(self, session: Session, audio_source: AudioSource, file_path: Path) -> None:
+        """Замер записи при загрузке: по нему estimate_job_cost ранжирует будущую задачу.
+
+        Без VAD длительность берётся из ffprobe, а доля речи остаётся неизвестной.
+        """
+        if not settings.audio_preprocessing_enabled or not ffmpeg_available():
+            return
+        if self._analyze_speech(session, audio_source, file_path) is not None:
+            return
+        duration = probe_duration(file_path)
+        if duration:
+            audio_source.duration_seconds = round(duration, 2)
+            session.commit()
+
+    def _analyze_speech(
+        self,
+        session: Session,
+        audio_source: AudioSource,
+        file_path: Path,
+    ) -> SpeechAnalysis | None:
+        """VAD по энергии.
+
+        Длительность и доля речи сохраняются на AudioSource для оценки стоимости задач.
+        """
+        if not settings.vad_enabled or not vad_available():
+            return None
+        try:
+            analysis = run_in_process_pool(
+                analyze_speech,
+                file_path,
+                max_workers=settings.audio_preprocess_workers,
+                min_silence_seconds=settings.vad_min_silence_seconds,
+                padding_seconds=settings.vad_padding_seconds,
+                margin_db=settings.vad_margin_db,
+            )
+        except Exception as exc:  # noqa: BLE001
+            logging.warning("Speech detection failed for %s: %s", file_path.name, exc)
+            return None
+        audio_source.duration_seconds = analysis.duration
+        audio_source.speech_ratio = round(analysis.speech_ratio, 4)
+        session.commit()
+        return analysis
+
+    def _should_trim(self, duration: float, speech_ratio: float) -> bool:
+        # Почти без речи — скорее порог ошибся (музыка, ровный шум), чем запись пустая
+        if speech_ratio < settings.vad_min_speech_ratio:
+            return False
+        return duration * (1.0 - speech_ratio) >= settings.vad_min_trimmed_seconds
+
+    def _transcribe_file(
+        self,
+        session: Session,
+        audio_source: AudioSource,
+        file_path: Path,
+        uploaded_files: UploadedFiles | None = None,
+        *,
+        mime_type: str | None = None,
+        content_key: str | None = None,
+    ) -> dict:
+        if settings.transcription_chunking_enabled and ffmpeg_available():
+            duration = probe_duration(file_path)
+            if duration and duration > settings.transcription_chunk_min_duration_seconds:
+                return self._transcribe_in_segments(
+                    session,
+                    audio_source,
+                    file_path,
+                    duration,
+                    uploaded_files,
+                    content_key=content_key,
+                )
+        return self.ai_client.transcribe_audio(
+            file_path,
+            mime_type=mime_type,
+            content_key=content_key,
+            uploaded_files=uploaded_files,
+        )
+
+    def _remember_uploaded_files(
+        self, audio_source: AudioSource, uploaded_files: UploadedFiles | None
+    ) -> None:
+        if uploaded_files is None:
+            return
+        handles = uploaded_files.to_metadata()
+        metadata = dict(audio_source.extra_metadata or {})
+        if handles:
+            metadata["gemini_files"] = handles
+        else:
+            metadata.pop("gemini_files", None)
+        audio_source.extra_metadata = metadata
+
+    def _transcribe_in_segments(
+        self,
+        session: Session,
+        audio_source: AudioSource,
+        file_path: Path,
+        duration: float,
+        uploaded_files: UploadedFiles | None = None,
+        *,
+        content_key: str | None = None,
+    ) -> dict:
+        """Распознаёт длинную запись по перекрывающимся сегментам параллельно.
+
+        Прогресс по сегментам хранится в extra_metadata["segments"], поэтому
+        повторная попытка распознаёт заново только упавшие сегменты. Каждый
+        сегмент помечен ключом файла, из которого вырезан (content_key из
+        _prepare_audio): оригинал и копия без пауз дают одинаковые окна, но
+        разный звук, так что прогресс другого файла не переиспользуется.
+        """
+        source = content_key or file_path.name
+        segments = plan_segments(
+            duration,
+            detect_silences(file_path),
+            target_seconds=settings.transcription_segment_seconds,
+            overlap_seconds=settings.transcription_segment_overlap_seconds,
+            search_window_seconds=settings.transcription_silence_search_seconds,
+        )
+        previous = {
+            (item.get("start"), item.get("end")): item.get("transcript")
+            for item in (audio_source.extra_metadata or {}).get("segments") or []
+            if isinstance(item, dict)
+            and item.get("source") == source
+            and item.get("status") == "done"
+            and item.get("transcript") is not None
+        }
+        # Сегменты режутся по записи без пауз; время в оригинале — для отладки и таймкодов
+        time_map = TimeMap.from_metadata(audio_source.speech_time_map)
+        progress: list[dict] = []
+        for segment in segments:
+            transcript = previous.get((segment.start, segment.end))
+            entry = {
+                "index": segment.index,
+                "source": source,
+                "start": segment.start,
+                "end": segment.end,
+                "status": "done" if transcript is not None else "pending",
+                "transcript": transcript,
+            }
+            if time_map is not None:
+                entry["original_start"] = time_map.to_original(segment.start)
+                entry["original_end"] = time_map.to_original(segment.end)
+            progress.append(entry)
+        self._save_segment_progress(session, audio_source, duration, progress, uploaded_files)
+
+        pending = [segment for segment in segments if progress[segment.index]["status"] != "done"]
+        errors: dict[int, Exception] = {}
+        if pending:
+            max_workers = max(1, min(len(pending), settings.transcription_segment_concurrency))
+            with (
+                tempfile.TemporaryDirectory(prefix="conspectium-segments-") as tmp_dir,
+                ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="transcribe-segment"
+                ) as executor,
+            ):
+                futures = {
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self._transcribe_segment,
+                        file_path,
+                        segment,
+                        Path(tmp_dir),
+                        self._segment_content_key(content_key, segment),
+                        uploaded_files,
+                    ): segment
+                    for segment in pending
+                }
+                for future in as_completed(futures):
+                    entry = progress[futures[future].index]
+                    try:
+                        entry["transcript"] = future.result()
+                        entry["status"] = "done"
+                        entry.pop("error", None)
+                    except Exception as exc:  # noqa: BLE001
+                        logging.warning("Segment %s transcription failed: %s", entry["index"], exc)
+                        errors[entry["index"]] = exc
+                        entry["status"] = "failed"
+                        entry["error"] = str(exc)
+                    self._save_segment_progress(
+                        session, audio_source, duration, progress, uploaded_files
+                    )
+                    emit_progress(
+                        "transcribing",
+                        segments_done=sum(1 for item in progress if item["status"] == "done"),
+                        segments_total=len(progress),
+                    )
+
+        if errors:
+            raise errors[min(errors)]
+
+        return {
+            "transcript": merge_transcripts([entry["transcript"] for entry in progress]),
+            "duration_sec": round(duration, 2),
+            "segments": [
+                {key: value for key, value in entry.items() if key != "transcript"}
+                for entry in progress
+            ],
+        }
+
+    @staticmethod
+    def _segment_content_key(content_key: str | None, segment: AudioSegment) -> str | None:
+        if not content_key:
+            return None
+        return f"{content_key}@{segment.start:.2f}-{segment.end:.2f}"
+
+    def _transcribe_segment(
+        self,
+        file_path: Path,
+        segment: AudioSegment,
+        tmp_dir: Path,
+        content_key: str | None = None,
+        uploaded_files: UploadedFiles | None = None,
+    ) -> str:
+        segment_path = extract_segment(
+            file_path,
+            segment,
+            tmp_dir / f"segment-{segment.index:04d}.mp3",
+            sample_rate=settings.audio_preprocess_sample_rate,
+            bitrate=settings.audio_preprocess_bitrate,
+        )
+        payload = self.ai_client.transcribe_audio(
+            segment_path,
+            mime_type=SPEECH_MIME_TYPE,
+            content_key=content_key,
+            uploaded_files=uploaded_files,
+        )
+        transcript = payload.get("transcript") if isinstance(payload, dict) else None
+        if transcript is None:
+            raise RuntimeError(f"Failed to obtain transcript for segment {segment.index}")
+        return transcript
+
+    def _save_segment_progress(
+        self,
+        session: Session,
+        audio_source: AudioSource,
+        duration: float,
+        progress: list[dict],
+        uploaded_files: UploadedFiles | None = None,
+    ) -> None:
+        # Новый объект, иначе SQLAlchemy не заметит изменения внутри JSONB
+        metadata = dict(audio_source.extra_metadata or {})
+        metadata["duration_sec"] = round(duration, 2)
+        metadata["segments"] = [dict(entry) for entry in progress]
+        audio_source.extra_metadata = metadata
+        self._remember_uploaded_files(audio_source, uploaded_files)
+        session.commit()
+
     # Quiz pipeline -----------------------------------------------------
     def create_quiz_job(
         self,
@@ -276,6 +1042,7 @@ class GenerationService:
             raise ValueError("Конспект не найден")
         if conspect.status != ConspectStatus.READY:
             raise ValueError("Дождись завершения генерации конспекта")
+        admission_controller.admit(db, user.id, tokens=estimate_quiz_tokens(conspect.summary))
 
         quiz = Quiz(
             user_id=user.id,
@@ -299,16 +1066,13 @@ class GenerationService:
         db.refresh(job)
         return job
 
-    def process_quiz_job(self, job_id: int) -> None:
+    def process_quiz_job(self, job_id: int, worker_id: str | None = None) -> None:
         session = self.session_factory()
         try:
             job = session.get(GenerationJob, job_id)
             if not job:
                 return
-
-            job.status = GenerationJobStatus.RUNNING
-            job.started_at = datetime.utcnow()
-            session.commit()
+            # RUNNING и started_at выставил JobQueue.claim_next вместе с захватом задачи
 
             conspect = session.get(Conspect, job.conspect_id)
             quiz = session.get(Quiz, job.quiz_id) if job.quiz_id else None
@@ -327,8 +1091,17 @@ class GenerationService:
                 except (json.JSONDecodeError, ValueError, TypeError):
                     pass
 
+            emit_progress("generating")
             try:
-                ai_response = self.ai_client.generate_quiz(conspect.summary or "", questions_count=questions_count)
+                with track_calls() as call_stats, timed_stage("quiz_generation"):
+                    ai_response = self._assemble_quiz(session, conspect, questions_count)
+                # Пополненный банк вопросов сохраняется сразу: повтор задачи возьмёт его без Gemini
+                session.commit()
+                cache_summary = call_stats.cache_summary()
+                if cache_summary:
+                    ai_response["cache"] = cache_summary
+            except JobCancelled:
+                raise
             except Exception as exc:  # noqa: BLE001
                 logging.exception("Quiz generation via AI failed: %s", exc)
                 if settings.environment != "production":
@@ -350,55 +1123,93 @@ class GenerationService:
             quiz.model_used = self.ai_client.model_name
             quiz.raw_response = ai_response
 
-            questions_payload = ai_response.get("questions") or []
-            self._populate_quiz_questions(session, quiz, questions_payload)
+            raise_if_job_cancelled()
+            if not self._owns_job(session, job_id, worker_id):
+                session.rollback()
+                return
+            emit_progress("saving")
+            with timed_stage("saving"):
+                questions_payload = ai_response.get("questions") or []
+                self._populate_quiz_questions(session, quiz, questions_payload)
 
             quiz.status = QuizStatus.READY
             quiz.updated_at = datetime.utcnow()
             job.status = GenerationJobStatus.COMPLETED
             job.finished_at = datetime.utcnow()
+            self._record_job_metrics(job)
+            admission_controller.release(session, job.user_id)
+            notify_job_event(session, job.id, "status", status=job.status.value)
             job.response_payload = ai_response
 
             session.commit()
+        except JobCancelled:
+            session.rollback()
+            self._mark_job_cancelled(session, job_id, worker_id)
+            raise
         except Exception as exc:  # noqa: BLE001
             session.rollback()
-            self._mark_job_failed(session, job_id, str(exc))
+            self._mark_job_failed(session, job_id, str(exc), worker_id)
             raise
         finally:
             session.close()
 
+    def _assemble_quiz(self, session: Session, conspect: Conspect, questions_count: int) -> dict:
+        """Собирает тест выборкой из банка вопросов конспекта.
+
+        Gemini вызывается, только когда в банке меньше вопросов, чем нужно: тогда
+        банк пополняется партией quiz_bank_batch_size новых вопросов.
+        """
+        summary = conspect.summary or ""
+        if not settings.quiz_bank_enabled:
+            return self.ai_client.generate_quiz(summary, questions_count=questions_count)
+
+        source_hash = summary_hash(summary)
+        pool = question_bank.available(session, conspect_id=conspect.id, source_hash=source_hash)
+        generated: dict = {}
+        added_count = 0
+        if len(pool) < questions_count:
+            generated = self.ai_client.generate_question_bank(
+                summary,
+                max(settings.quiz_bank_batch_size, questions_count),
+                exclude=[question.question for question in pool],
+            )
+            generated_questions = (
+                generated.get("questions") if isinstance(generated, dict) else None
+            )
+            added = question_bank.store(
+                session,
+                conspect_id=conspect.id,
+                source_hash=source_hash,
+                questions_payload=generated_questions or [],
+                existing=pool,
+            )
+            added_count = len(added)
+            pool = [*pool, *added]
+
+        return {
+            "title": generated.get("title"),
+            "description": generated.get("description"),
+            "questions": question_bank.sample(pool, questions_count),
+            "question_bank": {"pool_size": len(pool), "generated": added_count},
+        }
+
     def _populate_quiz_questions(
         self,
         session: Session,
         quiz: Quiz,
         questions_payload: Sequence[dict],
     ) -> None:
-        existing_questions: Iterable[QuizQuestion] = list(quiz.questions)
-        for question in existing_questions:
-            session.delete(question)
-        session.flush()
-
-        for idx, item in enumerate(questions_payload):
-            question = QuizQuestion(
-                quiz_id=quiz.id,
-                user_id=quiz.user_id,
-                title=item.get("question", f"Вопрос {idx + 1}"),
-                explanation=item.get("explanation"),
-                position=idx,
-            )
-            session.add(question)
-            session.flush()
-
-            answers = item.get("answers") or []
-            for answer_idx, answer_payload in enumerate(answers):
-                answer = QuizAnswer(
-                    question_id=question.id,
-                    user_id=quiz.user_id,
-                    text=answer_payload.get("text", ""),
-                    is_correct=bool(answer_payload.get("is_correct")),
-                    position=answer_idx,
-                )
-                session.add(answer)
+        replace_quiz_questions(
+            session,
+            quiz_id=quiz.id,
+            user_id=quiz.user_id,
+            questions=[
+                QuestionDraft.from_ai_payload(item, idx)
+                for idx, item in enumerate(questions_payload)
+            ],
+        )
+        # Вопросы вставлены в обход ORM — загруженная коллекция устарела
+        session.expire(quiz, ["questions"])
 
     # Utility -----------------------------------------------------------
     def _normalize_variants(
@@ -436,6 +1247,9 @@ class GenerationService:
         return bool(conspect.compressed_markdown)
 
     def _is_transient_ai_failure(self, exc: Exception) -> bool:
+        transient = RateLimitTimeout | CircuitOpenError
+        if isinstance(exc, transient) or isinstance(exc.__cause__, transient):
+            return True
         if google_exceptions is None:
             return False
         transient_types: tuple[type[Exception], ...] = (
@@ -519,26 +1333,242 @@ class GenerationService:
         elif transcript_text:
             conspect.summary = transcript_text[:200].strip()
 
-    def _mark_job_failed(self, session: Session, job_id: int, error: str) -> None:
+    def _record_job_metrics(self, job: GenerationJob) -> None:
+        """Переносит в задачу ретраи, токены, попадания в кэш и время стадий текущей попытки."""
+        stats = current_stats()
+        if stats is None:
+            return
+        if stats.retries:
+            job.retries = (job.retries or 0) + stats.retries
+        metrics = stats.as_metrics()
+        # После commit колонки перечитываются aware-значениями, а finished_at только что стал naive
+        created_at, started_at, finished_at = (
+            as_naive_utc(value) if value is not None else None
+            for value in (job.created_at, job.started_at, job.finished_at)
+        )
+        if created_at and started_at:
+            metrics["queue_wait_seconds"] = round((started_at - created_at).total_seconds(), 3)
+        if started_at and finished_at:
+            metrics["run_seconds"] = round((finished_at - started_at).total_seconds(), 3)
+        job.metrics = metrics
+
+    def _save_checkpoint(
+        self, job_id: int, stage: str, payload: Any, *, key: str | None = None
+    ) -> None:
+        """Фиксирует завершённую стадию отдельной транзакцией, не дожидаясь конца задачи.
+
+        С key записывается один элемент стадии (например, один вариант конспекта).
+        """
+        session = self.session_factory()
+        try:
+            job = (
+                session.query(GenerationJob)
+                .filter(GenerationJob.id == job_id)
+                .with_for_update()
+                .one_or_none()
+            )
+            if job is None:
+                return
+            checkpoints = dict(job.checkpoints or {})
+            if key is None:
+                checkpoints[stage] = payload
+            else:
+                checkpoints[stage] = {**(checkpoints.get(stage) or {}), key: payload}
+            job.checkpoints = checkpoints
+            session.commit()
+        except Exception as exc:  # noqa: BLE001
+            session.rollback()
+            # Задача доработает и без контрольной точки — повтор лишь заплатит за стадию ещё раз
+            logging.warning("Failed to checkpoint %s of job %s: %s", stage, job_id, exc)
+        finally:
+            session.close()
+
+    def cancel_job(self, db: Session, job: GenerationJob) -> GenerationJob:
+        """Отменяет задачу: ожидающую — сразу, выполняющуюся — флагом, который заметит воркер."""
+        job = (
+            db.query(GenerationJob)
+            .filter(GenerationJob.id == job.id)
+            .with_for_update()
+            .populate_existing()
+            .one()
+        )
+        if job.status not in ACTIVE_JOB_STATUSES:
+            raise ValueError("Задача уже завершена")
+        if job.cancel_requested_at is None:
+            job.cancel_requested_at = datetime.utcnow()
+        if job.status == GenerationJobStatus.PENDING:
+            # Воркер её ещё не взял — слот и место в очереди освобождаются сразу
+            self._finish_cancelled(db, job)
+        else:
+            notify_job_event(db, job.id, "cancel_requested")
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def abandon_job(self, job_id: int) -> None:
+        """Завершает задачу с истёкшей арендой, которую reaper не стал возвращать в очередь."""
+        session = self.session_factory()
+        try:
+            job = (
+                session.query(GenerationJob)
+                .filter(
+                    GenerationJob.id == job_id,
+                    GenerationJob.status == GenerationJobStatus.RUNNING,
+                    GenerationJob.lease_expires_at < datetime.utcnow(),
+                )
+                .with_for_update(skip_locked=True)
+                .one_or_none()
+            )
+            if job is None:
+                # Воркер успел продлить аренду или задачу уже завершили
+                session.rollback()
+                return
+            if job.cancel_requested_at is not None:
+                self._finish_cancelled(session, job)
+                session.commit()
+                return
+            logging.warning(
+                "Job %s failed after %s attempts without a live worker", job.id, job.attempts
+            )
+            self._mark_job_failed(
+                session,
+                job.id,
+                f"Задача прервалась: воркер перестал отвечать ({job.attempts} попыток)",
+            )
+        finally:
+            session.close()
+
+    def _owns_job(self, session: Session, job_id: int, worker_id: str | None) -> bool:
+        """Блокирует строку задачи до commit и проверяет, что она всё ещё за этим воркером.
+
+        Пока монитор не заметил потерю аренды, reaper мог вернуть задачу в
+        очередь, а другой воркер — забрать её: тогда итог и освобождение слота
+        допуска принадлежат ему. Без worker_id (reaper) владелец не проверяется.
+        """
+        if worker_id is None:
+            return True
+        owned = (
+            session.query(GenerationJob.id)
+            .filter(
+                GenerationJob.id == job_id,
+                GenerationJob.worker_id == worker_id,
+                GenerationJob.status == GenerationJobStatus.RUNNING,
+            )
+            .with_for_update()
+            .one_or_none()
+        )
+        if owned is None:
+            logging.warning(
+                "Job %s is no longer owned by %s, dropping its result", job_id, worker_id
+            )
+            return False
+        return True
+
+    def _mark_job_cancelled(
+        self, session: Session, job_id: int, worker_id: str | None = None
+    ) -> None:
+        if not self._owns_job(session, job_id, worker_id):
+            session.rollback()
+            return
         job = session.get(GenerationJob, job_id)
-        if not job:
+        if not job or job.status not in ACTIVE_JOB_STATUSES:
+            return
+        if job.cancel_requested_at is None:
+            # Отмены не было: аренду забрал reaper, задача уже у другого воркера
             return
+        self._finish_cancelled(session, job)
+        session.commit()
+
+    def _finish_cancelled(self, session: Session, job: GenerationJob) -> None:
         _, job_mode = self._job_execution_options(job)
+        if job.status in ACTIVE_JOB_STATUSES:
+            admission_controller.release(session, job.user_id)
+        job.status = GenerationJobStatus.CANCELLED
+        job.error = "Задача отменена"
+        job.finished_at = datetime.utcnow()
+        self._record_job_metrics(job)
+        if job.conspect_id and job_mode == "create":
+            conspect = session.get(Conspect, job.conspect_id)
+            if conspect:
+                conspect.status = ConspectStatus.FAILED
+        if job.quiz_id:
+            quiz = session.get(Quiz, job.quiz_id)
+            if quiz:
+                quiz.status = QuizStatus.FAILED
+        if job.audio_source_id:
+            # Сама запись не испорчена: её можно отправить в новую задачу
+            audio_source = session.get(AudioSource, job.audio_source_id)
+            if audio_source and audio_source.status == AudioProcessingStatus.PROCESSING:
+                audio_source.status = AudioProcessingStatus.PENDING
+        notify_job_event(session, job.id, "status", status=job.status.value)
+
+    def _apply_checkpointed_variants(
+        self,
+        job: GenerationJob,
+        conspect: Conspect,
+        requested: Sequence[ConspectVariantType],
+        job_mode: str,
+    ) -> bool:
+        """Варианты, готовые до сбоя, остаются в конспекте, а не пропадают вместе с задачей.
+
+        Недоделанные варианты попадают в variant_errors, как при частичном успехе, —
+        по ним клиент видит неполный конспект (Conspect.missing_variants).
+        """
+        variants = (job.checkpoints or {}).get("variants") or {}
+        if not variants:
+            return False
+        self._apply_variants_to_conspect(
+            conspect, variants, allow_title_update=job_mode == "create"
+        )
+        self._refresh_conspect_summary(conspect, conspect.input_prompt)
+        response = dict(conspect.raw_response or {})
+        response["variants"] = {**(response.get("variants") or {}), **variants}
+        missing = {
+            variant.value: job.error or "" for variant in requested if variant.value not in variants
+        }
+        if missing:
+            response["variant_errors"] = {**(response.get("variant_errors") or {}), **missing}
+        conspect.raw_response = response
+        if conspect.status == ConspectStatus.PROCESSING:
+            conspect.status = ConspectStatus.READY
+            conspect.generated_at = datetime.utcnow()
+        conspect.updated_at = datetime.utcnow()
+        return True
+
+    def _mark_job_failed(
+        self, session: Session, job_id: int, error: str, worker_id: str | None = None
+    ) -> None:
+        if not self._owns_job(session, job_id, worker_id):
+            session.rollback()
+            return
+        job = session.get(GenerationJob, job_id)
+        if not job:
+            return
+        requested_variants, job_mode = self._job_execution_options(job)
+        if job.status in ACTIVE_JOB_STATUSES:
+            admission_controller.release(session, job.user_id)
         job.status = GenerationJobStatus.FAILED
         job.error = error
         job.finished_at = datetime.utcnow()
+        self._record_job_metrics(job)
+        salvaged = False
         if job.conspect_id:
             conspect = session.get(Conspect, job.conspect_id)
-            if conspect and job_mode == "create":
-                conspect.status = ConspectStatus.FAILED
+            if conspect:
+                salvaged = self._apply_checkpointed_variants(
+                    job, conspect, requested_variants, job_mode
+                )
+                if job_mode == "create" and not salvaged:
+                    conspect.status = ConspectStatus.FAILED
         if job.quiz_id:
             quiz = session.get(Quiz, job.quiz_id)
             if quiz:
                 quiz.status = QuizStatus.FAILED
-        if job.audio_source_id and job_mode == "create":
+        if job.audio_source_id and job_mode == "create" and not salvaged:
             audio_source = session.get(AudioSource, job.audio_source_id)
             if audio_source and audio_source.status != AudioProcessingStatus.PENDING:
                 audio_source.status = AudioProcessingStatus.FAILED
+        notify_job_event(session, job.id, "status", status=job.status.value)
         session.commit()
 
     def _markdown_to_plain(self, text: str, max_length: int = 400) -> str:
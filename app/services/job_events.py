@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import engine
+
+CHANNEL = "generation_job_events"
+
+_current_job_id: ContextVar[int | None] = ContextVar("generation_job_id", default=None)
+
+
+def _payload(job_id: int, event: str, data: dict[str, Any]) -> str:
+    return json.dumps({"job_id": job_id, "event": event, **data}, ensure_ascii=False, default=str)
+
+
+def notify_job_event(session: Session, job_id: int, event: str, **data: Any) -> None:
+    """Ставит NOTIFY в текущую транзакцию: слушатели получат событие только после commit."""
+    bind = getattr(session, "bind", None)
+    if bind is None or bind.dialect.name != "postgresql":
+        return
+    session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": _payload(job_id, event, data)},
+    )
+
+
+@contextmanager
+def job_event_scope(job_id: int) -> Iterator[None]:
+    token = _current_job_id.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job_id.reset(token)
+
+
+def emit_progress(stage: str, **data: Any) -> None:
+    """Сообщает о ходе текущей задачи сразу, вне транзакции.
+
+    Без job_event_scope ничего не делает.
+    """
+    job_id = _current_job_id.get()
+    if job_id is None or engine.dialect.name != "postgresql":
+        return
+    try:
+        with engine.connect() as connection:
+            connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {
+                    "channel": CHANNEL,
+                    "payload": _payload(job_id, "progress", {"stage": stage, **data}),
+                },
+            )
+            connection.commit()
+    except Exception as exc:  # noqa: BLE001
+        logging.warning("Failed to publish progress for job %s: %s", job_id, exc)
+
+
+class JobEventHub:
+    """Один LISTEN-поток на процесс API, раздающий уведомления подписчикам.
+
+    Подписчик (SSE-поток или long-poll запрос) — asyncio-очередь, слушающая одну
+    или несколько задач; поток кладёт в неё события через call_soon_threadsafe.
+    """
+
+    def __init__(self, dsn: str, *, queue_size: int = 100) -> None:
+        self.dsn = dsn
+        self.queue_size = queue_size
+        self._subscribers: dict[int, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def subscribe(self, job_ids: Iterable[int]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            for job_id in job_ids:
+                self._subscribers.setdefault(job_id, set()).add(subscriber)
+            self._ensure_started()
+        return queue
+
+    def unsubscribe(self, job_ids: Iterable[int], queue: asyncio.Queue) -> None:
+        with self._lock:
+            for job_id in job_ids:
+                subscribers = self._subscribers.get(job_id)
+                if not subscribers:
+                    continue
+                subscribers.difference_update({item for item in subscribers if item[1] is queue})
+                if not subscribers:
+                    del self._subscribers[job_id]
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def dispatch(self, raw_payload: str) -> None:
+        try:
+            event = json.loads(raw_payload)
+            job_id = int(event["job_id"])
+        except (ValueError, KeyError, TypeError):
+            logging.warning("Malformed job event payload: %s", raw_payload)
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put_latest, queue, event)
+            except RuntimeError:
+                # Event loop подписчика уже закрыт
+                self.unsubscribe([job_id], queue)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="job-event-listener", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(self.dsn)
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.dispatch(connection.notifies.pop(0).payload)
+            except Exception as exc:  # noqa: BLE001
+                logging.warning(
+                    "Job event listener failed, reconnecting in %.0fs: %s",
+                    backoff,
+                    exc,
+                )
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+def _put_latest(queue: asyncio.Queue, event: dict[str, Any]) -> None:
+    # Медленный клиент теряет самые старые события, а не блокирует остальных
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+job_event_hub = JobEventHub(
+    make_url(str(settings.database_url)).set(drivername="postgresql").render_as_string(hide_password=False)
+)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import math
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from app.models.enums import GenerationJobType
+from app.models.generation import GenerationJob
+
+# Сводка считается в памяти; окно режется по числу последних задач, чтобы запрос не рос без предела
+MAX_SUMMARY_JOBS = 5000
+
+
+def _percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def _distribution(values: Iterable[float]) -> dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "avg": round(sum(ordered) / len(ordered), 3),
+        "p50": round(_percentile(ordered, 0.5), 3),
+        "p95": round(_percentile(ordered, 0.95), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _cache_counts(counts: Counter[str]) -> dict[str, Any]:
+    lookups = counts["hits"] + counts["misses"]
+    return {
+        "hits": counts["hits"],
+        "misses": counts["misses"],
+        "hit_rate": round(counts["hits"] / lookups, 3) if lookups else 0.0,
+    }
+
+
+def summarize_job_metrics(
+    rows: Iterable[tuple[GenerationJobType, Any, dict | None]],
+) -> dict[str, Any]:
+    """Сводка по (job_type, status, metrics) завершённых задач.
+
+    Для каждой стадии — распределение её времени на задачу и доля в суммарном
+    времени всех стадий: сразу видно, где задачи проводят больше всего времени.
+    Кэш считается и в целом, и по видам (cache.by_label).
+    """
+    jobs = 0
+    by_type: Counter[str] = Counter()
+    by_status: Counter[str] = Counter()
+    queue_wait: list[float] = []
+    run_time: list[float] = []
+    stage_times: dict[str, list[float]] = defaultdict(list)
+    gemini: Counter[str] = Counter()
+    cache: Counter[str] = Counter()
+    cache_by_label: dict[str, Counter[str]] = defaultdict(Counter)
+
+    for job_type, job_status, metrics in rows:
+        jobs += 1
+        by_type[getattr(job_type, "value", str(job_type))] += 1
+        by_status[getattr(job_status, "value", str(job_status))] += 1
+        if not metrics:
+            continue
+        if metrics.get("queue_wait_seconds") is not None:
+            queue_wait.append(float(metrics["queue_wait_seconds"]))
+        if metrics.get("run_seconds") is not None:
+            run_time.append(float(metrics["run_seconds"]))
+        for stage, entry in (metrics.get("stages") or {}).items():
+            stage_times[stage].append(float(entry.get("seconds") or 0.0))
+        for key, value in (metrics.get("gemini") or {}).items():
+            gemini[key] += int(value or 0)
+        cache_metrics = metrics.get("cache") or {}
+        for key in ("hits", "misses"):
+            cache[key] += int(cache_metrics.get(key) or 0)
+        for label, counts in (cache_metrics.get("by_label") or {}).items():
+            for key in ("hits", "misses"):
+                cache_by_label[label][key] += int(counts.get(key) or 0)
+
+    total_stage_seconds = sum(sum(values) for values in stage_times.values())
+    stages = {
+        stage: {
+            "jobs": len(values),
+            **_distribution(values),
+            "share": round(sum(values) / total_stage_seconds, 3) if total_stage_seconds else 0.0,
+        }
+        for stage, values in sorted(stage_times.items(), key=lambda item: -sum(item[1]))
+    }
+    return {
+        "jobs": jobs,
+        "by_type": dict(by_type),
+        "by_status": dict(by_status),
+        "queue_wait_seconds": _distribution(queue_wait),
+        "run_seconds": _distribution(run_time),
+        "stages": stages,
+        "gemini": {
+            "calls": gemini["calls"],
+            "prompt_tokens": gemini["prompt_tokens"],
+            "response_tokens": gemini["response_tokens"],
+            "retries": gemini["retries"],
+        },
+        "cache": {
+            **_cache_counts(cache),
+            "by_label": {
+                label: _cache_counts(counts) for label, counts in sorted(cache_by_label.items())
+            },
+        },
+    }
+
+
+def job_metrics_summary(
+    session: Session,
+    *,
+    hours: float,
+    job_type: GenerationJobType | None = None,
+) -> dict[str, Any]:
+    """Сводка метрик задач, завершённых за последние hours часов."""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    query = session.query(
+        GenerationJob.job_type, GenerationJob.status, GenerationJob.metrics
+    ).filter(
+        GenerationJob.finished_at >= since
+    )
+    if job_type is not None:
+        query = query.filter(GenerationJob.job_type == job_type)
+    rows = query.order_by(GenerationJob.finished_at.desc()).limit(MAX_SUMMARY_JOBS).all()
+    return {"hours": hours, **summarize_job_metrics(rows)}
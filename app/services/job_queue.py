@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import defaultdict
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.audio import AudioSource
+from app.models.enums import GenerationJobStatus, GenerationJobType
+from app.models.generation import GenerationJob
+from app.services.job_events import notify_job_event
+
+# Классы приоритета: меньше — раньше
+PRIORITY_QUICK = 0
+PRIORITY_AUDIO = 1
+PRIORITY_LONG_AUDIO = 2
+
+# Грубая оценка длительности по размеру, пока ffprobe не измерил запись (~128 кбит/с)
+AUDIO_SECONDS_PER_MB = 60.0
+
+
+def estimate_job_cost(audio_source: AudioSource | None) -> tuple[int, float]:
+    """Класс приоритета и оценка стоимости задачи в секундах распознаваемой речи.
+
+    Текст, тесты и записи с готовой расшифровкой — быстрые задачи со стоимостью 0.
+    """
+    if audio_source is None or audio_source.transcription:
+        return PRIORITY_QUICK, 0.0
+    seconds = audio_source.speech_seconds
+    if seconds is None:
+        seconds = float(audio_source.file_size or 0) * AUDIO_SECONDS_PER_MB
+    priority = PRIORITY_LONG_AUDIO if seconds >= settings.job_long_audio_seconds else PRIORITY_AUDIO
+    return priority, seconds
+
+
+@dataclass(frozen=True)
+class _Candidate:
+    id: int
+    user_id: int
+    priority: int
+    estimated_cost: float
+    created_at: datetime
+
+    @property
+    def base_score(self) -> float:
+        created_at = self.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=UTC)
+        return (
+            created_at.timestamp()
+            + (self.priority or 0) * settings.job_priority_step_seconds
+            + (self.estimated_cost or 0.0) * settings.job_cost_weight
+        )
+
+
+def rank_candidates(
+    candidates: Iterable[_Candidate],
+    running_by_user: dict[int, int],
+) -> list[_Candidate]:
+    """Порядок, в котором воркеры будут забирать задачи.
+
+    Оценка задачи — момент постановки плюс штрафы в секундах: за класс
+    приоритета, за стоимость и за каждую задачу того же пользователя, которая
+    уже выполняется или стоит в очереди раньше (fair share). Штрафы не растут
+    со временем, а время ожидания уменьшает оценку относительно новых задач,
+    поэтому длинная лекция, прождавшая дольше своего штрафа, обгоняет свежие
+    быстрые задачи — голодания нет.
+    """
+    by_user: dict[int, list[_Candidate]] = defaultdict(list)
+    for candidate in candidates:
+        by_user[candidate.user_id].append(candidate)
+
+    scored: list[tuple[float, int, _Candidate]] = []
+    for user_id, jobs in by_user.items():
+        jobs.sort(key=lambda job: (job.base_score, job.id))
+        running = running_by_user.get(user_id, 0)
+        for ahead, job in enumerate(jobs):
+            penalty = (running + ahead) * settings.job_fair_share_seconds
+            scored.append((job.base_score + penalty, job.id, job))
+    scored.sort(key=lambda item: (item[0], item[1]))
+    return [job for _, _, job in scored]
+
+
+class JobQueue:
+    """Очередь задач генерации поверх таблицы GenerationJob.
+
+    Воркеры забирают PENDING-задачи через ``FOR UPDATE SKIP LOCKED``, поэтому
+    несколько процессов (и узлов) могут безопасно читать одну и ту же таблицу.
+    Порядок выдачи определяет rank_candidates: приоритет, fair share и старение.
+    Взятая задача арендуется до lease_expires_at, аренду продлевает монитор
+    воркера; задачи упавших воркеров возвращает в очередь reap_expired.
+    """
+
+    def __init__(self, session_factory: sessionmaker[Session]) -> None:
+        self.session_factory = session_factory
+
+    def claim_next(self, worker_id: str) -> tuple[int, GenerationJobType] | None:
+        session = self.session_factory()
+        try:
+            for candidate in self._ranked(session)[: settings.job_scheduler_claim_attempts]:
+                # Кандидата мог уже забрать другой воркер — тогда пробуем следующего
+                job = (
+                    session.query(GenerationJob)
+                    .filter(
+                        GenerationJob.id == candidate.id,
+                        GenerationJob.status == GenerationJobStatus.PENDING,
+                    )
+                    .with_for_update(skip_locked=True)
+                    .one_or_none()
+                )
+                if job is None:
+                    continue
+
+                claimed = (job.id, job.job_type)
+                now = datetime.utcnow()
+                job.status = GenerationJobStatus.RUNNING
+                job.started_at = now
+                job.worker_id = worker_id
+                job.attempts = (job.attempts or 0) + 1
+                job.heartbeat_at = now
+                job.lease_expires_at = now + timedelta(seconds=settings.job_lease_seconds)
+                notify_job_event(session, job.id, "status", status=job.status.value)
+                session.commit()
+                return claimed
+            session.rollback()
+            return None
+        finally:
+            session.close()
+
+    @contextmanager
+    def monitor(self, job_id: int, worker_id: str) -> Iterator[threading.Event]:
+        """Фоновый поток на время выполнения задачи: продлевает аренду и следит за отменой.
+
+        Событие взводится, когда пользователь отменил задачу или аренду забрал
+        reaper — в обоих случаях продолжать работу бессмысленно.
+        """
+        cancelled = threading.Event()
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._watch,
+            args=(job_id, worker_id, cancelled, stop),
+            name=f"job-monitor-{job_id}",
+            daemon=True,
+        )
+        thread.start()
+        try:
+            yield cancelled
+        finally:
+            stop.set()
+            thread.join(timeout=settings.job_monitor_interval_seconds)
+
+    def _watch(
+        self, job_id: int, worker_id: str, cancelled: threading.Event, stop: threading.Event
+    ) -> None:
+        last_heartbeat = datetime.utcnow()
+        while not stop.wait(settings.job_monitor_interval_seconds):
+            now = datetime.utcnow()
+            session = self.session_factory()
+            try:
+                renewed = True
+                if (now - last_heartbeat).total_seconds() >= settings.job_heartbeat_seconds:
+                    renewed = self._renew_lease(session, job_id, worker_id, now)
+                    last_heartbeat = now
+                requested = (
+                    session.query(GenerationJob.cancel_requested_at)
+                    .filter(GenerationJob.id == job_id)
+                    .scalar()
+                )
+            except Exception as exc:  # noqa: BLE001
+                session.rollback()
+                # Аренда с запасом переживёт несколько пропущенных продлений
+                logging.warning("Failed to update lease of job %s: %s", job_id, exc)
+                continue
+            finally:
+                session.close()
+            if not renewed:
+                logging.warning(
+                    "Job %s lease was taken over, abandoning it on %s",
+                    job_id,
+                    worker_id,
+                )
+                cancelled.set()
+                return
+            if requested is not None:
+                logging.info("Job %s was cancelled, stopping at the next checkpoint", job_id)
+                cancelled.set()
+                return
+
+    @staticmethod
+    def _renew_lease(session: Session, job_id: int, worker_id: str, now: datetime) -> bool:
+        result = session.execute(
+            update(GenerationJob)
+            .where(
+                GenerationJob.id == job_id,
+                GenerationJob.worker_id == worker_id,
+                GenerationJob.status == GenerationJobStatus.RUNNING,
+            )
+            .values(
+                heartbeat_at=now,
+                lease_expires_at=now + timedelta(seconds=settings.job_lease_seconds),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return result.rowcount > 0
+
+    def reap_expired(self) -> list[int]:
+        """Возвращает в очередь задачи, чья аренда истекла: их воркер упал или завис.
+
+        Задачи, исчерпавшие job_max_attempts или отменённые пользователем,
+        в очередь не возвращаются — их id отдаются вызывающему, чтобы он
+        завершил их вместе с конспектом или тестом.
+        """
+        session = self.session_factory()
+        try:
+            expired = (
+                session.query(GenerationJob)
+                .filter(
+                    GenerationJob.status == GenerationJobStatus.RUNNING,
+                    GenerationJob.lease_expires_at < datetime.utcnow(),
+                )
+                .order_by(GenerationJob.lease_expires_at)
+                .with_for_update(skip_locked=True)
+                .limit(settings.job_reaper_batch_size)
+                .all()
+            )
+            abandoned: list[int] = []
+            for job in expired:
+                exhausted = (job.attempts or 0) >= settings.job_max_attempts
+                if job.cancel_requested_at is not None or exhausted:
+                    abandoned.append(job.id)
+                    continue
+                logging.warning(
+                    "Job %s lost its worker %s, requeueing (attempt %s of %s)",
+                    job.id,
+                    job.worker_id,
+                    job.attempts,
+                    settings.job_max_attempts,
+                )
+                job.status = GenerationJobStatus.PENDING
+                job.worker_id = None
+                job.started_at = None
+                job.heartbeat_at = None
+                job.lease_expires_at = None
+                notify_job_event(session, job.id, "status", status=job.status.value)
+            session.commit()
+            return abandoned
+        finally:
+            session.close()
+
+    def queue_positions(self, session: Session, job_ids: Sequence[int]) -> dict[int, int]:
+        """Позиции (с 1) ожидающих задач в текущем порядке выдачи."""
+        wanted = set(job_ids)
+        if not wanted:
+            return {}
+        return {
+            candidate.id: position
+            for position, candidate in enumerate(self._ranked(session), start=1)
+            if candidate.id in wanted
+        }
+
+    @staticmethod
+    def _ranked(session: Session) -> list[_Candidate]:
+        # Окно самых старых задач: всё, что за ним, и так новее и ждёт своей очереди
+        rows = (
+            session.query(
+                GenerationJob.id,
+                GenerationJob.user_id,
+                GenerationJob.priority,
+                GenerationJob.estimated_cost,
+                GenerationJob.created_at,
+            )
+            .filter(GenerationJob.status == GenerationJobStatus.PENDING)
+            .order_by(GenerationJob.created_at, GenerationJob.id)
+            .limit(settings.job_scheduler_scan_limit)
+            .all()
+        )
+        if not rows:
+            return []
+        running_by_user = dict(
+            session.query(GenerationJob.user_id, func.count(GenerationJob.id))
+            .filter(GenerationJob.status == GenerationJobStatus.RUNNING)
+            .group_by(GenerationJob.user_id)
+            .all()
+        )
+        return rank_candidates((_Candidate(*row) for row in rows), running_by_user)
+
+
+job_queue = JobQueue(SessionLocal)
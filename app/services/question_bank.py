@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.question_bank import BankQuestion
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+_NORMALIZE_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def summary_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def question_fingerprint(text: str) -> str:
+    """Отпечаток без учёта регистра и пунктуации: перефразированные знаками дубли отсекаются."""
+    normalized = " ".join(_NORMALIZE_RE.sub(" ", text.lower()).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _valid_answers(raw: Any) -> list[dict[str, Any]] | None:
+    if not isinstance(raw, list):
+        return None
+    answers = [
+        {"text": str(item.get("text", "")).strip(), "is_correct": bool(item.get("is_correct"))}
+        for item in raw
+        if isinstance(item, dict) and str(item.get("text", "")).strip()
+    ]
+    if len(answers) < 2 or sum(answer["is_correct"] for answer in answers) != 1:
+        return None
+    return answers
+
+
+class QuestionBank:
+    """Банк вопросов конспекта.
+
+    Генерируется крупной партией и пополняется, когда вопросов не хватает.
+    """
+
+    def __init__(self, rng: random.Random | None = None) -> None:
+        self.rng = rng or random.Random()  # noqa: S311
+
+    def available(
+        self, session: Session, *, conspect_id: int, source_hash: str
+    ) -> list[BankQuestion]:
+        return (
+            session.query(BankQuestion)
+            .filter(
+                BankQuestion.conspect_id == conspect_id,
+                BankQuestion.summary_hash == source_hash,
+            )
+            .all()
+        )
+
+    def store(
+        self,
+        session: Session,
+        *,
+        conspect_id: int,
+        source_hash: str,
+        questions_payload: Sequence[Any],
+        existing: Sequence[BankQuestion] = (),
+    ) -> list[BankQuestion]:
+        """Добавляет новые вопросы, пропуская битые и дубли; возвращает добавленные."""
+        seen = {question.fingerprint for question in existing}
+        added: list[BankQuestion] = []
+        for item in questions_payload:
+            if not isinstance(item, dict):
+                continue
+            text = str(item.get("question") or "").strip()
+            answers = _valid_answers(item.get("answers"))
+            if not text or answers is None:
+                continue
+            fingerprint = question_fingerprint(text)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            difficulty = str(item.get("difficulty") or "").lower()
+            question = BankQuestion(
+                conspect_id=conspect_id,
+                summary_hash=source_hash,
+                fingerprint=fingerprint,
+                question=text,
+                answers=answers,
+                explanation=item.get("explanation"),
+                difficulty=difficulty if difficulty in DIFFICULTIES else "medium",
+                times_used=0,
+            )
+            try:
+                with session.begin_nested():
+                    session.add(question)
+            except IntegrityError:
+                # Тот же вопрос параллельно добавил другой воркер
+                continue
+            added.append(question)
+        return added
+
+    def sample(self, questions: Sequence[BankQuestion], count: int) -> list[dict[str, Any]]:
+        """Выбирает count вопросов: поровну по сложности, в первую очередь реже использованные.
+
+        Варианты ответа перемешиваются, чтобы верный не стоял всегда на одном месте.
+        """
+        groups: dict[str, list[BankQuestion]] = defaultdict(list)
+        for question in questions:
+            groups[question.difficulty].append(question)
+        for group in groups.values():
+            self.rng.shuffle(group)
+            group.sort(key=lambda item: item.times_used or 0)
+
+        picked: list[BankQuestion] = []
+        order = [difficulty for difficulty in DIFFICULTIES if groups.get(difficulty)]
+        order += [difficulty for difficulty in groups if difficulty not in DIFFICULTIES]
+        while len(picked) < count and any(groups[difficulty] for difficulty in order):
+            for difficulty in order:
+                if groups[difficulty] and len(picked) < count:
+                    picked.append(groups[difficulty].pop(0))
+
+        payload: list[dict[str, Any]] = []
+        for question in picked:
+            question.times_used = (question.times_used or 0) + 1
+            answers = [dict(answer) for answer in question.answers]
+            self.rng.shuffle(answers)
+            payload.append(
+                {
+                    "question": question.question,
+                    "answers": answers,
+                    "explanation": question.explanation,
+                    "difficulty": question.difficulty,
+                }
+            )
+        return payload
+
+
+question_bank = QuestionBank()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.quiz import QuizAnswer, QuizQuestion
+
+
+@dataclass(frozen=True)
+class AnswerDraft:
+    text: str
+    is_correct: bool
+
+
+@dataclass(frozen=True)
+class QuestionDraft:
+    title: str
+    explanation: str | None = None
+    answers: Sequence[AnswerDraft] = field(default_factory=tuple)
+
+    @classmethod
+    def from_ai_payload(cls, item: dict[str, Any], position: int) -> QuestionDraft:
+        return cls(
+            title=item.get("question", f"Вопрос {position + 1}"),
+            explanation=item.get("explanation"),
+            answers=tuple(
+                AnswerDraft(text=answer.get("text", ""), is_correct=bool(answer.get("is_correct")))
+                for answer in item.get("answers") or []
+            ),
+        )
+
+
+def delete_quiz_questions(session: Session, quiz_id: int) -> None:
+    """Удаляет вопросы теста и их ответы двумя запросами вместо загрузки и удаления по одному."""
+    question_ids = select(QuizQuestion.id).where(QuizQuestion.quiz_id == quiz_id)
+    session.execute(
+        delete(QuizAnswer).where(QuizAnswer.question_id.in_(question_ids)),
+        execution_options={"synchronize_session": False},
+    )
+    session.execute(
+        delete(QuizQuestion).where(QuizQuestion.quiz_id == quiz_id),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def insert_quiz_questions(
+    session: Session,
+    *,
+    quiz_id: int,
+    user_id: int,
+    questions: Sequence[QuestionDraft],
+) -> list[int]:
+    """Вставляет вопросы одним INSERT ... RETURNING id, затем все ответы одним executemany.
+
+    Возвращает id вопросов в порядке questions.
+    """
+    if not questions:
+        return []
+    question_ids = list(
+        session.scalars(
+            insert(QuizQuestion).returning(QuizQuestion.id, sort_by_parameter_order=True),
+            [
+                {
+                    "quiz_id": quiz_id,
+                    "user_id": user_id,
+                    "title": question.title,
+                    "explanation": question.explanation,
+                    "position": position,
+                }
+                for position, question in enumerate(questions)
+            ],
+        )
+    )
+    answer_rows = [
+        {
+            "question_id": question_id,
+            "user_id": user_id,
+            "text": answer.text,
+            "is_correct": answer.is_correct,
+            "position": answer_position,
+        }
+        for question_id, question in zip(question_ids, questions, strict=True)
+        for answer_position, answer in enumerate(question.answers)
+    ]
+    if answer_rows:
+        session.execute(insert(QuizAnswer), answer_rows)
+    return question_ids
+
+
+def replace_quiz_questions(
+    session: Session,
+    *,
+    quiz_id: int,
+    user_id: int,
+    questions: Sequence[QuestionDraft],
+) -> list[int]:
+    delete_quiz_questions(session, quiz_id)
+    return insert_quiz_questions(session, quiz_id=quiz_id, user_id=user_id, questions=questions)
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import re
 from pathlib import Path
@@ -19,19 +20,21 @@ class AudioStorageService:
         path.mkdir(parents=True, exist_ok=True)
         return path
 
-    def save_upload(self, user_id: int, upload: UploadFile) -> tuple[Path, int]:
+    def save_upload(self, user_id: int, upload: UploadFile) -> tuple[Path, int, str]:
         user_dir = self._user_dir(user_id)
         path = user_dir / self._safe_filename(upload.filename or "audio")
         total_size = 0
+        digest = hashlib.sha256()
 
         with path.open("wb") as out_file:
             while chunk := upload.file.read(1024 * 1024):
                 total_size += len(chunk)
+                digest.update(chunk)
                 out_file.write(chunk)
 
         upload.file.seek(0)
 
-        return path, total_size
+        return path, total_size, digest.hexdigest()
 
     def save_bytes(self, user_id: int, filename: str, data: bytes) -> Path:
         user_dir = self._user_dir(user_id)
@@ -39,6 +42,13 @@ class AudioStorageService:
         path.write_bytes(data)
         return path
 
+    def hash_file(self, path: Path) -> str:
+        digest = hashlib.sha256()
+        with path.open("rb") as in_file:
+            while chunk := in_file.read(1024 * 1024):
+                digest.update(chunk)
+        return digest.hexdigest()
+
     def resolve_path(self, file_path: str | os.PathLike[str]) -> Path:
         candidate = Path(file_path)
         if not candidate.is_absolute():
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.cache import TranscriptCacheEntry
+
+
+class TranscriptCache:
+    """Транскрипции, общие для всех пользователей, по ключу (sha256, модель, версия промпта).
+
+    Счётчик ``hits`` на строке — число сэкономленных вызовов transcribe_audio.
+    Промаха строки нет, поэтому промахи считаются в метриках задач:
+    /health/jobs, cache.by_label.transcript.
+    """
+
+    def lookup(
+        self,
+        session: Session,
+        *,
+        content_hash: str,
+        model_name: str,
+        prompt_version: str,
+    ) -> TranscriptCacheEntry | None:
+        entry = (
+            session.query(TranscriptCacheEntry)
+            .filter(
+                TranscriptCacheEntry.content_hash == content_hash,
+                TranscriptCacheEntry.model_name == model_name,
+                TranscriptCacheEntry.prompt_version == prompt_version,
+            )
+            .one_or_none()
+        )
+        if entry is None:
+            logging.info("Transcript cache miss for %s", content_hash[:12])
+            return None
+
+        session.query(TranscriptCacheEntry).filter(TranscriptCacheEntry.id == entry.id).update(
+            {
+                TranscriptCacheEntry.hits: TranscriptCacheEntry.hits + 1,
+                TranscriptCacheEntry.last_hit_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+        logging.info("Transcript cache hit for %s", content_hash[:12])
+        return entry
+
+    def store(
+        self,
+        session: Session,
+        *,
+        content_hash: str,
+        model_name: str,
+        prompt_version: str,
+        transcript: str,
+        payload: dict[str, Any] | None,
+    ) -> None:
+        try:
+            with session.begin_nested():
+                session.add(
+                    TranscriptCacheEntry(
+                        content_hash=content_hash,
+                        model_name=model_name,
+                        prompt_version=prompt_version,
+                        transcript=transcript,
+                        payload=payload,
+                        hits=0,
+                    )
+                )
+        except IntegrityError:
+            # Тот же файл параллельно распознал другой воркер — его запись уже в кэше
+            pass
+
+    def stats(self, session: Session) -> dict[str, int]:
+        entries, hits = session.query(
+            func.count(TranscriptCacheEntry.id),
+            func.coalesce(func.sum(TranscriptCacheEntry.hits), 0),
+        ).one()
+        return {"entries": int(entries), "hits": int(hits)}
+
+
+transcript_cache = TranscriptCache()
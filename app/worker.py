@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+
+from app.core.config import settings
+from app.services.ai.resilience import JobCancelled
+from app.services.generation import GenerationService, generation_service
+from app.services.job_queue import JobQueue, job_queue
+
+
+class GenerationWorker:
+    """Отдельный процесс, который разбирает очередь GenerationJob.
+
+    Запуск: ``python -m app.worker [--concurrency N]``. Процессов можно поднять
+    сколько угодно и на разных узлах — задачи распределяются через БД.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        service: GenerationService,
+        *,
+        concurrency: int,
+        poll_interval: float,
+    ) -> None:
+        self.queue = queue
+        self.service = service
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        threads = [
+            threading.Thread(target=self._loop, args=(slot,), name=f"generation-worker-{slot}")
+            for slot in range(self.concurrency)
+        ]
+        threads.append(threading.Thread(target=self._reap_loop, name="generation-reaper"))
+        for thread in threads:
+            thread.start()
+        logging.info("Worker %s started with concurrency=%s", self.worker_id, self.concurrency)
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1.0)
+        finally:
+            self.stop()
+        logging.info("Worker %s stopped", self.worker_id)
+
+    def stop(self, *_: object) -> None:
+        self._stop.set()
+
+    def _loop(self, slot: int) -> None:
+        worker_id = f"{self.worker_id}/{slot}"
+        while not self._stop.is_set():
+            try:
+                claimed = self.queue.claim_next(worker_id)
+            except Exception as exc:  # noqa: BLE001
+                logging.exception("Failed to claim generation job: %s", exc)
+                self._stop.wait(self.poll_interval)
+                continue
+
+            if claimed is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            job_id, job_type = claimed
+            try:
+                with self.queue.monitor(job_id, worker_id) as cancelled:
+                    self.service.process_job(job_id, job_type, cancelled, worker_id)
+            except JobCancelled:
+                # Слот сразу возвращается в цикл и забирает следующую задачу
+                logging.info("Generation job %s cancelled", job_id)
+            except Exception as exc:  # noqa: BLE001
+                # process_*_job уже отметил задачу как FAILED
+                logging.warning("Generation job %s failed: %s", job_id, exc)
+
+    def _reap_loop(self) -> None:
+        """Возвращает в очередь задачи упавших воркеров, в том числе с других узлов."""
+        while not self._stop.wait(settings.job_reaper_interval_seconds):
+            try:
+                for job_id in self.queue.reap_expired():
+                    self.service.abandon_job(job_id)
+            except Exception as exc:  # noqa: BLE001
+                logging.exception("Failed to reap expired generation jobs: %s", exc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Conspectium generation worker")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.worker_concurrency,
+        help="Количество задач, обрабатываемых одновременно",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s [%(threadName)s] %(message)s",
+    )
+    worker = GenerationWorker(
+        job_queue,
+        generation_service,
+        concurrency=args.concurrency,
+        poll_interval=settings.worker_poll_interval_seconds,
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
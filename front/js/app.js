@@ -516,16 +516,88 @@ if (typeof window.copyToClipboard === 'undefined') {
         }
     }
 
+    // Ждёт финального статуса задачи по SSE-потоку /jobs/{id}/events.
+    // Возвращает задачу или null, если поток недоступен — тогда работает обычный опрос.
+    async function waitJobViaEvents(jobId, { timeoutMs = null } = {}) {
+        if (typeof ReadableStream === 'undefined' || typeof TextDecoder === 'undefined') {
+            return null;
+        }
+        await ensureAuth();
+        const controller = new AbortController();
+        const timer = timeoutMs ? setTimeout(() => controller.abort(), timeoutMs) : null;
+        try {
+            const response = await fetch(`${API_BASE}/jobs/${jobId}/events`, {
+                headers: {
+                    Authorization: `Bearer ${state.token}`,
+                    Accept: 'text/event-stream',
+                },
+                signal: controller.signal,
+            });
+            if (!response.ok || !response.body) {
+                return null;
+            }
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    return null;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                let boundary = buffer.indexOf('\n\n');
+                while (boundary !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    boundary = buffer.indexOf('\n\n');
+
+                    let eventName = 'message';
+                    const dataLines = [];
+                    rawEvent.split('\n').forEach((line) => {
+                        if (line.startsWith('event:')) {
+                            eventName = line.slice(6).trim();
+                        } else if (line.startsWith('data:')) {
+                            dataLines.push(line.slice(5).trim());
+                        }
+                    });
+                    if (eventName !== 'status' || !dataLines.length) {
+                        continue;
+                    }
+                    const job = JSON.parse(dataLines.join('\n'));
+                    if (job.status === 'completed' || job.status === 'failed' || job.status === 'cancelled') {
+                        controller.abort();
+                        return job;
+                    }
+                }
+            }
+        } catch (err) {
+            return null;
+        } finally {
+            if (timer) {
+                clearTimeout(timer);
+            }
+        }
+    }
+
     async function pollJob(jobId, { intervalMs = 2000, timeoutMs = 600000 } = {}) {
         const started = Date.now();
         const noTimeout = timeoutMs === null || timeoutMs === undefined;
         let lastStatus = null;
         let consecutiveErrors = 0;
         const maxConsecutiveErrors = 5;
+
+        // Сначала ждём по SSE; итог (и проверку конспекта) подтверждает первый же запрос опроса ниже
+        await waitJobViaEvents(jobId, { timeoutMs: noTimeout ? null : timeoutMs });
         
         while (noTimeout || Date.now() - started < timeoutMs) {
             try {
-                const data = await authFetch(`/jobs/${jobId}`);
+                // Long-poll: сервер держит запрос, пока статус не отличится от последнего увиденного (до 25 с)
+                const seen = lastStatus ? `&seen=${jobId}:${lastStatus}` : '';
+                const batch = await authFetch(`/jobs?ids=${jobId}&wait=25${seen}`);
+                const data = batch && Array.isArray(batch.items) ? batch.items[0] : null;
+                if (!data) {
+                    throw new Error('Задача не найдена');
+                }
                 consecutiveErrors = 0; // Сбрасываем счетчик ошибок при успешном запросе
                 
                 // Проверяем статус задачи
@@ -552,6 +624,10 @@ if (typeof window.copyToClipboard === 'undefined') {
                     throw new Error(data.error || 'Задача завершилась с ошибкой');
                 }
                 
+                if (data.status === 'cancelled') {
+                    throw new Error('Задача отменена');
+                }
+                
                 // Если статус не изменился, продолжаем опрос
                 if (data.status === lastStatus) {
                     // Ничего не делаем, просто продолжаем
@@ -0,0 +1,169 @@
+"""Сравнение сохранения вопросов теста: по одному с flush и пакетной вставкой.
+
+Считает SQL-запросы (round trip'ы) и время для тестов из 5, 30 и 100 вопросов.
+
+    python scripts/benchmark_quiz_persistence.py
+    python scripts/benchmark_quiz_persistence.py --database-url $DATABASE_URL --simulated-rtt-ms 1
+
+По умолчанию — SQLite в памяти, где запрос почти бесплатен; --simulated-rtt-ms
+добавляет задержку сети к каждому запросу, чтобы оценить выигрыш на реальной БД.
+SQLite не умеет пакетный INSERT ... RETURNING с сохранением порядка, и SQLAlchemy
+вставляет вопросы построчно; на Postgres это один запрос на страницу до 1000 строк.
+Против Postgres скрипт создаёт временного пользователя и удаляет его в конце.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.dialects.postgresql import JSONB  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from app.models.base import Base  # noqa: E402
+from app.models.quiz import Quiz, QuizAnswer, QuizQuestion  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.quiz_persistence import (  # noqa: E402
+    AnswerDraft,
+    QuestionDraft,
+    replace_quiz_questions,
+)
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+def _drafts(count: int) -> list[QuestionDraft]:
+    return [
+        QuestionDraft(
+            title=f"Вопрос {index + 1}",
+            explanation="Пояснение",
+            answers=[
+                AnswerDraft(text=f"Ответ {answer}", is_correct=answer == 0) for answer in range(4)
+            ],
+        )
+        for index in range(count)
+    ]
+
+
+def _legacy(session: Session, quiz: Quiz, drafts: list[QuestionDraft]) -> None:
+    """Прежний путь: загрузка и удаление старых вопросов, flush после каждого нового."""
+    for question in list(quiz.questions):
+        session.delete(question)
+    session.flush()
+    for position, draft in enumerate(drafts):
+        question = QuizQuestion(
+            quiz_id=quiz.id,
+            user_id=quiz.user_id,
+            title=draft.title,
+            explanation=draft.explanation,
+            position=position,
+        )
+        session.add(question)
+        session.flush()
+        for answer_position, answer in enumerate(draft.answers):
+            session.add(
+                QuizAnswer(
+                    question_id=question.id,
+                    user_id=quiz.user_id,
+                    text=answer.text,
+                    is_correct=answer.is_correct,
+                    position=answer_position,
+                )
+            )
+    session.flush()
+
+
+def _bulk(session: Session, quiz: Quiz, drafts: list[QuestionDraft]) -> None:
+    replace_quiz_questions(session, quiz_id=quiz.id, user_id=quiz.user_id, questions=drafts)
+    session.expire(quiz, ["questions"])
+
+
+def _measure(
+    factory: sessionmaker,
+    user_id: int,
+    persist: Callable[[Session, Quiz, list[QuestionDraft]], None],
+    count: int,
+    counter: list[int],
+) -> tuple[int, float]:
+    with factory() as session:
+        quiz = Quiz(user_id=user_id, title="benchmark")
+        session.add(quiz)
+        session.flush()
+        # Второй прогон заменяет вопросы — так измеряется и удаление старых
+        persist(session, quiz, _drafts(count))
+        session.commit()
+        counter[0] = 0
+        started = time.perf_counter()
+        persist(session, quiz, _drafts(count))
+        session.commit()
+        elapsed = time.perf_counter() - started
+        statements = counter[0]
+        session.delete(quiz)
+        session.commit()
+    return statements, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--database-url", default="sqlite:///:memory:")
+    parser.add_argument("--simulated-rtt-ms", type=float, default=0.0)
+    parser.add_argument("--sizes", default="5,30,100")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url, future=True)
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+    counter = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        counter[0] += 1
+        if args.simulated_rtt_ms:
+            time.sleep(args.simulated_rtt_ms / 1000)
+
+    factory = sessionmaker(bind=engine, autoflush=False)
+    with factory() as session:
+        suffix = uuid4().hex[:12]
+        user = User(
+            email=f"benchmark-{suffix}@example.invalid",
+            nickname=f"bench_{suffix}",
+            password_hash="!",  # noqa: S106
+            display_name="benchmark",
+        )
+        session.add(user)
+        session.commit()
+        user_id = user.id
+
+    print(
+        f"{'questions':>9} | {'legacy queries':>14} | {'legacy ms':>9} | "
+        f"{'bulk queries':>12} | {'bulk ms':>8}"
+    )
+    try:
+        for count in (int(size) for size in args.sizes.split(",")):
+            legacy_queries, legacy_time = _measure(factory, user_id, _legacy, count, counter)
+            bulk_queries, bulk_time = _measure(factory, user_id, _bulk, count, counter)
+            print(
+                f"{count:>9} | {legacy_queries:>14} | {legacy_time * 1000:>9.1f} | "
+                f"{bulk_queries:>12} | {bulk_time * 1000:>8.1f}"
+            )
+    finally:
+        with factory() as session:
+            session.query(User).filter(User.id == user_id).delete()
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.base import Base
+from app.models.enums import GenerationJobStatus, GenerationJobType
+from app.models.generation import GenerationJob
+from app.models.rate_limit import UserJobQuota
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+@pytest.fixture()
+def session(monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_active_jobs", 2)
+    monkeypatch.setattr(settings, "admission_token_budget", 1000)
+    monkeypatch.setattr(settings, "admission_token_window_seconds", 3600)
+    monkeypatch.setattr(settings, "admission_job_base_seconds", 60.0)
+    monkeypatch.setattr(settings, "admission_seconds_per_audio_second", 0.2)
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, autoflush=False)() as db:
+        yield db
+
+
+def test_admit_counts_active_jobs_and_release_frees_slot(session) -> None:
+    controller = AdmissionController()
+    controller.admit(session, 1, tokens=100)
+    controller.admit(session, 1, tokens=100)
+    session.add(
+        GenerationJob(
+            user_id=1,
+            job_type=GenerationJobType.CONSPECT,
+            status=GenerationJobStatus.RUNNING,
+            estimated_cost=600.0,
+            started_at=datetime.utcnow() - timedelta(seconds=30),
+        )
+    )
+    session.commit()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit(session, 1, tokens=100)
+    # 60 с базы + 600 с аудио × 0.2 − 30 с уже в работе
+    assert rejected.value.retry_after == 150
+
+    controller.release(session, 1)
+    session.commit()
+    controller.admit(session, 1, tokens=100)
+    assert session.get(UserJobQuota, 1).active_jobs == 2
+
+
+def test_token_budget_rejects_until_window_decays(session) -> None:
+    controller = AdmissionController()
+    session.add(
+        UserJobQuota(
+            user_id=1,
+            active_jobs=0,
+            window_started_at=datetime.utcnow() - timedelta(seconds=1800),
+            window_tokens=100,
+            previous_window_tokens=1000,
+        )
+    )
+    session.commit()
+
+    # 1000 × 0.5 + 100 = 600 уже израсходовано
+    controller.admit(session, 1, tokens=300)
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit(session, 1, tokens=300)
+    # Вес прошлого окна должен упасть до 300 токенов: ещё 0.2 окна
+    assert rejected.value.retry_after == pytest.approx(720, abs=2)
+
+
+def test_release_never_goes_negative(session) -> None:
+    controller = AdmissionController()
+    controller.admit(session, 1, tokens=10)
+    session.commit()
+    controller.release(session, 1)
+    controller.release(session, 1)
+    session.commit()
+    session.expire_all()
+    assert session.get(UserJobQuota, 1).active_jobs == 0
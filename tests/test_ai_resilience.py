@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+
+from app.services.ai.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    JobCancelled,
+    JobDeadlineExceeded,
+    RetryPolicy,
+    call_with_retry,
+    job_cancellation,
+    job_deadline,
+)
+from app.services.ai.telemetry import track_calls
+
+_POLICY = RetryPolicy(attempts=3, base_delay_seconds=0, max_delay_seconds=0)
+
+
+def _flaky(failures: int, exc: Exception = ConnectionError("reset")):
+    calls = []
+
+    def operation() -> str:
+        calls.append(1)
+        if len(calls) <= failures:
+            raise exc
+        return "ok"
+
+    return operation, calls
+
+
+def test_transient_failure_is_retried_and_counted() -> None:
+    operation, calls = _flaky(2)
+
+    with track_calls() as stats:
+        assert call_with_retry(operation, policy=_POLICY) == "ok"
+
+    assert len(calls) == 3
+    assert stats.retries == 2
+
+
+def test_non_retryable_error_is_raised_immediately() -> None:
+    operation, calls = _flaky(1, ValueError("bad prompt"))
+
+    with pytest.raises(ValueError):
+        call_with_retry(operation, policy=_POLICY)
+    assert len(calls) == 1
+
+
+def test_attempts_are_bounded() -> None:
+    operation, calls = _flaky(10)
+
+    with pytest.raises(ConnectionError):
+        call_with_retry(operation, policy=_POLICY)
+    assert len(calls) == 3
+
+
+def test_breaker_opens_and_fails_fast() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    policy = RetryPolicy(attempts=1, base_delay_seconds=0, max_delay_seconds=0)
+    operation, calls = _flaky(10)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            call_with_retry(operation, policy=policy, breaker=breaker)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(operation, policy=policy, breaker=breaker)
+    assert len(calls) == 2
+
+
+def test_breaker_half_open_probe_closes_circuit() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record_failure(ConnectionError("down"))
+    assert breaker.state == "half_open"
+
+    assert call_with_retry(lambda: "ok", policy=_POLICY, breaker=breaker) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_expired_deadline_stops_retries() -> None:
+    operation, calls = _flaky(10)
+
+    with job_deadline(-1):
+        with pytest.raises(JobDeadlineExceeded):
+            call_with_retry(operation, policy=_POLICY)
+    assert calls == []
+
+
+def test_call_with_retry_stops_when_job_is_cancelled() -> None:
+    cancelled = threading.Event()
+    calls = []
+
+    def operation():
+        calls.append(1)
+        cancelled.set()
+        raise ConnectionError("reset")
+
+    with job_cancellation(cancelled):
+        with pytest.raises(JobCancelled):
+            call_with_retry(operation, policy=_POLICY)
+    assert len(calls) == 1
@@ -0,0 +1,140 @@
+import pytest
+
+from app.services.audio_processing import (
+    TimeMap,
+    detect_speech,
+    frame_energies_db,
+    merge_transcripts,
+    plan_segments,
+)
+
+
+def test_plan_segments_keeps_short_audio_whole() -> None:
+    segments = plan_segments(
+        120.0,
+        [],
+        target_seconds=300,
+        overlap_seconds=3,
+        search_window_seconds=30,
+    )
+
+    assert [(segment.start, segment.end) for segment in segments] == [(0.0, 120.0)]
+
+
+def test_plan_segments_cuts_at_nearest_silence_with_overlap() -> None:
+    silences = [(280.0, 282.0), (310.0, 311.0), (598.0, 600.0)]
+
+    segments = plan_segments(
+        700.0,
+        silences,
+        target_seconds=300,
+        overlap_seconds=3,
+        search_window_seconds=30,
+    )
+
+    assert [(segment.start, segment.end) for segment in segments] == [
+        (0.0, 313.5),
+        (307.5, 602.0),
+        (596.0, 700.0),
+    ]
+
+
+def test_plan_segments_falls_back_to_fixed_cuts_without_silence() -> None:
+    segments = plan_segments(
+        650.0,
+        [],
+        target_seconds=300,
+        overlap_seconds=2,
+        search_window_seconds=30,
+    )
+
+    assert [(segment.start, segment.end) for segment in segments] == [
+        (0.0, 302.0),
+        (298.0, 602.0),
+        (598.0, 650.0),
+    ]
+
+
+def test_merge_transcripts_removes_overlap_duplicates() -> None:
+    parts = [
+        "Сегодня говорим о клетке. Митохондрия — энергетическая станция клетки",
+        "энергетическая станция клетки, она синтезирует АТФ. Дальше про рибосомы.",
+        "",
+    ]
+
+    merged = merge_transcripts(parts)
+
+    assert merged == (
+        "Сегодня говорим о клетке. Митохондрия — энергетическая "
+        "станция клетки, она синтезирует АТФ. Дальше про рибосомы."
+    )
+
+
+def test_merge_transcripts_removes_approximate_overlap() -> None:
+    parts = [
+        "Сегодня говорим о клетке. Митохондрия — это энергетическая станция клетки, "
+        "она синтезирует АТФ",
+        "Энергетические станции клетки и она синтезирует АТФ. Дальше про рибосомы.",
+    ]
+
+    merged = merge_transcripts(parts)
+
+    assert merged == (
+        "Сегодня говорим о клетке. Митохондрия — это Энергетические станции клетки "
+        "и она синтезирует АТФ. Дальше про рибосомы."
+    )
+
+
+def test_merge_transcripts_joins_parts_without_common_words() -> None:
+    assert merge_transcripts(["Первая часть.", "Вторая часть."]) == "Первая часть. Вторая часть."
+
+
+def test_merge_transcripts_ignores_common_phrase_away_from_seam() -> None:
+    parts = [
+        "Как мы уже говорили, клетка делится. Потом идёт интерфаза и рост.",
+        "Новая тема — мейоз. Как мы уже говорили, хромосомы расходятся.",
+    ]
+
+    merged = merge_transcripts(parts)
+
+    assert merged == " ".join(parts)
+
+
+def test_time_map_maps_trimmed_time_back_to_original() -> None:
+    time_map = TimeMap(((0.0, 10.0), (25.0, 40.0), (100.0, 110.0)))
+
+    assert time_map.to_original(5.0) == 5.0
+    assert time_map.to_original(12.0) == 27.0
+    assert time_map.to_original(30.0) == 105.0
+    assert time_map.to_original(500.0) == 110.0
+    assert TimeMap.from_metadata(time_map.to_metadata()) == time_map
+    assert TimeMap.from_metadata(None) is None
+
+
+def test_detect_speech_cuts_only_long_silences() -> None:
+    np = pytest.importorskip("numpy")
+    frame = 0.1
+    # 3 с речи, 0.5 с паузы, 2 с речи, 5 с тишины, 1 с речи
+    pattern = [(-20.0, 30), (-70.0, 5), (-20.0, 20), (-70.0, 50), (-20.0, 10)]
+    energies = np.concatenate([np.full(count, level) for level, count in pattern])
+
+    intervals = detect_speech(
+        energies,
+        frame_seconds=frame,
+        min_silence_seconds=2.0,
+        padding_seconds=0.2,
+    )
+
+    assert intervals == [(0.0, 5.7), (10.3, 11.5)]
+
+
+def test_frame_energies_distinguish_silence_from_tone() -> None:
+    np = pytest.importorskip("numpy")
+    tone = (np.sin(np.linspace(0, 200 * np.pi, 2400)) * 16000).astype(np.int16)
+    samples = np.concatenate([np.zeros(2400, dtype=np.int16), tone])
+
+    energies = frame_energies_db(samples, 240)
+
+    assert energies.shape == (20,)
+    assert energies[:10].max() < -80
+    assert energies[10:].min() > -10
@@ -0,0 +1,90 @@
+import types
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.enums import GenerationJobStatus
+from app.models.generation import GenerationJob
+from app.schemas.conspect import ConspectCreateRequest
+from app.services.generation import GenerationService
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, autoflush=False)() as session:
+        yield session
+
+
+def _service() -> GenerationService:
+    return GenerationService(
+        session_factory=lambda: None,
+        ai_client=types.SimpleNamespace(model_name="test"),
+    )
+
+
+USER = types.SimpleNamespace(id=1)
+
+
+def test_idempotency_key_returns_original_job(db) -> None:
+    service = _service()
+    payload = ConspectCreateRequest(initial_summary="Лекция про графы")
+    first = service.create_conspect_job(db, user=USER, payload=payload, idempotency_key="tap-1")
+    first.status = GenerationJobStatus.COMPLETED
+    db.commit()
+
+    retried = service.create_conspect_job(db, user=USER, payload=payload, idempotency_key="tap-1")
+
+    assert retried.id == first.id
+    assert db.query(GenerationJob).count() == 1
+
+
+def test_idempotency_key_reused_for_other_request_is_rejected(db) -> None:
+    service = _service()
+    service.create_conspect_job(
+        db,
+        user=USER,
+        payload=ConspectCreateRequest(initial_summary="Графы"),
+        idempotency_key="tap-1",
+    )
+    with pytest.raises(ValueError):
+        service.create_conspect_job(
+            db,
+            user=USER,
+            payload=ConspectCreateRequest(initial_summary="Деревья"),
+            idempotency_key="tap-1",
+        )
+
+
+def test_identical_in_flight_requests_coalesce(db) -> None:
+    service = _service()
+    payload = ConspectCreateRequest(initial_summary="  Лекция про графы ")
+    first = service.create_conspect_job(db, user=USER, payload=payload)
+    second = service.create_conspect_job(
+        db, user=USER, payload=ConspectCreateRequest(initial_summary="Лекция про графы")
+    )
+    assert second.id == first.id
+
+    # Другой набор вариантов — уже другая задача
+    other = service.create_conspect_job(
+        db,
+        user=USER,
+        payload=ConspectCreateRequest(initial_summary="Лекция про графы", variants=["full"]),
+    )
+    assert other.id != first.id
+
+    # Завершённая задача не склеивается с новой
+    first.status = GenerationJobStatus.COMPLETED
+    db.commit()
+    fresh = service.create_conspect_job(db, user=USER, payload=payload)
+    assert fresh.id not in (first.id, other.id)
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.rate_limit import GeminiCallLease, GeminiRateLimit
+from app.services.ai.governor import GeminiGovernor, RateLimitTimeout, rate_limit_stats
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+def _make_factory() -> sessionmaker:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def _governor(factory: sessionmaker, **overrides) -> GeminiGovernor:
+    options = {
+        "requests_per_minute": 60,
+        "burst": 2,
+        "max_in_flight": 5,
+        "acquire_timeout_seconds": 0,
+        "lease_seconds": 60,
+        "poll_interval_seconds": 0,
+    }
+    options.update(overrides)
+    return GeminiGovernor(factory, "secret-key", **options)
+
+
+def test_governor_spends_burst_then_rejects_at_deadline() -> None:
+    factory = _make_factory()
+    governor = _governor(factory, requests_per_minute=0.001)
+
+    with governor.slot():
+        pass
+    with governor.slot():
+        pass
+    with pytest.raises(RateLimitTimeout):
+        governor.acquire()
+
+    with factory() as session:
+        bucket = session.get(GeminiRateLimit, governor.key_id)
+        assert bucket.acquired_total == 2
+        assert bucket.rejected_total == 1
+        assert session.query(GeminiCallLease).count() == 0
+        assert "secret-key" not in bucket.key_id
+
+
+def test_governor_limits_concurrent_calls_across_instances() -> None:
+    factory = _make_factory()
+    first = _governor(factory, max_in_flight=1, burst=10)
+    second = _governor(factory, max_in_flight=1, burst=10)
+
+    lease_id = first.acquire()
+    with pytest.raises(RateLimitTimeout):
+        second.acquire()
+    first.release(lease_id)
+
+    with second.slot():
+        with factory() as session:
+            [stats] = rate_limit_stats(session)
+    assert stats["in_flight"] == 1
+    assert stats["acquired"] == 2
+    assert stats["rejected"] == 1
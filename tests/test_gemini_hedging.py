@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from app.services.ai.hedging import (
+    HedgeBudget,
+    HedgeCancelled,
+    Hedger,
+    LatencyTracker,
+    raise_if_cancelled,
+)
+from app.services.ai.pool import GeminiClientPool
+
+
+def _hedger(**overrides) -> Hedger:
+    options = {
+        "percentile": 50,
+        "min_samples": 1,
+        "window": 10,
+        "budget_fraction": 1.0,
+        "min_delay_seconds": 0,
+    }
+    options.update(overrides)
+    return Hedger(**options)
+
+
+def test_latency_tracker_needs_samples_before_reporting_percentile() -> None:
+    tracker = LatencyTracker(window=4, percentile=75, min_samples=3)
+    tracker.observe("quiz", 1.0)
+    tracker.observe("quiz", 2.0)
+    assert tracker.threshold("quiz") is None
+
+    for seconds in (3.0, 4.0, 10.0):
+        tracker.observe("quiz", seconds)
+    # Окно хранит последние 4 замера: 2, 3, 4, 10
+    assert tracker.threshold("quiz") == 4.0
+    assert tracker.threshold("variant:full") is None
+
+
+def test_budget_caps_hedges_as_fraction_of_requests() -> None:
+    budget = HedgeBudget(fraction=0.25, window=100)
+    spent = 0
+    for _ in range(12):
+        budget.record_request()
+        spent += budget.try_spend()
+    assert spent == 4
+    assert spent / (12 + spent) <= 0.25
+
+
+def test_hedge_wins_and_loser_is_cancelled() -> None:
+    hedger = _hedger()
+    hedger.latency.observe("variant:full", 0.01)
+    release = threading.Event()
+    primary_outcome = []
+
+    def primary():
+        release.wait(5)
+        try:
+            raise_if_cancelled()
+        except HedgeCancelled:
+            primary_outcome.append("cancelled")
+            raise
+        return {"source": "primary"}
+
+    assert hedger.run("variant:full", primary, lambda: {"source": "backup"}) == {"source": "backup"}
+    release.set()
+    for _ in range(100):
+        if primary_outcome:
+            break
+        threading.Event().wait(0.01)
+
+    assert primary_outcome == ["cancelled"]
+    assert hedger.stats() == {"hedged": 1, "hedge_wins": 1, "skipped_by_budget": 0}
+
+
+def test_fast_primary_is_not_hedged() -> None:
+    hedger = _hedger()
+    hedger.latency.observe("quiz", 5.0)
+    backup_calls = []
+
+    assert hedger.run("quiz", lambda: "primary", lambda: backup_calls.append(1)) == "primary"
+    assert backup_calls == []
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_failed_hedge_falls_back_to_primary() -> None:
+    hedger = _hedger()
+    hedger.latency.observe("quiz", 0.01)
+
+    def primary():
+        threading.Event().wait(0.1)
+        return "primary"
+
+    def backup():
+        raise ConnectionError("reset")
+
+    assert hedger.run("quiz", primary, backup) == "primary"
+
+
+def test_budget_exhausted_waits_for_primary() -> None:
+    hedger = _hedger(budget_fraction=0)
+    hedger.latency.observe("quiz", 0.01)
+
+    def primary():
+        threading.Event().wait(0.05)
+        return "primary"
+
+    assert hedger.run("quiz", primary, lambda: pytest.fail("hedge over budget")) == "primary"
+    assert hedger.stats()["skipped_by_budget"] == 1
+
+
+class _StubClient:
+    governor = None
+
+    def __init__(self, key_id: str) -> None:
+        self.key_id = key_id
+        self.model_name = "test-model"
+
+
+def test_pool_sends_hedge_to_another_key() -> None:
+    first, second = _StubClient("aaaaaaaa"), _StubClient("bbbbbbbb")
+    GeminiClientPool(
+        [first, second],
+        eject_seconds=60,
+        max_eject_seconds=600,
+        hedge_on_other_key=True,
+    )
+
+    assert first.hedge_router(lambda client: client.key_id) == "bbbbbbbb"
+    assert second.hedge_router(lambda client: client.key_id) == "aaaaaaaa"
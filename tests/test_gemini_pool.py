@@ -0,0 +1,64 @@
+import pytest
+
+from app.services.ai.governor import RateLimitTimeout
+from app.services.ai.pool import GeminiClientPool
+
+
+class _StubClient:
+    governor = None
+
+    def __init__(self, key_id: str, *, throttled: bool = False) -> None:
+        self.key_id = key_id
+        self.model_name = "test-model"
+        self.throttled = throttled
+        self.calls = 0
+
+    def generate_quiz(self, conspect_summary, questions_count=5):
+        self.calls += 1
+        if self.throttled:
+            raise RateLimitTimeout("quota")
+        return {"key": self.key_id}
+
+
+def _pool(*clients: _StubClient) -> GeminiClientPool:
+    return GeminiClientPool(list(clients), eject_seconds=60, max_eject_seconds=600)
+
+
+def test_pool_routes_to_least_loaded_client() -> None:
+    first, second = _StubClient("aaaaaaaa"), _StubClient("bbbbbbbb")
+    pool = _pool(first, second)
+    pool._members[0].in_flight = 2
+
+    assert pool.generate_quiz("summary") == {"key": "bbbbbbbb"}
+    assert pool.generate_quiz("summary") == {"key": "bbbbbbbb"}
+    assert first.calls == 0
+
+
+def test_pool_ejects_throttled_key_and_retries_on_another() -> None:
+    throttled, healthy = _StubClient("aaaaaaaa", throttled=True), _StubClient("bbbbbbbb")
+    pool = _pool(throttled, healthy)
+
+    assert pool.generate_quiz("summary") == {"key": "bbbbbbbb"}
+    assert pool.generate_quiz("summary") == {"key": "bbbbbbbb"}
+
+    assert throttled.calls == 1
+    stats = {item["key"]: item for item in pool.stats()}
+    assert stats["aaaaaaaa"]["quota_errors"] == 1
+    assert stats["aaaaaaaa"]["ejected_for_seconds"] > 0
+    assert stats["bbbbbbbb"]["calls"] == 2
+    assert stats["bbbbbbbb"]["in_flight"] == 0
+
+
+def test_pool_raises_when_every_key_is_throttled() -> None:
+    pool = _pool(_StubClient("aaaaaaaa", throttled=True), _StubClient("bbbbbbbb", throttled=True))
+
+    with pytest.raises(RateLimitTimeout):
+        pool.generate_quiz("summary")
+
+
+def test_pool_rejects_clients_with_different_models() -> None:
+    other = _StubClient("bbbbbbbb")
+    other.model_name = "other-model"
+
+    with pytest.raises(ValueError):
+        _pool(_StubClient("aaaaaaaa"), other)
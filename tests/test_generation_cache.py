@@ -0,0 +1,119 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.cache import GenerationCacheEntry
+from app.services.ai.cache import GenerationResultCache
+from app.services.ai.gemini import GeminiClient
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+def _make_factory() -> sessionmaker:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def _key(cache: GenerationResultCache, prompt: str = "prompt", version: str = "1") -> str:
+    return cache.make_key(
+        model_name="gemini",
+        prompt_version=version,
+        prompt=prompt,
+        contents=[{"text": "лекция"}],
+    )
+
+
+def test_make_key_depends_on_prompt_version_and_skips_files() -> None:
+    cache = GenerationResultCache(None, ttl_seconds=60, memory_entries=4, max_rows=10)
+
+    assert _key(cache) == _key(cache)
+    assert _key(cache) != _key(cache, version="2")
+    assert _key(cache) != _key(cache, prompt="other")
+    key = cache.make_key(model_name="gemini", prompt_version="1", prompt="p", contents=[object()])
+    assert key is None
+
+
+def test_memory_tier_evicts_least_recently_used() -> None:
+    cache = GenerationResultCache(None, ttl_seconds=60, memory_entries=2, max_rows=10)
+    for name in ("a", "b"):
+        cache.set(name, {"value": name}, model_name="gemini", prompt_version="1")
+    assert cache.get("a") == {"value": "a"}
+
+    cache.set("c", {"value": "c"}, model_name="gemini", prompt_version="1")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"value": "a"}
+    assert cache.get("c") == {"value": "c"}
+
+
+def test_shared_tier_is_visible_to_other_processes() -> None:
+    factory = _make_factory()
+    writer = GenerationResultCache(factory, ttl_seconds=60, memory_entries=4, max_rows=10)
+    reader = GenerationResultCache(factory, ttl_seconds=60, memory_entries=4, max_rows=10)
+    key = _key(writer)
+
+    writer.set(key, {"title": "Конспект"}, model_name="gemini", prompt_version="1")
+    payload = reader.get(key)
+    payload["title"] = "изменён вызывающим кодом"
+
+    assert reader.get(key) == {"title": "Конспект"}
+    with factory() as session:
+        assert session.get(GenerationCacheEntry, key).hits == 1
+
+
+def test_expired_shared_entries_are_ignored_and_purged() -> None:
+    factory = _make_factory()
+    cache = GenerationResultCache(factory, ttl_seconds=-1, memory_entries=4, max_rows=10)
+    cache.set("stale", {"value": 1}, model_name="gemini", prompt_version="1")
+
+    assert cache.get("stale") is None
+
+    cache.purge_expired()
+    with factory() as session:
+        assert session.query(GenerationCacheEntry).count() == 0
+
+
+def _gemini(cache: GenerationResultCache, replies: list[dict]) -> GeminiClient:
+    client = GeminiClient.__new__(GeminiClient)
+    client.model_name = "gemini"
+    client.result_cache = cache
+    client._send = lambda prompt, contents, label=None: replies.pop(0)
+    return client
+
+
+def test_invalid_reply_is_not_cached() -> None:
+    factory = _make_factory()
+    cache = GenerationResultCache(factory, ttl_seconds=60, memory_entries=4, max_rows=10)
+    client = _gemini(cache, [{"markdown": ""}, {"markdown": "Раздел", "key_points": ["a"]}])
+
+    with pytest.raises(HTTPException):
+        client.summarize_section("текст", 0, 2)
+    # Повтор идёт в Gemini, а не получает тот же пустой ответ из кэша
+    assert client.summarize_section("текст", 0, 2)["markdown"] == "Раздел"
+    with factory() as session:
+        assert session.query(GenerationCacheEntry).count() == 1
+
+
+def test_invalid_cached_reply_is_evicted() -> None:
+    factory = _make_factory()
+    cache = GenerationResultCache(factory, ttl_seconds=60, memory_entries=4, max_rows=10)
+    client = _gemini(cache, [{"markdown": "Раздел"}])
+    key = cache.make_key(
+        model_name="gemini",
+        prompt_version="1",
+        prompt=client._section_prompt(0, 2),
+        contents=[{"text": "текст"}],
+    )
+    cache.set(key, {"markdown": " "}, model_name="gemini", prompt_version="1")
+
+    assert client.summarize_section("текст", 0, 2)["markdown"] == "Раздел"
+    with factory() as session:
+        assert session.get(GenerationCacheEntry, key).payload == {"markdown": "Раздел"}
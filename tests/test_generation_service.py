@@ -3,9 +3,12 @@ import types
 import pytest
 
 from app.models.audio import AudioSource
-from app.models.enums import AudioProcessingStatus, ConspectVariantType
+from app.models.conspect import Conspect
+from app.models.enums import AudioProcessingStatus, ConspectStatus, ConspectVariantType
 from app.models.generation import GenerationJob
+from app.services.audio_processing import SpeechAnalysis
 from app.services.generation import GenerationService
+from app.services.job_queue import estimate_job_cost
 
 try:  # pragma: no cover - optional dependency
     from google.api_core import exceptions as google_exceptions
@@ -98,8 +101,355 @@ def test_mark_job_failed_keeps_pending_audio_status() -> None:
     assert audio.status == AudioProcessingStatus.PENDING
 
 
+def test_mark_job_failed_keeps_checkpointed_variants() -> None:
+    service = _make_service()
+    job = GenerationJob()
+    job.id = 1
+    job.audio_source_id = 5
+    job.prompt = '{"mode": "create", "variants": ["full", "brief"]}'
+    job.conspect_id = 7
+    job.quiz_id = None
+    job.checkpoints = {
+        "variants": {
+            ConspectVariantType.BRIEF.value: {
+                "title": "Лекция",
+                "markdown": "# Кратко",
+                "key_points": [],
+            },
+        }
+    }
+
+    audio = AudioSource()
+    audio.id = 5
+    audio.status = AudioProcessingStatus.READY
+    conspect = Conspect()
+    conspect.id = 7
+    conspect.status = ConspectStatus.PROCESSING
+    conspect.input_prompt = None
+    conspect.raw_response = None
+
+    session = _StubSession(job, audio)
+    session._store[Conspect] = {conspect.id: conspect}
+
+    service._mark_job_failed(session, job_id=1, error="full failed")
+
+    assert conspect.status == ConspectStatus.READY
+    assert conspect.brief_markdown == "# Кратко"
+    assert list(conspect.raw_response["variants"]) == [ConspectVariantType.BRIEF.value]
+    # Задача упала, поэтому конспект помечен неполным: полного варианта нет
+    assert conspect.missing_variants == [ConspectVariantType.FULL]
+    assert conspect.raw_response["variant_errors"] == {"full": "full failed"}
+    assert audio.status == AudioProcessingStatus.READY
+
+
 @pytest.mark.skipif(google_exceptions is None, reason="google.api_core is unavailable")
 def test_is_transient_ai_failure_detects_service_unavailable() -> None:
     service = _make_service()
     exc = google_exceptions.ServiceUnavailable("overloaded")
     assert service._is_transient_ai_failure(exc)
+
+
+class _FlakyVariantAI:
+    model_name = "test-model"
+
+    def generate_conspect_variant(self, transcript, variant, from_sections=False):
+        if variant == ConspectVariantType.BRIEF:
+            raise RuntimeError("brief failed")
+        return {"title": variant.value, "markdown": f"# {variant.value}", "key_points": []}
+
+
+def test_generate_variant_payloads_isolates_failed_variant() -> None:
+    service = _make_service()
+    variants = [
+        ConspectVariantType.FULL,
+        ConspectVariantType.BRIEF,
+        ConspectVariantType.COMPRESSED,
+    ]
+
+    payloads, errors = service._generate_variant_payloads(_FlakyVariantAI(), "text", variants)
+
+    assert list(payloads) == [ConspectVariantType.FULL.value, ConspectVariantType.COMPRESSED.value]
+    assert list(errors) == [ConspectVariantType.BRIEF.value]
+    assert str(errors[ConspectVariantType.BRIEF.value]) == "brief failed"
+
+
+class _CombinedAI(_FlakyVariantAI):
+    def __init__(self) -> None:
+        self.single_calls: list[ConspectVariantType] = []
+
+    def generate_conspect_variants(self, transcript, variants, from_sections=False):
+        # Сжатый вариант "потерялся" в общем ответе
+        payload = {"title": "full", "markdown": "# full", "key_points": []}
+        return {ConspectVariantType.FULL.value: payload}
+
+    def generate_conspect_variant(self, transcript, variant, from_sections=False):
+        self.single_calls.append(variant)
+        return super().generate_conspect_variant(transcript, variant)
+
+
+def test_generate_variant_payloads_tops_up_missing_combined_variants() -> None:
+    service = _make_service()
+    ai = _CombinedAI()
+
+    payloads, errors = service._generate_variant_payloads(
+        ai,
+        "text",
+        [ConspectVariantType.COMPRESSED, ConspectVariantType.FULL],
+    )
+
+    assert list(payloads) == [ConspectVariantType.COMPRESSED.value, ConspectVariantType.FULL.value]
+    assert ai.single_calls == [ConspectVariantType.COMPRESSED]
+    assert errors == {}
+
+
+def test_generate_variant_payloads_reports_each_finished_variant() -> None:
+    service = _make_service()
+    finished: list[str] = []
+
+    service._generate_variant_payloads(
+        _FlakyVariantAI(),
+        "text",
+        [ConspectVariantType.FULL, ConspectVariantType.BRIEF],
+        on_variant=lambda variant_value, payload: finished.append(variant_value),
+    )
+
+    # Упавший вариант в чекпоинт не попадает — повтор задачи сгенерирует только его
+    assert finished == [ConspectVariantType.FULL.value]
+
+
+def _segment(index: int, start: float, end: float, status: str, transcript: str | None) -> dict:
+    return {
+        "index": index,
+        "source": "hash",
+        "start": start,
+        "end": end,
+        "status": status,
+        "transcript": transcript,
+    }
+
+
+class _SegmentAI:
+    model_name = "test-model"
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def transcribe_audio(self, file_path, mime_type=None, **kwargs):
+        self.calls.append(file_path.name)
+        return {"transcript": "повтор для проверки склейки"}
+
+
+def test_transcribe_in_segments_retries_only_failed_segments(monkeypatch, tmp_path) -> None:
+    from app.services import generation as generation_module
+
+    monkeypatch.setattr(generation_module, "detect_silences", lambda path: [])
+    monkeypatch.setattr(
+        generation_module,
+        "extract_segment",
+        lambda source, segment, destination, **kwargs: destination,
+    )
+    monkeypatch.setattr(generation_module.settings, "transcription_segment_seconds", 300)
+    monkeypatch.setattr(generation_module.settings, "transcription_segment_overlap_seconds", 3.0)
+
+    ai = _SegmentAI()
+    service = GenerationService(session_factory=lambda: None, ai_client=ai)
+    job = GenerationJob()
+    job.id = 1
+    audio = AudioSource()
+    audio.id = 5
+    audio.extra_metadata = {
+        "segments": [
+            _segment(0, 0.0, 303.0, "done", "начало лекции"),
+            _segment(1, 297.0, 603.0, "failed", None),
+            _segment(2, 597.0, 700.0, "done", "конец лекции"),
+        ]
+    }
+    session = _StubSession(job, audio)
+
+    payload = service._transcribe_in_segments(
+        session, audio, tmp_path / "lecture.mp3", 700.0, content_key="hash"
+    )
+
+    assert ai.calls == ["segment-0001.mp3"]
+    assert payload["transcript"] == "начало лекции повтор для проверки склейки конец лекции"
+    assert [segment["status"] for segment in payload["segments"]] == ["done", "done", "done"]
+    assert audio.extra_metadata["segments"][1]["transcript"] == "повтор для проверки склейки"
+
+
+def test_transcribe_in_segments_ignores_progress_of_another_file(monkeypatch, tmp_path) -> None:
+    from app.services import generation as generation_module
+
+    monkeypatch.setattr(generation_module, "detect_silences", lambda path: [])
+    monkeypatch.setattr(
+        generation_module,
+        "extract_segment",
+        lambda source, segment, destination, **kwargs: destination,
+    )
+    monkeypatch.setattr(generation_module.settings, "transcription_segment_seconds", 300)
+    monkeypatch.setattr(generation_module.settings, "transcription_segment_overlap_seconds", 3.0)
+
+    ai = _SegmentAI()
+    service = GenerationService(session_factory=lambda: None, ai_client=ai)
+    job = GenerationJob()
+    job.id = 1
+    audio = AudioSource()
+    audio.id = 5
+    # Сегмент распознан из оригинала; теперь режем копию без пауз с тем же окном 0-303
+    audio.extra_metadata = {"segments": [_segment(0, 0.0, 303.0, "done", "оригинал")]}
+    session = _StubSession(job, audio)
+
+    service._transcribe_in_segments(
+        session, audio, tmp_path / "lecture.mp3", 700.0, content_key="hash:speech-vad"
+    )
+
+    assert ai.calls == ["segment-0000.mp3", "segment-0001.mp3", "segment-0002.mp3"]
+    sources = {segment["source"] for segment in audio.extra_metadata["segments"]}
+    assert sources == {"hash:speech-vad"}
+
+
+class _SectionAI(_FlakyVariantAI):
+    def __init__(self) -> None:
+        self.sections: list[tuple[int, int]] = []
+        self.variant_sources: list[tuple[str, bool]] = []
+
+    def summarize_section(self, section, index, total):
+        self.sections.append((index, total))
+        return {"markdown": f"заметки {index}", "key_points": []}
+
+    def generate_conspect_variant(self, transcript, variant, from_sections=False):
+        self.variant_sources.append((transcript, from_sections))
+        return super().generate_conspect_variant(transcript, variant, from_sections)
+
+
+def test_condense_transcript_keeps_short_transcript(monkeypatch) -> None:
+    from app.services import generation as generation_module
+
+    monkeypatch.setattr(generation_module.settings, "conspect_token_budget", 1000)
+    service = _make_service()
+
+    assert service._condense_transcript(_SectionAI(), "Короткая лекция.") == ("Короткая лекция.", 0)
+
+
+def test_long_transcript_is_summarized_by_sections_before_variants(monkeypatch) -> None:
+    from app.services import generation as generation_module
+
+    monkeypatch.setattr(generation_module.settings, "conspect_token_budget", 50)
+    monkeypatch.setattr(generation_module.settings, "conspect_section_tokens", 40)
+    service = _make_service()
+    ai = _SectionAI()
+    transcript = "\n\n".join(f"Абзац номер {index} о важной теме лекции." for index in range(12))
+
+    source_text, sections_count = service._condense_transcript(ai, transcript)
+    payloads, errors = service._generate_variant_payloads(
+        ai, source_text, [ConspectVariantType.FULL], from_sections=sections_count > 0
+    )
+
+    assert sections_count == len(ai.sections) > 1
+    assert sorted(ai.sections) == [(index, sections_count) for index in range(sections_count)]
+    assert source_text.startswith(f"## Часть 1 из {sections_count}")
+    assert ai.variant_sources == [(source_text, True)]
+    assert list(payloads) == [ConspectVariantType.FULL.value]
+    assert errors == {}
+
+
+def _prepare_fixture(monkeypatch, tmp_path, processed_size: int):
+    from app.services import generation as generation_module
+
+    storage = types.SimpleNamespace(base_dir=tmp_path, resolve_path=lambda value: tmp_path / value)
+    encoded = []
+
+    def fake_preprocess(source, destination, **kwargs):
+        encoded.append(source.name)
+        destination.write_bytes(b"x" * processed_size)
+        return processed_size
+
+    monkeypatch.setattr(generation_module, "audio_storage", storage)
+    monkeypatch.setattr(generation_module, "ffmpeg_available", lambda: True)
+    monkeypatch.setattr(generation_module, "vad_available", lambda: False)
+    monkeypatch.setattr(generation_module, "preprocess_in_pool", fake_preprocess)
+
+    original = tmp_path / "lecture.wav"
+    original.write_bytes(b"x" * 1000)
+    job = GenerationJob()
+    job.id = 1
+    audio = AudioSource()
+    audio.id = 5
+    audio.mime_type = "audio/wav"
+    audio.content_hash = "abc"
+    return _make_service(), _StubSession(job, audio), audio, original, encoded
+
+
+def test_prepare_audio_keeps_original_and_reuses_speech_copy(monkeypatch, tmp_path) -> None:
+    service, session, audio, original, encoded = _prepare_fixture(
+        monkeypatch, tmp_path, processed_size=100
+    )
+
+    path, mime_type, content_key = service._prepare_audio(session, audio, original)
+
+    assert path == tmp_path / "lecture_speech.mp3"
+    assert mime_type == "audio/mpeg"
+    assert content_key.startswith("abc:speech-")
+    assert original.exists()
+    assert audio.processed_file_path == "lecture_speech.mp3"
+    assert audio.processed_file_size == pytest.approx(100 / (1024 * 1024))
+
+    assert service._prepare_audio(session, audio, original)[0] == path
+    assert encoded == ["lecture.wav"]
+
+
+def test_prepare_audio_falls_back_when_copy_is_not_smaller(monkeypatch, tmp_path) -> None:
+    service, session, audio, original, _ = _prepare_fixture(
+        monkeypatch, tmp_path, processed_size=5000
+    )
+
+    assert service._prepare_audio(session, audio, original) == (original, "audio/wav", "abc")
+    assert audio.processed_file_path is None
+    assert not (tmp_path / "lecture_speech.mp3").exists()
+
+
+def _analysis_fixture(monkeypatch, tmp_path):
+    from app.services import generation as generation_module
+
+    service, session, audio, original, _ = _prepare_fixture(monkeypatch, tmp_path, 100)
+    calls = []
+
+    def fake_pool(function, path, **kwargs):
+        calls.append(path.name)
+        return SpeechAnalysis(duration=600.0, intervals=[(0.0, 150.0)])
+
+    monkeypatch.setattr(generation_module, "vad_available", lambda: True)
+    monkeypatch.setattr(generation_module, "run_in_process_pool", fake_pool)
+    return service, session, audio, original, calls
+
+
+def test_measure_audio_feeds_job_cost_estimate(monkeypatch, tmp_path) -> None:
+    service, session, audio, original, _ = _analysis_fixture(monkeypatch, tmp_path)
+    audio.file_size = 50.0
+
+    service.measure_audio(session, audio, original)
+
+    assert audio.speech_ratio == 0.25
+    assert estimate_job_cost(audio)[1] == pytest.approx(150.0)
+
+
+def test_measure_audio_falls_back_to_ffprobe_without_vad(monkeypatch, tmp_path) -> None:
+    from app.services import generation as generation_module
+
+    service, session, audio, original, _ = _prepare_fixture(monkeypatch, tmp_path, 100)
+    monkeypatch.setattr(generation_module, "probe_duration", lambda path: 321.456)
+
+    service.measure_audio(session, audio, original)
+
+    assert audio.duration_seconds == 321.46
+    assert audio.speech_ratio is None
+
+
+def test_prepare_audio_skips_vad_when_upload_found_nothing_to_trim(monkeypatch, tmp_path) -> None:
+    service, session, audio, original, calls = _analysis_fixture(monkeypatch, tmp_path)
+    audio.duration_seconds = 600.0
+    audio.speech_ratio = 0.999
+
+    service._prepare_audio(session, audio, original)
+
+    assert calls == []
+    assert audio.speech_time_map is None
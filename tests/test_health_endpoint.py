@@ -0,0 +1,40 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import deps
+from app.api.endpoints import health
+from app.core.config import settings
+
+
+@pytest.fixture()
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(health.router)
+    app.dependency_overrides[deps.get_db_session] = lambda: iter([None])
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/health/cache", "/health/gemini", "/health/jobs"])
+def test_operational_stats_need_internal_token(client, monkeypatch, path) -> None:
+    monkeypatch.setattr(settings, "internal_api_token", "secret")
+
+    assert client.get("/health").json() == {"status": "ok"}
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Internal-Token": "wrong"}).status_code == 403
+
+
+def test_operational_stats_are_closed_without_configured_token(client, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "internal_api_token", None)
+
+    assert client.get("/health/jobs", headers={"X-Internal-Token": ""}).status_code == 403
+
+
+def test_internal_token_grants_access(client, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "internal_api_token", "secret")
+    monkeypatch.setattr(health, "job_metrics_summary", lambda db, **kwargs: {"jobs": 0, **kwargs})
+
+    response = client.get("/health/jobs?hours=2", headers={"X-Internal-Token": "secret"})
+
+    assert response.status_code == 200
+    assert response.json() == {"jobs": 0, "hours": 2.0, "job_type": None}
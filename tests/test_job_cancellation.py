@@ -0,0 +1,218 @@
+import threading
+import types
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.base import Base
+from app.models.conspect import Conspect
+from app.models.enums import ConspectStatus, GenerationJobStatus, GenerationJobType
+from app.models.generation import GenerationJob
+from app.models.rate_limit import UserJobQuota
+from app.schemas.conspect import ConspectCreateRequest
+from app.services.ai.resilience import JobCancelled
+from app.services.generation import GenerationService
+from app.services.job_queue import JobQueue
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+class _UnreachableAI:
+    model_name = "test-model"
+
+    def __getattr__(self, name):
+        raise AssertionError(f"Gemini must not be called after cancellation: {name}")
+
+
+USER = types.SimpleNamespace(id=1)
+
+
+@pytest.fixture()
+def factory(tmp_path):
+    # Файловая база: у потока монитора своё соединение, а не общее с тестом
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'jobs.db'}",
+        future=True,
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def _create_job(service: GenerationService, factory) -> int:
+    with factory() as db:
+        job = service.create_conspect_job(
+            db,
+            user=USER,
+            payload=ConspectCreateRequest(initial_summary="Лекция"),
+        )
+        return job.id
+
+
+def test_cancelling_pending_job_finishes_it_and_frees_quota(factory) -> None:
+    service = GenerationService(session_factory=factory, ai_client=_UnreachableAI())
+    job_id = _create_job(service, factory)
+
+    with factory() as db:
+        job = service.cancel_job(db, db.get(GenerationJob, job_id))
+        assert job.status == GenerationJobStatus.CANCELLED
+        assert db.get(Conspect, job.conspect_id).status == ConspectStatus.FAILED
+        assert db.get(UserJobQuota, USER.id).active_jobs == 0
+
+        with pytest.raises(ValueError):
+            service.cancel_job(db, job)
+
+    assert JobQueue(factory).claim_next("node:1/0") is None
+
+
+def test_running_job_stops_at_next_stage(factory) -> None:
+    service = GenerationService(session_factory=factory, ai_client=_UnreachableAI())
+    job_id = _create_job(service, factory)
+    assert JobQueue(factory).claim_next("node:1/0") == (job_id, GenerationJobType.CONSPECT)
+
+    with factory() as db:
+        job = service.cancel_job(db, db.get(GenerationJob, job_id))
+        assert job.status == GenerationJobStatus.RUNNING
+        assert job.cancel_requested_at is not None
+
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(JobCancelled):
+        service.process_job(job_id, GenerationJobType.CONSPECT, cancelled)
+
+    with factory() as db:
+        job = db.get(GenerationJob, job_id)
+        assert job.status == GenerationJobStatus.CANCELLED
+        assert db.get(UserJobQuota, USER.id).active_jobs == 0
+
+
+def test_monitor_raises_flag_after_cancel_request(factory, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "job_monitor_interval_seconds", 0.01)
+    service = GenerationService(session_factory=factory, ai_client=_UnreachableAI())
+    queue = JobQueue(factory)
+    job_id = _create_job(service, factory)
+    queue.claim_next("node:1/0")
+
+    with queue.monitor(job_id, "node:1/0") as cancelled:
+        assert not cancelled.wait(0.05)
+        with factory() as db:
+            service.cancel_job(db, db.get(GenerationJob, job_id))
+        assert cancelled.wait(1.0)
+
+
+def test_monitor_renews_lease_and_gives_up_a_lost_one(factory, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "job_monitor_interval_seconds", 0.01)
+    monkeypatch.setattr(settings, "job_heartbeat_seconds", 0.0)
+    service = GenerationService(session_factory=factory, ai_client=_UnreachableAI())
+    queue = JobQueue(factory)
+    job_id = _create_job(service, factory)
+    queue.claim_next("node:1/0")
+    with factory() as db:
+        first_lease = db.get(GenerationJob, job_id).lease_expires_at
+
+    with queue.monitor(job_id, "node:1/0") as cancelled:
+        assert not cancelled.wait(0.1)
+        with factory() as db:
+            job = db.get(GenerationJob, job_id)
+            assert job.lease_expires_at > first_lease
+            # Reaper вернул задачу в очередь, и её взял другой воркер
+            job.worker_id = "node:2/0"
+            db.commit()
+        assert cancelled.wait(1.0)
+
+    # Отмены не было — чужую задачу не трогаем
+    with factory() as db:
+        service._mark_job_cancelled(db, job_id)
+        assert db.get(GenerationJob, job_id).status == GenerationJobStatus.RUNNING
+
+
+def test_abandon_job_fails_exhausted_job(factory) -> None:
+    service = GenerationService(session_factory=factory, ai_client=_UnreachableAI())
+    job_id = _create_job(service, factory)
+    JobQueue(factory).claim_next("node:1/0")
+    with factory() as db:
+        db.get(GenerationJob, job_id).lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+
+    service.abandon_job(job_id)
+
+    with factory() as db:
+        job = db.get(GenerationJob, job_id)
+        assert job.status == GenerationJobStatus.FAILED
+        assert db.get(Conspect, job.conspect_id).status == ConspectStatus.FAILED
+        assert db.get(UserJobQuota, USER.id).active_jobs == 0
+
+
+class _VariantAI:
+    model_name = "test-model"
+
+    def generate_conspect_variant(self, transcript, variant, from_sections=False):
+        return {"title": "Лекция", "markdown": "# Лекция", "key_points": []}
+
+
+def _reclaim(factory, job_id: int, worker_id: str) -> None:
+    # Reaper вернул задачу в очередь, и её взял другой воркер
+    with factory() as db:
+        db.get(GenerationJob, job_id).worker_id = worker_id
+        db.commit()
+
+
+def test_stale_worker_does_not_complete_reclaimed_job(factory) -> None:
+    service = GenerationService(session_factory=factory, ai_client=_VariantAI())
+    job_id = _create_job(service, factory)
+    JobQueue(factory).claim_next("node:1/0")
+    _reclaim(factory, job_id, "node:2/0")
+
+    service.process_job(job_id, GenerationJobType.CONSPECT, worker_id="node:1/0")
+
+    with factory() as db:
+        job = db.get(GenerationJob, job_id)
+        assert job.status == GenerationJobStatus.RUNNING
+        assert job.worker_id == "node:2/0"
+        assert db.get(UserJobQuota, USER.id).active_jobs == 1
+
+    service.process_job(job_id, GenerationJobType.CONSPECT, worker_id="node:2/0")
+
+    with factory() as db:
+        assert db.get(GenerationJob, job_id).status == GenerationJobStatus.COMPLETED
+        assert db.get(UserJobQuota, USER.id).active_jobs == 0
+
+
+def test_stale_worker_failure_keeps_reclaimed_job_running(factory) -> None:
+    service = GenerationService(session_factory=factory, ai_client=_UnreachableAI())
+    job_id = _create_job(service, factory)
+    JobQueue(factory).claim_next("node:1/0")
+    _reclaim(factory, job_id, "node:2/0")
+
+    with factory() as db:
+        service._mark_job_failed(db, job_id, "worker lost", "node:1/0")
+
+    with factory() as db:
+        assert db.get(GenerationJob, job_id).status == GenerationJobStatus.RUNNING
+        assert db.get(UserJobQuota, USER.id).active_jobs == 1
+
+
+def test_retried_job_reuses_checkpointed_variants(factory) -> None:
+    service = GenerationService(session_factory=factory, ai_client=_UnreachableAI())
+    job_id = _create_job(service, factory)
+    JobQueue(factory).claim_next("node:1/0")
+    with factory() as db:
+        db.get(GenerationJob, job_id).checkpoints = {
+            "variants": {"brief": {"title": "Лекция", "markdown": "# Кратко", "key_points": []}}
+        }
+        db.commit()
+
+    service.process_job(job_id, GenerationJobType.CONSPECT, worker_id="node:1/0")
+
+    with factory() as db:
+        job = db.get(GenerationJob, job_id)
+        assert job.status == GenerationJobStatus.COMPLETED
+        assert db.get(Conspect, job.conspect_id).brief_markdown == "# Кратко"
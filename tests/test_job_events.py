@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from app.services.job_events import JobEventHub, notify_job_event
+
+
+class _SqliteSession:
+    class bind:  # noqa: N801 - имитирует Session.bind
+        class dialect:  # noqa: N801
+            name = "sqlite"
+
+    def execute(self, *args, **kwargs):  # pragma: no cover - не должен вызываться
+        raise AssertionError("NOTIFY is Postgres-only")
+
+
+def test_hub_dispatches_events_only_to_subscribers_of_that_job() -> None:
+    hub = JobEventHub("postgresql://unused")
+    hub._ensure_started = lambda: None
+
+    async def scenario() -> tuple[dict, bool]:
+        queue = hub.subscribe([1])
+        other = hub.subscribe([2])
+        hub.dispatch(json.dumps({"job_id": 1, "event": "progress", "stage": "transcribing"}))
+        hub.dispatch("not json")
+        event = await asyncio.wait_for(queue.get(), timeout=1)
+        hub.unsubscribe([1], queue)
+        hub.unsubscribe([2], other)
+        return event, other.empty()
+
+    event, other_empty = asyncio.run(scenario())
+
+    assert event["stage"] == "transcribing"
+    assert other_empty
+    assert hub._subscribers == {}
+
+
+def test_hub_drops_oldest_events_for_slow_subscribers() -> None:
+    hub = JobEventHub("postgresql://unused", queue_size=2)
+    hub._ensure_started = lambda: None
+
+    async def scenario() -> list[int]:
+        queue = hub.subscribe([7])
+        for step in range(3):
+            hub.dispatch(json.dumps({"job_id": 7, "event": "progress", "step": step}))
+        await asyncio.sleep(0)
+        return [queue.get_nowait()["step"] for _ in range(queue.qsize())]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_hub_delivers_events_of_several_jobs_to_one_subscriber() -> None:
+    hub = JobEventHub("postgresql://unused")
+    hub._ensure_started = lambda: None
+
+    async def scenario() -> list[int]:
+        queue = hub.subscribe([3, 4])
+        hub.dispatch(json.dumps({"job_id": 4, "event": "status", "status": "completed"}))
+        hub.dispatch(json.dumps({"job_id": 3, "event": "status", "status": "running"}))
+        await asyncio.sleep(0)
+        return [queue.get_nowait()["job_id"] for _ in range(queue.qsize())]
+
+    assert asyncio.run(scenario()) == [4, 3]
+
+
+def test_notify_job_event_is_noop_outside_postgres() -> None:
+    notify_job_event(_SqliteSession(), 1, "status", status="running")
@@ -0,0 +1,126 @@
+import types
+from datetime import UTC, datetime, timedelta, timezone
+
+import pytest
+
+from app.models.enums import GenerationJobStatus, GenerationJobType
+from app.models.generation import GenerationJob
+from app.services.ai.telemetry import timed_stage, track_calls
+from app.services.generation import GenerationService
+from app.services.job_metrics import summarize_job_metrics
+
+
+def test_stats_accumulate_stages_tokens_and_cache() -> None:
+    with track_calls() as stats:
+        for _ in range(2):
+            with timed_stage("transcription"):
+                pass
+        with pytest.raises(RuntimeError):
+            with timed_stage("variant_full"):
+                raise RuntimeError("failed")
+        stats.record_usage(types.SimpleNamespace(prompt_token_count=120, candidates_token_count=30))
+        stats.record_usage(None)
+        stats.record_cache("variant_full", "hit")
+        stats.record_cache("transcript", "miss")
+        stats.record_retry()
+
+    metrics = stats.as_metrics()
+
+    assert metrics["stages"]["transcription"]["count"] == 2
+    # Упавшая стадия тоже учитывается
+    assert metrics["stages"]["variant_full"]["count"] == 1
+    assert metrics["gemini"] == {
+        "calls": 2,
+        "prompt_tokens": 120,
+        "response_tokens": 30,
+        "retries": 1,
+    }
+    assert metrics["cache"] == {
+        "hits": 1,
+        "misses": 1,
+        "by_label": {
+            "variant_full": {"hits": 1, "misses": 0},
+            "transcript": {"hits": 0, "misses": 1},
+        },
+    }
+
+
+def test_cache_counts_fold_section_and_variant_labels() -> None:
+    with track_calls() as stats:
+        for index in range(3):
+            stats.record_cache(f"section:{index}", "miss")
+        stats.record_cache("section:0", "hit")
+        stats.record_cache("variants:full+brief", "hit")
+
+    assert stats.as_metrics()["cache"]["by_label"] == {
+        "section": {"hits": 1, "misses": 3},
+        "variants": {"hits": 1, "misses": 0},
+    }
+
+
+def test_timed_stage_without_tracking_is_noop() -> None:
+    with timed_stage("saving"):
+        pass
+
+
+def _metrics(transcription: float, saving: float, *, prompt_tokens: int, hits: int) -> dict:
+    return {
+        "queue_wait_seconds": 2.0,
+        "run_seconds": transcription + saving,
+        "stages": {
+            "transcription": {"seconds": transcription, "count": 1},
+            "saving": {"seconds": saving, "count": 1},
+        },
+        "gemini": {"calls": 1, "prompt_tokens": prompt_tokens, "response_tokens": 10, "retries": 0},
+        "cache": {
+            "hits": hits,
+            "misses": 1 - hits,
+            "by_label": {"transcript": {"hits": hits, "misses": 1 - hits}},
+        },
+    }
+
+
+def test_summary_ranks_stages_by_total_time() -> None:
+    rows = [
+        (
+            GenerationJobType.CONSPECT,
+            GenerationJobStatus.COMPLETED,
+            _metrics(30.0, 1.0, prompt_tokens=100, hits=0),
+        ),
+        (
+            GenerationJobType.CONSPECT,
+            GenerationJobStatus.FAILED,
+            _metrics(10.0, 1.0, prompt_tokens=50, hits=1),
+        ),
+        (GenerationJobType.QUIZ, GenerationJobStatus.COMPLETED, None),
+    ]
+
+    summary = summarize_job_metrics(rows)
+
+    assert summary["jobs"] == 3
+    assert summary["by_type"] == {"conspect": 2, "quiz": 1}
+    assert summary["by_status"] == {"completed": 2, "failed": 1}
+    assert list(summary["stages"]) == ["transcription", "saving"]
+    assert summary["stages"]["transcription"]["max"] == 30.0
+    assert summary["stages"]["transcription"]["share"] == pytest.approx(40 / 42, abs=1e-3)
+    assert summary["gemini"]["prompt_tokens"] == 150
+    assert summary["cache"]["hit_rate"] == 0.5
+    assert summary["cache"]["by_label"] == {"transcript": {"hits": 1, "misses": 1, "hit_rate": 0.5}}
+
+
+def test_job_metrics_mix_loaded_aware_and_fresh_naive_times() -> None:
+    service = GenerationService(
+        session_factory=lambda: None,
+        ai_client=types.SimpleNamespace(model_name="m"),
+    )
+    job = GenerationJob()
+    # Так колонки timestamptz возвращаются из Postgres после commit
+    job.created_at = datetime(2025, 1, 1, 12, 0, tzinfo=timezone(timedelta(hours=3)))
+    job.started_at = datetime(2025, 1, 1, 9, 0, 30, tzinfo=UTC)
+    job.finished_at = datetime(2025, 1, 1, 9, 2, 30)
+
+    with track_calls():
+        service._record_job_metrics(job)
+
+    assert job.metrics["queue_wait_seconds"] == 30.0
+    assert job.metrics["run_seconds"] == 120.0
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.audio import AudioSource
+from app.models.base import Base
+from app.models.enums import GenerationJobStatus, GenerationJobType
+from app.models.generation import GenerationJob
+from app.services.job_queue import (
+    PRIORITY_AUDIO,
+    PRIORITY_LONG_AUDIO,
+    PRIORITY_QUICK,
+    JobQueue,
+    estimate_job_cost,
+)
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+def _make_queue() -> tuple[JobQueue, sessionmaker]:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    return JobQueue(factory), factory
+
+
+def test_claim_next_takes_oldest_pending_job() -> None:
+    queue, factory = _make_queue()
+    now = datetime.utcnow()
+    with factory() as session:
+        session.add_all(
+            [
+                GenerationJob(
+                    id=1,
+                    user_id=1,
+                    job_type=GenerationJobType.QUIZ,
+                    status=GenerationJobStatus.PENDING,
+                    created_at=now,
+                ),
+                GenerationJob(
+                    id=2,
+                    user_id=1,
+                    job_type=GenerationJobType.CONSPECT,
+                    status=GenerationJobStatus.PENDING,
+                    created_at=now - timedelta(minutes=1),
+                ),
+                GenerationJob(
+                    id=3,
+                    user_id=1,
+                    job_type=GenerationJobType.CONSPECT,
+                    status=GenerationJobStatus.COMPLETED,
+                    created_at=now - timedelta(minutes=2),
+                ),
+            ]
+        )
+        session.commit()
+
+    assert queue.claim_next("node:1/0") == (2, GenerationJobType.CONSPECT)
+    assert queue.claim_next("node:1/1") == (1, GenerationJobType.QUIZ)
+    assert queue.claim_next("node:1/0") is None
+
+    with factory() as session:
+        job = session.get(GenerationJob, 2)
+        assert job.status == GenerationJobStatus.RUNNING
+        assert job.worker_id == "node:1/0"
+        assert job.started_at is not None
+
+
+def _job(job_id: int, user_id: int, created_at: datetime, **fields) -> GenerationJob:
+    fields.setdefault("job_type", GenerationJobType.CONSPECT)
+    fields.setdefault("status", GenerationJobStatus.PENDING)
+    return GenerationJob(id=job_id, user_id=user_id, created_at=created_at, **fields)
+
+
+def test_quick_jobs_are_claimed_before_long_audio() -> None:
+    queue, factory = _make_queue()
+    now = datetime.utcnow()
+    with factory() as session:
+        session.add_all(
+            [
+                _job(
+                    1,
+                    1,
+                    now - timedelta(minutes=2),
+                    priority=PRIORITY_LONG_AUDIO,
+                    estimated_cost=3600.0,
+                ),
+                _job(2, 2, now, job_type=GenerationJobType.QUIZ),
+            ]
+        )
+        session.commit()
+
+    assert queue.claim_next("node:1/0") == (2, GenerationJobType.QUIZ)
+    assert queue.claim_next("node:1/0") == (1, GenerationJobType.CONSPECT)
+
+
+def test_fair_share_interleaves_users() -> None:
+    queue, factory = _make_queue()
+    now = datetime.utcnow()
+    with factory() as session:
+        session.add_all(
+            [_job(job_id, 1, now - timedelta(seconds=60 - job_id)) for job_id in range(1, 4)]
+            + [_job(10, 2, now)]
+        )
+        session.commit()
+
+    claimed = [queue.claim_next("node:1/0")[0] for _ in range(4)]
+
+    # Второй пользователь не ждёт, пока выполнятся все задачи первого
+    assert claimed == [1, 10, 2, 3]
+
+
+def test_long_waiting_job_is_not_starved() -> None:
+    queue, factory = _make_queue()
+    now = datetime.utcnow()
+    with factory() as session:
+        session.add_all(
+            [
+                _job(
+                    1,
+                    1,
+                    now - timedelta(hours=3),
+                    priority=PRIORITY_LONG_AUDIO,
+                    estimated_cost=3600.0,
+                ),
+                _job(2, 2, now, job_type=GenerationJobType.QUIZ),
+            ]
+        )
+        session.commit()
+
+    assert queue.claim_next("node:1/0") == (1, GenerationJobType.CONSPECT)
+
+
+def test_queue_positions_follow_claim_order() -> None:
+    queue, factory = _make_queue()
+    now = datetime.utcnow()
+    with factory() as session:
+        session.add_all(
+            [
+                _job(
+                    1,
+                    1,
+                    now - timedelta(minutes=1),
+                    priority=PRIORITY_LONG_AUDIO,
+                    estimated_cost=3600.0,
+                ),
+                _job(2, 2, now),
+                _job(3, 3, now - timedelta(minutes=5), status=GenerationJobStatus.RUNNING),
+            ]
+        )
+        session.commit()
+        assert queue.queue_positions(session, [1, 2, 3]) == {2: 1, 1: 2}
+
+
+def test_estimate_job_cost_uses_speech_duration_or_file_size() -> None:
+    assert estimate_job_cost(None) == (PRIORITY_QUICK, 0.0)
+    assert estimate_job_cost(AudioSource(transcription="готово", file_size=100)) == (
+        PRIORITY_QUICK,
+        0.0,
+    )
+    assert estimate_job_cost(AudioSource(duration_seconds=600, speech_ratio=0.5)) == (
+        PRIORITY_AUDIO,
+        300.0,
+    )
+    assert estimate_job_cost(AudioSource(file_size=60)) == (PRIORITY_LONG_AUDIO, 3600.0)
+
+
+def test_claim_takes_a_lease_and_counts_attempts() -> None:
+    queue, factory = _make_queue()
+    with factory() as session:
+        session.add(_job(1, 1, datetime.utcnow()))
+        session.commit()
+
+    queue.claim_next("node:1/0")
+
+    with factory() as session:
+        job = session.get(GenerationJob, 1)
+        assert job.attempts == 1
+        assert job.heartbeat_at is not None
+        assert job.lease_expires_at > job.heartbeat_at
+
+
+def test_reap_expired_requeues_lost_jobs_and_returns_exhausted(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "job_max_attempts", 2)
+    queue, factory = _make_queue()
+    now = datetime.utcnow()
+    running = dict(status=GenerationJobStatus.RUNNING, worker_id="node:1/0", started_at=now)
+    with factory() as session:
+        session.add_all(
+            [
+                _job(1, 1, now, attempts=1, lease_expires_at=now - timedelta(seconds=5), **running),
+                _job(2, 1, now, attempts=2, lease_expires_at=now - timedelta(seconds=5), **running),
+                _job(
+                    3,
+                    1,
+                    now,
+                    attempts=1,
+                    lease_expires_at=now + timedelta(seconds=60),
+                    **running,
+                ),
+            ]
+        )
+        session.commit()
+
+    assert queue.reap_expired() == [2]
+
+    with factory() as session:
+        requeued = session.get(GenerationJob, 1)
+        assert requeued.status == GenerationJobStatus.PENDING
+        assert requeued.worker_id is None
+        assert requeued.lease_expires_at is None
+        assert session.get(GenerationJob, 2).status == GenerationJobStatus.RUNNING
+        assert session.get(GenerationJob, 3).status == GenerationJobStatus.RUNNING
+
+    assert queue.claim_next("node:2/0") == (1, GenerationJobType.CONSPECT)
+    with factory() as session:
+        assert session.get(GenerationJob, 1).attempts == 2
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from app.api.endpoints.jobs import MAX_BATCH_JOB_IDS, _has_news, _parse_job_ids, _parse_seen
+from app.models.enums import GenerationJobStatus, GenerationJobType
+from app.schemas.job import JobRead
+
+
+def test_parse_job_ids_deduplicates_and_keeps_order() -> None:
+    assert _parse_job_ids("3, 1,3,,2") == [3, 1, 2]
+
+
+@pytest.mark.parametrize(
+    "raw_ids",
+    ["", "1,abc", ",".join(str(index) for index in range(MAX_BATCH_JOB_IDS + 1))],
+)
+def test_parse_job_ids_rejects_invalid_input(raw_ids: str) -> None:
+    with pytest.raises(ValueError):
+        _parse_job_ids(raw_ids)
+
+
+def _job(job_id: int, job_status: GenerationJobStatus) -> JobRead:
+    return JobRead(
+        id=job_id,
+        user_id=1,
+        job_type=GenerationJobType.CONSPECT,
+        status=job_status,
+        created_at=datetime(2025, 1, 1),
+    )
+
+
+def test_parse_seen_reads_id_status_pairs() -> None:
+    assert _parse_seen("3:running, 1:completed", [1, 3]) == {
+        3: GenerationJobStatus.RUNNING,
+        1: GenerationJobStatus.COMPLETED,
+    }
+    with pytest.raises(ValueError):
+        _parse_seen("3:unknown", [3])
+    with pytest.raises(ValueError):
+        _parse_seen("4:running", [3])
+
+
+def test_finished_job_in_batch_does_not_end_long_poll() -> None:
+    jobs = [_job(1, GenerationJobStatus.COMPLETED), _job(2, GenerationJobStatus.RUNNING)]
+
+    assert not _has_news(jobs, {1: GenerationJobStatus.COMPLETED, 2: GenerationJobStatus.RUNNING})
+    # Переход между двумя опросами виден по статусу, который клиент видел в прошлый раз
+    assert _has_news(jobs, {1: GenerationJobStatus.RUNNING, 2: GenerationJobStatus.RUNNING})
+    assert _has_news(jobs[:1], {1: GenerationJobStatus.COMPLETED})
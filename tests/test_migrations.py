@@ -0,0 +1,89 @@
+import importlib.util
+import sys
+import types
+from pathlib import Path
+from unittest import mock
+
+import sqlalchemy as sa
+
+from app import models  # noqa: F401
+from app.models.base import Base
+
+VERSIONS_DIR = Path(__file__).resolve().parent.parent / "alembic" / "versions"
+# Эти таблицы и колонки старые ревизии создают сырым SQL, который здесь не разбирается
+RAW_SQL_TABLES = {"tournamentlobby", "tournamentparticipant", "medal"}
+RAW_SQL_COLUMNS = {"user": {"nickname"}}
+
+
+class _RecordingOp:
+    """Подмена alembic.op: запоминает колонки таблиц, остальные операции игнорирует."""
+
+    def __init__(self) -> None:
+        self.tables: dict[str, set[str]] = {}
+
+    def create_table(self, name, *items, **kwargs):
+        self.tables[name] = {item.name for item in items if isinstance(item, sa.Column)}
+
+    def drop_table(self, name, **kwargs):
+        self.tables.pop(name, None)
+
+    def add_column(self, table, column, **kwargs):
+        self.tables.setdefault(table, set()).add(column.name)
+
+    def drop_column(self, table, name, **kwargs):
+        self.tables.get(table, set()).discard(name)
+
+    def alter_column(self, table, name, new_column_name=None, **kwargs):
+        if new_column_name:
+            columns = self.tables.get(table, set())
+            columns.discard(name)
+            columns.add(new_column_name)
+
+    def f(self, name):
+        return name
+
+    def __getattr__(self, name):
+        return mock.MagicMock()
+
+
+def _load_revisions() -> dict[str, types.ModuleType]:
+    revisions = {}
+    for path in sorted(VERSIONS_DIR.glob("*.py")):
+        spec = importlib.util.spec_from_file_location(f"_migration_{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        revisions[module.revision] = module
+    return revisions
+
+
+def _upgrade_order(revisions: dict[str, types.ModuleType]) -> list[types.ModuleType]:
+    ordered: list[types.ModuleType] = []
+    seen: set[str] = set()
+
+    def visit(revision: str) -> None:
+        if revision in seen:
+            return
+        seen.add(revision)
+        parents = revisions[revision].down_revision or ()
+        for parent in (parents,) if isinstance(parents, str) else parents:
+            visit(parent)
+        ordered.append(revisions[revision])
+
+    for revision in revisions:
+        visit(revision)
+    return ordered
+
+
+def test_migrations_create_every_model_column(monkeypatch) -> None:
+    op = _RecordingOp()
+    monkeypatch.setitem(sys.modules, "alembic", types.SimpleNamespace(op=op))
+
+    for module in _upgrade_order(_load_revisions()):
+        module.upgrade()
+
+    for table in Base.metadata.sorted_tables:
+        if table.name in RAW_SQL_TABLES:
+            continue
+        assert table.name in op.tables, f"no migration creates {table.name}"
+        migrated = op.tables[table.name] | RAW_SQL_COLUMNS.get(table.name, set())
+        assert {column.name for column in table.columns} == migrated, table.name
@@ -0,0 +1,124 @@
+import random
+import types
+
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.question_bank import BankQuestion
+from app.services.generation import GenerationService
+from app.services.question_bank import QuestionBank, summary_hash
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False)()
+
+
+def _question(text: str, difficulty: str = "medium") -> dict:
+    return {
+        "question": text,
+        "difficulty": difficulty,
+        "answers": [
+            {"text": "верно", "is_correct": True},
+            {"text": "неверно", "is_correct": False},
+            {"text": "частично", "is_correct": False},
+        ],
+        "explanation": "потому что",
+    }
+
+
+def test_store_skips_duplicates_and_broken_questions() -> None:
+    session = _session()
+    bank = QuestionBank()
+    payload = [
+        _question("Что такое энтропия?"),
+        _question("что такое ЭНТРОПИЯ"),
+        {"question": "Без верного ответа", "answers": [{"text": "a", "is_correct": False}]},
+        _question("Кто открыл закон?", "impossible"),
+    ]
+
+    added = bank.store(session, conspect_id=1, source_hash="h", questions_payload=payload)
+    session.commit()
+
+    assert [question.question for question in added] == ["Что такое энтропия?", "Кто открыл закон?"]
+    assert added[1].difficulty == "medium"
+
+    again = bank.store(
+        session,
+        conspect_id=1,
+        source_hash="h",
+        questions_payload=[_question("Что такое энтропия?")],
+        existing=bank.available(session, conspect_id=1, source_hash="h"),
+    )
+    assert again == []
+    assert session.query(BankQuestion).count() == 2
+
+
+def test_sample_mixes_difficulties_and_prefers_unused() -> None:
+    bank = QuestionBank(random.Random(1))  # noqa: S311
+    questions = [
+        BankQuestion(
+            question=f"{difficulty}-{index}",
+            difficulty=difficulty,
+            answers=_question("x")["answers"],
+            times_used=index,
+        )
+        for difficulty in ("easy", "medium", "hard")
+        for index in range(3)
+    ]
+
+    sampled = bank.sample(questions, 4)
+
+    assert [item["difficulty"] for item in sampled] == ["easy", "medium", "hard", "easy"]
+    assert {item["question"] for item in sampled[:3]} == {"easy-0", "medium-0", "hard-0"}
+    assert sum(question.times_used for question in questions) == 9 + 4
+    assert all(sum(answer["is_correct"] for answer in item["answers"]) == 1 for item in sampled)
+
+
+class _BankAI:
+    model_name = "test-model"
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def generate_question_bank(self, summary, questions_count, exclude=()):
+        self.calls.append((questions_count, list(exclude)))
+        start = len(exclude)
+        return {
+            "title": "Банк",
+            "questions": [_question(f"Вопрос {start + index}") for index in range(questions_count)],
+        }
+
+
+def test_assemble_quiz_calls_ai_only_when_bank_is_short(monkeypatch) -> None:
+    from app.services import generation as generation_module
+
+    monkeypatch.setattr(generation_module.settings, "quiz_bank_batch_size", 6)
+    session = _session()
+    ai = _BankAI()
+    service = GenerationService(session_factory=lambda: None, ai_client=ai)
+    conspect = types.SimpleNamespace(id=7, summary="Конспект о термодинамике")
+
+    first = service._assemble_quiz(session, conspect, 5)
+    second = service._assemble_quiz(session, conspect, 5)
+    third = service._assemble_quiz(session, conspect, 8)
+
+    assert len(first["questions"]) == len(second["questions"]) == 5
+    assert first["question_bank"] == {"pool_size": 6, "generated": 6}
+    assert second["question_bank"] == {"pool_size": 6, "generated": 0}
+    assert third["question_bank"] == {"pool_size": 14, "generated": 8}
+    assert [count for count, _ in ai.calls] == [6, 8]
+    assert len(ai.calls[1][1]) == 6
+    stored = session.query(BankQuestion).filter(
+        BankQuestion.summary_hash == summary_hash(conspect.summary),
+    )
+    assert stored.count() == 14
@@ -0,0 +1,73 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+from app.models.base import Base
+from app.models.quiz import QuizAnswer, QuizQuestion
+from app.services.quiz_persistence import (
+    AnswerDraft,
+    QuestionDraft,
+    insert_quiz_questions,
+    replace_quiz_questions,
+)
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+def _drafts(prefix: str, count: int) -> list[QuestionDraft]:
+    return [
+        QuestionDraft(
+            title=f"{prefix} {index}",
+            answers=[
+                AnswerDraft(text=f"{prefix} {index}.{answer}", is_correct=answer == 1)
+                for answer in range(3)
+            ],
+        )
+        for index in range(count)
+    ]
+
+
+def test_insert_returns_ids_in_order_and_links_answers() -> None:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        ids = insert_quiz_questions(session, quiz_id=1, user_id=2, questions=_drafts("q", 4))
+        session.commit()
+
+        questions = {question.id: question for question in session.query(QuizQuestion).all()}
+        assert [questions[question_id].title for question_id in ids] == ["q 0", "q 1", "q 2", "q 3"]
+        assert [questions[question_id].position for question_id in ids] == [0, 1, 2, 3]
+        for question_id in ids:
+            question = questions[question_id]
+            answers = question.answers
+            assert [answer.text for answer in answers] == [
+                f"{question.title}.{i}" for i in range(3)
+            ]
+            assert [answer.is_correct for answer in answers] == [False, True, False]
+
+
+def test_replace_drops_old_questions_and_answers_in_bulk() -> None:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    statements: list[str] = []
+
+    with Session(engine) as session:
+        insert_quiz_questions(session, quiz_id=1, user_id=2, questions=_drafts("old", 3))
+        insert_quiz_questions(session, quiz_id=9, user_id=2, questions=_drafts("other", 1))
+        session.commit()
+
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        replace_quiz_questions(session, quiz_id=1, user_id=2, questions=_drafts("new", 2))
+        session.commit()
+
+        titles = sorted(title for (title,) in session.query(QuizQuestion.title))
+        assert titles == ["new 0", "new 1", "other 0"]
+        assert session.query(QuizAnswer).count() == 3 * 3
+
+    deletes = [statement for statement in statements if statement.startswith("DELETE")]
+    assert len(deletes) == 2
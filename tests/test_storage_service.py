@@ -1,3 +1,4 @@
+import hashlib
 import io
 
 import pytest
@@ -13,8 +14,10 @@ def _make_upload(name: str, data: bytes) -> UploadFile:
 def test_save_upload_uses_safe_unique_filename(tmp_path) -> None:
     storage = AudioStorageService(tmp_path)
 
-    first, first_size = storage.save_upload(user_id=1, upload=_make_upload("../../evil.m4a", b"abc"))
-    second, _ = storage.save_upload(user_id=1, upload=_make_upload("../../evil.m4a", b"xyz"))
+    first, first_size, _ = storage.save_upload(
+        user_id=1, upload=_make_upload("../../evil.m4a", b"abc")
+    )
+    second, _, _ = storage.save_upload(user_id=1, upload=_make_upload("../../evil.m4a", b"xyz"))
 
     assert first.parent == tmp_path / "1"
     assert first.exists()
@@ -32,8 +35,18 @@ def test_resolve_path_rejects_directory_escape(tmp_path) -> None:
 
 def test_resolve_path_returns_absolute_path(tmp_path) -> None:
     storage = AudioStorageService(tmp_path)
-    path, _ = storage.save_upload(user_id=2, upload=_make_upload("clip.wav", b"123"))
+    path, _, _ = storage.save_upload(user_id=2, upload=_make_upload("clip.wav", b"123"))
     relative = path.relative_to(storage.base_dir)
 
     resolved = storage.resolve_path(relative)
     assert resolved == path
+
+
+def test_save_upload_returns_content_hash(tmp_path) -> None:
+    storage = AudioStorageService(tmp_path)
+    path, _, content_hash = storage.save_upload(
+        user_id=3, upload=_make_upload("clip.wav", b"lecture")
+    )
+
+    assert content_hash == hashlib.sha256(b"lecture").hexdigest()
+    assert storage.hash_file(path) == content_hash
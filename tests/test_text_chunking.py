@@ -0,0 +1,32 @@
+from app.services.ai.chunking import CHARS_PER_TOKEN, estimate_tokens, split_into_sections
+
+
+def test_split_into_sections_packs_whole_paragraphs() -> None:
+    paragraphs = [f"Абзац {index}. Второе предложение абзаца." for index in range(6)]
+    text = "\n\n".join(paragraphs)
+
+    sections = split_into_sections(text, max_tokens=30)
+
+    assert len(sections) > 1
+    assert "\n\n".join(sections) == text
+    assert all(estimate_tokens(section) <= 30 for section in sections)
+
+
+def test_split_into_sections_breaks_long_paragraph_by_sentences() -> None:
+    sentences = [f"Предложение номер {index} о теме." for index in range(10)]
+    text = " ".join(sentences)
+
+    sections = split_into_sections(text, max_tokens=25)
+
+    assert len(sections) > 1
+    assert all(section.endswith(".") for section in sections)
+    assert " ".join(sections) == text
+
+
+def test_split_into_sections_breaks_unpunctuated_text_by_words() -> None:
+    text = " ".join(["слово"] * 200)
+
+    sections = split_into_sections(text, max_tokens=20)
+
+    assert all(len(section) <= 20 * CHARS_PER_TOKEN for section in sections)
+    assert " ".join(sections) == text
@@ -0,0 +1,37 @@
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+
+from app.models.base import Base
+from app.models.cache import TranscriptCacheEntry
+from app.services.transcript_cache import TranscriptCache
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(element, compiler, **kw):  # pragma: no cover - sqlalchemy hook
+    return "TEXT"
+
+
+def test_transcript_cache_counts_hits_and_ignores_duplicates() -> None:
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    cache = TranscriptCache()
+    key = {"content_hash": "a" * 64, "model_name": "gemini", "prompt_version": "1"}
+
+    with Session(engine) as session:
+        assert cache.lookup(session, **key) is None
+
+        cache.store(session, transcript="лекция", payload={"duration_sec": 10}, **key)
+        cache.store(session, transcript="лекция", payload=None, **key)
+        session.commit()
+
+        entry = cache.lookup(session, **key)
+        cache.lookup(session, **key)
+        session.commit()
+
+        assert entry is not None
+        assert entry.transcript == "лекция"
+        assert cache.lookup(session, **{**key, "prompt_version": "2"}) is None
+        assert session.query(TranscriptCacheEntry).count() == 1
+        assert cache.stats(session) == {"entries": 1, "hits": 2}
@@ -0,0 +1,111 @@
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from app.services.ai.files import UploadedFiles
+from app.services.ai.gemini import GeminiClient
+
+
+def _expires(hours: float) -> datetime:
+    return datetime.now(UTC) + timedelta(hours=hours)
+
+
+class _StubFileClient:
+    def __init__(self, *, active: bool = True) -> None:
+        self.active = active
+        self.uploads = 0
+        self.lookups = []
+
+    def create_file(self, path, mime_type, display_name):
+        self.uploads += 1
+        return {
+            "name": f"files/upload-{self.uploads}",
+            "uri": f"https://example.test/files/upload-{self.uploads}",
+            "state": "ACTIVE",
+            "expiration_time": _expires(48),
+        }
+
+    def get_file(self, name):
+        self.lookups.append(name)
+        return {
+            "name": name,
+            "state": "ACTIVE" if self.active else "FAILED",
+            "expiration_time": _expires(47),
+        }
+
+
+class _StubManager:
+    def __init__(self, file_client: _StubFileClient) -> None:
+        self.file_client = file_client
+
+    def get_default_client(self, name):
+        return self.file_client
+
+
+def _client(file_client: _StubFileClient) -> GeminiClient:
+    client = GeminiClient.__new__(GeminiClient)
+    client._clients = _StubManager(file_client)
+    client.key_id = "f" * 32
+    client._resilient = lambda operation, description: operation()
+    return client
+
+
+def test_uploaded_files_drop_expiring_handles() -> None:
+    files = UploadedFiles()
+    files.put("key", "hash", name="files/a", uri="uri-a", expires_at=_expires(48))
+    files.put("key", "other", name="files/b", uri="uri-b", expires_at=_expires(0.05))
+
+    assert files.get("key", "hash")["name"] == "files/a"
+    assert files.get("key", "other") is None
+    assert files.get("another-key", "hash") is None
+    assert list(UploadedFiles(files.to_metadata()).to_metadata()) == ["key:hash"]
+
+
+def test_upload_reuses_live_handle() -> None:
+    file_client = _StubFileClient()
+    client = _client(file_client)
+    files = UploadedFiles()
+
+    first = client._upload_file(
+        Path("lecture.mp3"),
+        "audio/mpeg",
+        content_key="hash",
+        uploaded_files=files,
+    )
+    second = client._upload_file(
+        Path("lecture.mp3"),
+        "audio/mpeg",
+        content_key="hash",
+        uploaded_files=files,
+    )
+
+    assert first.name == second.name == "files/upload-1"
+    assert file_client.uploads == 1
+    assert file_client.lookups == ["files/upload-1"]
+
+
+def test_upload_replaces_dead_handle() -> None:
+    file_client = _StubFileClient(active=False)
+    client = _client(file_client)
+    files = UploadedFiles()
+    files.put(client.key_id, "hash", name="files/stale", uri="uri", expires_at=_expires(10))
+
+    uploaded = client._upload_file(
+        Path("lecture.mp3"),
+        None,
+        content_key="hash",
+        uploaded_files=files,
+    )
+
+    assert uploaded.name == "files/upload-1"
+    assert files.get(client.key_id, "hash")["name"] == "files/upload-1"
+
+
+def test_upload_without_content_key_always_uploads() -> None:
+    file_client = _StubFileClient()
+    client = _client(file_client)
+
+    client._upload_file(Path("lecture.mp3"), None)
+    client._upload_file(Path("lecture.mp3"), None)
+
+    assert file_client.uploads == 2
+    assert file_client.lookups == []